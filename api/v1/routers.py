@@ -34,6 +34,8 @@ from apps.discipline.views import RewardViewSet, SanctionViewSet
 
 from apps.document_parsing.views import DocumentParsingViewSet
 
+from apps.jobs.views import JobViewSet
+
 
 router = DefaultRouter()
 
@@ -96,4 +98,7 @@ router.register(r'audit/logs', AuditLogViewSet, basename='audit-logs')
 router.register(r'discipline/rewards', RewardViewSet, basename='rewards')
 router.register(r'discipline/sanctions', SanctionViewSet, basename='sanctions')
 
+# Jobs (фоновые задачи)
+router.register(r'jobs', JobViewSet, basename='jobs')
+
 urlpatterns = router.urls
\ No newline at end of file
@@ -3,7 +3,10 @@ from django.contrib import admin
 from django import forms
 from django_json_widget.widgets import JSONEditorWidget
 
-from .models import Assessment, AssessmentItem, CompetencyRating, Rater, Feedback360
+from .models import (
+    Assessment, AssessmentItem, CompetencyRating, Rater, Feedback360, OfficerCompetencySnapshot,
+    CompetencyRatingRollup, UnitCompetencyRollup,
+)
 from core.json_payloads import FEEDBACK360_TEMPLATE
 
 
@@ -14,7 +17,7 @@ class AssessmentItemInline(admin.TabularInline):
 
 @admin.register(Assessment)
 class AssessmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "officer", "cycle", "assessment_type", "created_by", "created_at")
+    list_display = ("id", "officer", "cycle", "assessment_type", "created_by", "created_at", "aggregated_at")
     list_filter = ("assessment_type", "cycle", "created_at")
     search_fields = ("officer__user__email", "officer__full_name")
     autocomplete_fields = ("officer", "created_by")
@@ -29,6 +32,30 @@ class CompetencyRatingAdmin(admin.ModelAdmin):
     autocomplete_fields = ("officer", "competency")
 
 
+@admin.register(OfficerCompetencySnapshot)
+class OfficerCompetencySnapshotAdmin(admin.ModelAdmin):
+    list_display = ("id", "officer", "competency", "score", "source", "assessed_at")
+    list_filter = ("source", "competency")
+    search_fields = ("officer__user__email", "officer__full_name", "competency__name")
+    raw_id_fields = ("officer", "competency")
+
+
+@admin.register(CompetencyRatingRollup)
+class CompetencyRatingRollupAdmin(admin.ModelAdmin):
+    list_display = ("id", "officer", "competency", "source", "period", "period_start", "count", "mean")
+    list_filter = ("period", "source", "competency")
+    search_fields = ("officer__user__email", "officer__full_name", "competency__name")
+    raw_id_fields = ("officer", "competency", "unit")
+
+
+@admin.register(UnitCompetencyRollup)
+class UnitCompetencyRollupAdmin(admin.ModelAdmin):
+    list_display = ("id", "unit", "competency", "period", "period_start", "count", "mean")
+    list_filter = ("period", "competency")
+    search_fields = ("unit__name", "competency__name")
+    raw_id_fields = ("unit", "competency")
+
+
 admin.site.register(Rater,
                     type("RaterAdmin", (admin.ModelAdmin,), {
                         "list_display": ("id", "user", "relation"),
@@ -51,9 +78,9 @@ class Feedback360Form(forms.ModelForm):
 
 class Feedback360Admin(admin.ModelAdmin):
     form = Feedback360Form
-    list_display = ("id", "assessment", "rater", "is_anonymous", "created_at")
+    list_display = ("id", "assessment", "rater", "status", "is_anonymous", "created_at")
     search_fields = ("assessment__officer__user__email", "rater__user__email")
-    list_filter = ("is_anonymous", "created_at")
+    list_filter = ("status", "is_anonymous", "created_at")
     autocomplete_fields = ("assessment", "rater")
 
     def get_changeform_initial_data(self, request):
@@ -5,3 +5,6 @@ class AssessmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.assessments'
     verbose_name = 'Аттестации'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,65 @@
+"""
+Калибровка оценок 360 по оценщикам: «мягкие» и «строгие» оценщики приводятся к общей шкале.
+
+Для каждого оценщика по всей его истории заполненных 360 (все аттестации) считаются среднее и
+разброс баллов; к общим среднему/разбросу они стягиваются с весом PRIOR_WEIGHT (shrinkage),
+чтобы у оценщика с парой оценок поправка была слабой. Балл переводится в z-оценку оценщика
+и обратно в шкалу всей выборки: calibrated = μ + σ · (x − mean_r) / std_r, с обрезкой в [1, 5].
+Статистика считается NumPy по всем оценщикам сразу, применение — одной векторной операцией.
+"""
+from typing import Iterable
+
+import numpy as np
+
+from .models import Feedback360
+from .services import feedback360_scores
+
+PRIOR_WEIGHT = 5.0   # «виртуальных» оценок с общими средним/разбросом у каждого оценщика
+MIN_STD = 0.25       # нижняя граница разброса, чтобы не делить на ~0
+SCORE_MIN, SCORE_MAX = 1.0, 5.0
+
+
+class RaterCalibration:
+    def __init__(self, rater_ids: np.ndarray, scores: np.ndarray, prior_weight: float = PRIOR_WEIGHT):
+        """rater_ids/scores — все баллы истории (по одному элементу на балл)."""
+        uniq, idx = np.unique(rater_ids, return_inverse=True)
+        self.raters = uniq  # отсортированы — поиск searchsorted
+        if not len(scores):
+            self.mu, self.sigma = 0.0, 1.0
+            self.mean = self.std = np.zeros(0)
+            return
+        self.mu = float(scores.mean())
+        self.sigma = max(float(scores.std()), MIN_STD)
+
+        n = np.bincount(idx, minlength=len(uniq)).astype(np.float64)
+        s1 = np.bincount(idx, weights=scores, minlength=len(uniq))
+        s2 = np.bincount(idx, weights=scores * scores, minlength=len(uniq))
+        mean_r = s1 / n
+        var_r = np.maximum(s2 / n - mean_r ** 2, 0.0)
+        self.mean = (n * mean_r + prior_weight * self.mu) / (n + prior_weight)
+        self.std = np.maximum(np.sqrt((n * var_r + prior_weight * self.sigma ** 2) / (n + prior_weight)), MIN_STD)
+
+    @classmethod
+    def for_raters(cls, rater_ids: Iterable[int], prior_weight: float = PRIOR_WEIGHT) -> "RaterCalibration":
+        """История заполненных 360 указанных оценщиков — одним запросом."""
+        raters, scores = [], []
+        for rid, payload in Feedback360.objects.filter(
+                rater_id__in=list(set(rater_ids)), status=Feedback360.Status.SUBMITTED,
+        ).values_list("rater_id", "payload").iterator(chunk_size=5000):
+            for _, score in feedback360_scores(payload):
+                raters.append(rid)
+                scores.append(score)
+        return cls(np.array(raters, dtype=np.int64), np.array(scores, dtype=np.float64), prior_weight)
+
+    def apply(self, rater_ids, scores) -> np.ndarray:
+        """Откалиброванные баллы; оценщики без истории остаются как есть."""
+        scores = np.asarray(scores, dtype=np.float64)
+        result = scores.copy()
+        if not len(self.raters):
+            return result
+        rater_ids = np.asarray(rater_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.raters, rater_ids), len(self.raters) - 1)
+        known = self.raters[pos] == rater_ids
+        p = pos[known]
+        result[known] = self.mu + self.sigma * (scores[known] - self.mean[p]) / self.std[p]
+        return np.clip(result, SCORE_MIN, SCORE_MAX)
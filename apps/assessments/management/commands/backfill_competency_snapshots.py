@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.services import rebuild_competency_snapshots
+
+
+class Command(BaseCommand):
+    help = "Заполнить/пересобрать снапшот последних оценок офицеров (OfficerCompetencySnapshot)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--officer", type=int, action="append", dest="officers",
+                            help="Только для указанных офицеров (можно повторять)")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        total = rebuild_competency_snapshots(officer_ids=opts["officers"], chunk_size=opts["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Снапшот обновлён: {total} пар офицер × компетенция"))
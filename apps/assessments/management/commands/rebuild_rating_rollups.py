@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.assessments.rollups import rebuild_rating_rollups
+
+
+class Command(BaseCommand):
+    help = "Пересобрать помесячные/поквартальные агрегаты оценок (CompetencyRatingRollup, UnitCompetencyRollup)"
+
+    def handle(self, *args, **opts):
+        stats = rebuild_rating_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"Агрегаты пересобраны: офицерских строк {stats['officer_rows']}, по подразделениям {stats['unit_rows']}"
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.25 on 2026-10-17 00:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_snapshots(apps, schema_editor):
+    CompetencyRating = apps.get_model('assessments', 'CompetencyRating')
+    Snapshot = apps.get_model('assessments', 'OfficerCompetencySnapshot')
+    seen, batch = set(), []
+    rows = CompetencyRating.objects.order_by('officer_id', 'competency_id', '-assessed_at', '-id') \
+        .values_list('officer_id', 'competency_id', 'score', 'source', 'assessed_at')
+    for oid, cid, score, source, assessed_at in rows.iterator(chunk_size=5000):
+        if (oid, cid) in seen:
+            continue
+        seen.add((oid, cid))
+        batch.append(Snapshot(officer_id=oid, competency_id=cid, score=score, source=source, assessed_at=assessed_at))
+        if len(batch) >= 5000:
+            Snapshot.objects.bulk_create(batch)
+            batch = []
+    Snapshot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_officerprofile_awards_officerprofile_children_count_and_more'),
+        ('directory', '0004_alter_position_code_alter_position_unique_together_and_more'),
+        ('assessments', '0003_alter_assessmentitem_competency_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfficerCompetencySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('source', models.CharField(choices=[('SELF', 'Самооценка'), ('COMMANDER', 'Командир'), ('360', '360°'), ('TEST', 'Тест')], max_length=20)),
+                ('assessed_at', models.DateTimeField()),
+                ('competency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='directory.competency')),
+                ('officer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='competency_snapshots', to='users.officerprofile')),
+            ],
+            options={
+                'unique_together': {('officer', 'competency')},
+            },
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
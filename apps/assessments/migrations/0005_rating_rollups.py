@@ -0,0 +1,79 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter
+
+
+def backfill_rollups(apps, schema_editor):
+    CompetencyRating = apps.get_model('assessments', 'CompetencyRating')
+    OfficerRollup = apps.get_model('assessments', 'CompetencyRatingRollup')
+    UnitRollup = apps.get_model('assessments', 'UnitCompetencyRollup')
+    for period, trunc in (('MONTH', TruncMonth), ('QUARTER', TruncQuarter)):
+        rows = CompetencyRating.objects.annotate(start=trunc('assessed_at')).values(
+            'officer_id', 'competency_id', 'source', 'start', 'officer__unit_id',
+        ).annotate(n=Count('id'), s=Sum('score'), lo=Min('score'), hi=Max('score')).order_by()
+        OfficerRollup.objects.bulk_create([OfficerRollup(
+            officer_id=r['officer_id'], competency_id=r['competency_id'], source=r['source'],
+            unit_id=r['officer__unit_id'], period=period, period_start=r['start'].date(),
+            count=r['n'], total=r['s'], min_score=r['lo'], max_score=r['hi'],
+        ) for r in rows.iterator(chunk_size=5000)], batch_size=1000)
+    rows = OfficerRollup.objects.filter(unit__isnull=False).values(
+        'unit_id', 'competency_id', 'period', 'period_start',
+    ).annotate(n=Sum('count'), s=Sum('total'), lo=Min('min_score'), hi=Max('max_score')).order_by()
+    UnitRollup.objects.bulk_create([UnitRollup(
+        unit_id=r['unit_id'], competency_id=r['competency_id'], period=r['period'], period_start=r['period_start'],
+        count=r['n'], total=r['s'], min_score=r['lo'], max_score=r['hi'],
+    ) for r in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_officerprofile_awards_officerprofile_children_count_and_more'),
+        ('directory', '0004_alter_position_code_alter_position_unique_together_and_more'),
+        ('assessments', '0004_officercompetencysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitCompetencyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('MONTH', 'Месяц'), ('QUARTER', 'Квартал')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('min_score', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('max_score', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('competency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='directory.competency')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_rollups', to='directory.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['unit', 'period', 'period_start'], name='assessments_unit_id_39f6af_idx')],
+                'unique_together': {('unit', 'competency', 'period', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CompetencyRatingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('MONTH', 'Месяц'), ('QUARTER', 'Квартал')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=1, default=0, max_digits=12)),
+                ('min_score', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('max_score', models.DecimalField(decimal_places=1, max_digits=3)),
+                ('source', models.CharField(choices=[('SELF', 'Самооценка'), ('COMMANDER', 'Командир'), ('360', '360°'), ('TEST', 'Тест')], max_length=20)),
+                ('competency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='directory.competency')),
+                ('officer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_rollups', to='users.officerprofile')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='directory.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['unit', 'competency', 'period', 'period_start'], name='assessments_unit_id_85d797_idx')],
+                'unique_together': {('officer', 'competency', 'source', 'period', 'period_start')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
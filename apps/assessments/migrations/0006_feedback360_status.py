@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0005_rating_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback360',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Ожидает оценки'), ('SUBMITTED', 'Заполнена')], default='SUBMITTED', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='feedback360',
+            index=models.Index(fields=['assessment', 'status'], name='assessments_assessm_08c308_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_feedback360_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='aggregated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['cycle', 'created_at'], name='assessments_cycle_a05dc7_idx'),
+        ),
+    ]
@@ -15,6 +15,11 @@ class Assessment(models.Model):
     assessment_type = models.CharField(max_length=20, choices=AssessmentType.choices)
     created_by = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # когда оценки последний раз агрегировались в CompetencyRating (None — ещё не агрегирована)
+    aggregated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['cycle', 'created_at'])]
 
     def __str__(self):
         return f"{self.officer.user.email} • {self.cycle} • {self.get_assessment_type_display()}"
@@ -59,8 +64,81 @@ class Rater(models.Model):
 
 
 class Feedback360(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Ожидает оценки'
+        SUBMITTED = 'SUBMITTED', 'Заполнена'
+
     assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE, related_name='feedback_360')
     rater = models.ForeignKey(Rater, on_delete=models.CASCADE)
     payload = models.JSONField(default=dict)
     is_anonymous = models.BooleanField(default=False)
+    # PENDING — заготовка из генерации набора оценщиков цикла, в агрегацию не попадает
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.SUBMITTED)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['assessment', 'status'])]
+
+
+class OfficerCompetencySnapshot(models.Model):
+    """Последняя оценка офицера по компетенции (материализуется из CompetencyRating, см. signals)"""
+    officer = models.ForeignKey('users.OfficerProfile', on_delete=models.CASCADE, related_name='competency_snapshots')
+    competency = models.ForeignKey('directory.Competency', on_delete=models.CASCADE)
+    score = models.DecimalField(max_digits=3, decimal_places=1)
+    source = models.CharField(max_length=20, choices=CompetencyRating.RatingSource.choices)
+    assessed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('officer', 'competency')
+
+    def __str__(self):
+        return f"{self.officer_id} • {self.competency_id} • {self.score}"
+
+
+class RatingRollupBase(models.Model):
+    """Агрегат оценок за период (месяц/квартал): число, сумма, минимум, максимум. Среднее — sum / count."""
+    class Period(models.TextChoices):
+        MONTH = 'MONTH', 'Месяц'
+        QUARTER = 'QUARTER', 'Квартал'
+
+    competency = models.ForeignKey('directory.Competency', on_delete=models.CASCADE)
+    period = models.CharField(max_length=10, choices=Period.choices)
+    period_start = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=1, default=0)
+    min_score = models.DecimalField(max_digits=3, decimal_places=1)
+    max_score = models.DecimalField(max_digits=3, decimal_places=1)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def mean(self):
+        return round(float(self.total) / self.count, 2) if self.count else None
+
+
+class CompetencyRatingRollup(RatingRollupBase):
+    """Ряд оценок офицер × компетенция × источник (материализуется из CompetencyRating, см. signals)"""
+    officer = models.ForeignKey('users.OfficerProfile', on_delete=models.CASCADE, related_name='rating_rollups')
+    source = models.CharField(max_length=20, choices=CompetencyRating.RatingSource.choices)
+    # подразделение офицера на момент оценки — из него собирается UnitCompetencyRollup
+    unit = models.ForeignKey('directory.Unit', on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('officer', 'competency', 'source', 'period', 'period_start')
+        indexes = [models.Index(fields=['unit', 'competency', 'period', 'period_start'])]
+
+    def __str__(self):
+        return f"{self.officer_id} • {self.competency_id} • {self.source} • {self.period_start}"
+
+
+class UnitCompetencyRollup(RatingRollupBase):
+    """Ряд оценок подразделение × компетенция (все источники)"""
+    unit = models.ForeignKey('directory.Unit', on_delete=models.CASCADE, related_name='rating_rollups')
+
+    class Meta:
+        unique_together = ('unit', 'competency', 'period', 'period_start')
+        indexes = [models.Index(fields=['unit', 'period', 'period_start'])]
+
+    def __str__(self):
+        return f"{self.unit_id} • {self.competency_id} • {self.period_start}"
@@ -0,0 +1,120 @@
+"""
+Наборы оценщиков 360 для аттестаций цикла — из данных, которые уже есть в системе:
+- COMMANDER   — командиры по действующим CommanderAssignment (until пусто или не наступил;
+                нет назначений — командир подразделения);
+- COLLEAGUE   — офицеры того же подразделения (до max_colleagues, следующие по id «по кругу»,
+                чтобы нагрузка распределялась равномерно);
+- SUBORDINATE — подчинённые, если у пользователя офицера есть CommanderProfile (до max_subordinates).
+Rater — один на (пользователь, отношение); на каждую пару аттестация × оценщик — Feedback360 в статусе PENDING.
+Всё пакетно: справочные данные грузятся один раз, записи — bulk_create.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.users.models import OfficerProfile, CommanderProfile, CommanderAssignment
+from .models import Rater, Feedback360
+from .summary import invalidate_cycle_summary
+
+DEFAULT_MAX_COLLEAGUES = 5
+DEFAULT_MAX_SUBORDINATES = 5
+
+
+class RaterDirectory:
+    """Кто кого может оценивать — справочные данные для набора аттестаций, загруженные разом."""
+
+    def __init__(self, officer_ids):
+        officers = dict(OfficerProfile.objects.filter(id__in=list(officer_ids)).values_list("id", "unit_id"))
+        unit_ids = {u for u in officers.values() if u is not None}
+
+        self.unit_of = officers
+        self.user_of = {}
+        self.unit_members = defaultdict(list)  # unit_id -> [officer_id] по возрастанию
+        self.member_pos = {}                    # officer_id -> индекс в unit_members своего подразделения
+        for oid, uid, unit_id in OfficerProfile.objects.filter(unit_id__in=unit_ids) \
+                .order_by("id").values_list("id", "user_id", "unit_id"):
+            self.user_of[oid] = uid
+            self.member_pos[oid] = len(self.unit_members[unit_id])
+            self.unit_members[unit_id].append(oid)
+        for oid, uid in OfficerProfile.objects.filter(id__in=[o for o in officers if o not in self.user_of]) \
+                .values_list("id", "user_id"):
+            self.user_of[oid] = uid
+
+        self.unit_commanders = defaultdict(list)
+        for unit_id, uid in CommanderProfile.objects.filter(unit_id__in=unit_ids).values_list("unit_id", "user_id"):
+            self.unit_commanders[unit_id].append(uid)
+
+        self.commanders_of = defaultdict(list)   # officer_id -> [user_id командиров]
+        self.subordinates_of = defaultdict(list)  # user_id командира -> [user_id подчинённых]
+        # действующие назначения — until пусто или ещё не наступил (как в apps.users.scope)
+        active = CommanderAssignment.objects.filter(Q(until__isnull=True) | Q(until__gte=timezone.localdate()))
+        for oid, cmd_user in active.filter(officer_id__in=list(officers)).values_list("officer_id", "commander__user_id"):
+            self.commanders_of[oid].append(cmd_user)
+        officer_users = {self.user_of[o] for o in officers}
+        for cmd_user, sub_user in active.filter(commander__user_id__in=officer_users) \
+                .order_by("officer_id").values_list("commander__user_id", "officer__user_id"):
+            self.subordinates_of[cmd_user].append(sub_user)
+
+    def raters_for(self, officer_id: int, max_colleagues: int, max_subordinates: int) -> list[tuple[int, str]]:
+        """[(user_id, relation)] без самого офицера и без повторов пользователя."""
+        me = self.user_of.get(officer_id)
+        unit_id = self.unit_of.get(officer_id)
+        commanders = self.commanders_of.get(officer_id) or self.unit_commanders.get(unit_id, [])
+
+        members = self.unit_members.get(unit_id, [])
+        colleagues = []
+        if officer_id in self.member_pos and max_colleagues > 0:
+            i = self.member_pos[officer_id]
+            n = min(max_colleagues, len(members) - 1)
+            colleagues = [self.user_of[members[(i + k) % len(members)]] for k in range(1, n + 1)]
+        subordinates = self.subordinates_of.get(me, [])[:max_subordinates]
+
+        result, seen = [], {me}
+        for relation, users in (("COMMANDER", commanders), ("SUBORDINATE", subordinates), ("COLLEAGUE", colleagues)):
+            for uid in users:
+                if uid not in seen:
+                    seen.add(uid)
+                    result.append((uid, relation))
+        return result
+
+
+def _rater_ids(pairs: set) -> tuple[dict, int]:
+    """({(user_id, relation): rater_id}, сколько создано) — существующие Rater + недостающие одним bulk_create."""
+    known = {}
+    for rid, uid, relation in Rater.objects.filter(user_id__in={u for u, _ in pairs}) \
+            .order_by("id").values_list("id", "user_id", "relation"):
+        known.setdefault((uid, relation), rid)
+    missing = [Rater(user_id=uid, relation=relation) for uid, relation in pairs if (uid, relation) not in known]
+    for r in Rater.objects.bulk_create(missing, batch_size=1000):
+        known[(r.user_id, r.relation)] = r.id
+    return known, len(missing)
+
+
+def generate_pending_feedback(assessments, directory: RaterDirectory,
+                              max_colleagues: int = DEFAULT_MAX_COLLEAGUES,
+                              max_subordinates: int = DEFAULT_MAX_SUBORDINATES) -> dict:
+    """
+    Создать PENDING Feedback360 для аттестаций (пары, которые уже есть, не дублируются — повторный запуск безопасен).
+    Возвращает {"raters": новых Rater, "feedback": новых Feedback360}.
+    """
+    wanted = {a.id: directory.raters_for(a.officer_id, max_colleagues, max_subordinates) for a in assessments}
+    pairs = {p for lst in wanted.values() for p in lst}
+    if not pairs:
+        return {"raters": 0, "feedback": 0}
+    with transaction.atomic():
+        rater_ids, new_raters = _rater_ids(pairs)
+        existing = set(Feedback360.objects.filter(assessment_id__in=list(wanted)).values_list("assessment_id", "rater_id"))
+        objs = []
+        for aid, lst in wanted.items():
+            for pair in lst:
+                rid = rater_ids[pair]
+                if (aid, rid) not in existing:
+                    existing.add((aid, rid))
+                    objs.append(Feedback360(assessment_id=aid, rater_id=rid, payload={},
+                                            status=Feedback360.Status.PENDING))
+        Feedback360.objects.bulk_create(objs, batch_size=1000)
+        if objs:
+            invalidate_cycle_summary()
+    return {"raters": new_raters, "feedback": len(objs)}
@@ -0,0 +1,254 @@
+"""
+Помесячные и поквартальные агрегаты оценок для графиков динамики.
+
+CompetencyRatingRollup — офицер × компетенция × источник (+ подразделение офицера на момент оценки),
+UnitCompetencyRollup — подразделение × компетенция по всем источникам.
+Новые оценки учитываются инкрементально (затронутые строки читаются под блокировкой и пишутся одним bulk_update);
+при удалении оценки затронутые периоды пересчитываются заново (min/max не вычитаются).
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Sum, Min, Max, Count
+from django.db.models.functions import TruncMonth, TruncQuarter
+from django.utils import timezone
+
+from apps.audit.utils import audit_suppressed
+from apps.users.models import OfficerProfile
+from .models import CompetencyRating, CompetencyRatingRollup, UnitCompetencyRollup, RatingRollupBase
+
+Period = RatingRollupBase.Period
+TRUNC = {Period.MONTH: TruncMonth, Period.QUARTER: TruncQuarter}
+
+
+def period_start(day: date, period: str) -> date:
+    if period == Period.QUARTER:
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def period_end(start: date, period: str) -> date:
+    """Первый день следующего периода."""
+    month = start.month + (3 if period == Period.QUARTER else 1)
+    return date(start.year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+class _Acc:
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count, self.total, self.min, self.max = 0, Decimal(0), None, None
+
+    def add(self, score):
+        score = Decimal(str(score))  # у только что созданной оценки score может быть float
+        self.count += 1
+        self.total += score
+        self.min = score if self.min is None else min(self.min, score)
+        self.max = score if self.max is None else max(self.max, score)
+
+
+INCREMENT_BATCH = 1000
+
+
+def _increment(model, groups: dict, extra: Optional[dict] = None):
+    """
+    groups: {lookup-кортеж полей уникальности: _Acc}. Недостающие строки создаются нулевыми
+    (ignore_conflicts), затем затронутые строки читаются с блокировкой (select_for_update) пачками
+    и обновляются bulk_update — несколько запросов на пачку вместо UPDATE на каждую строку.
+    Вызывать внутри transaction.atomic.
+    """
+    fields = _attnames(model._meta.unique_together[0])
+    model.objects.bulk_create([
+        model(**dict(zip(fields, key)), count=0, total=0, min_score=acc.min, max_score=acc.max,
+              **(extra or {}).get(key, {}))
+        for key, acc in groups.items()
+    ], ignore_conflicts=True, batch_size=INCREMENT_BATCH)
+
+    keys = list(groups)
+    for start in range(0, len(keys), INCREMENT_BATCH):
+        chunk = keys[start:start + INCREMENT_BATCH]
+        # надмножество по каждому полю отдельно, точное совпадение ключа — в Python
+        candidates = model.objects.select_for_update().filter(**{
+            f"{name}__in": {key[i] for key in chunk} for i, name in enumerate(fields)
+        })
+        wanted, rows = set(chunk), []
+        for row in candidates:
+            key = tuple(getattr(row, name) for name in fields)
+            if key not in wanted:
+                continue
+            acc = groups[key]
+            row.count += acc.count
+            row.total += acc.total
+            row.min_score = acc.min if row.min_score is None else min(row.min_score, acc.min)
+            row.max_score = acc.max if row.max_score is None else max(row.max_score, acc.max)
+            rows.append(row)
+        model.objects.bulk_update(rows, ["count", "total", "min_score", "max_score"], batch_size=INCREMENT_BATCH)
+
+
+def _attnames(fields):
+    # поля-FK уникальности → *_id
+    return [f if f in ("source", "period", "period_start") else f"{f}_id" for f in fields]
+
+
+def _local_day(dt) -> date:
+    return timezone.localtime(dt).date() if timezone.is_aware(dt) else dt.date()
+
+
+def _aware_midnight(day: date):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def apply_ratings_to_rollups(ratings: Iterable[CompetencyRating]):
+    """Учесть новые оценки во всех агрегатах (один проход по оценкам, пакетная запись затронутых строк)."""
+    ratings = list(ratings)
+    if not ratings:
+        return
+    units = dict(OfficerProfile.objects.filter(id__in={r.officer_id for r in ratings}).values_list("id", "unit_id"))
+    officer_groups, unit_groups, officer_units = defaultdict(_Acc), defaultdict(_Acc), {}
+    for r in ratings:
+        day = _local_day(r.assessed_at)
+        unit_id = units.get(r.officer_id)
+        for period in Period.values:
+            start = period_start(day, period)
+            # порядок — как в unique_together моделей
+            key = (r.officer_id, r.competency_id, r.source, period, start)
+            officer_groups[key].add(r.score)
+            officer_units[key] = {"unit_id": unit_id}
+            if unit_id is not None:
+                unit_groups[(unit_id, r.competency_id, period, start)].add(r.score)
+    with transaction.atomic():
+        _increment(CompetencyRatingRollup, officer_groups, extra=officer_units)
+        _increment(UnitCompetencyRollup, unit_groups)
+
+
+def _refresh_unit_buckets(buckets: set):
+    """Пересобрать строки UnitCompetencyRollup из офицерских агрегатов. buckets: {(unit, competency, period, start)}."""
+    for unit_id, competency_id, period, start in buckets:
+        agg = CompetencyRatingRollup.objects.filter(
+            unit_id=unit_id, competency_id=competency_id, period=period, period_start=start, count__gt=0,
+        ).aggregate(count=Sum("count"), total=Sum("total"), min_score=Min("min_score"), max_score=Max("max_score"))
+        lookup = dict(unit_id=unit_id, competency_id=competency_id, period=period, period_start=start)
+        if not agg["count"]:
+            UnitCompetencyRollup.objects.filter(**lookup).delete()
+        else:
+            UnitCompetencyRollup.objects.update_or_create(**lookup, defaults=agg)
+
+
+def refresh_rollups_for_rating(rating: CompetencyRating):
+    """
+    После удаления или изменения оценки: пересчитать её периоды у офицера из сырых оценок, затем — у подразделения.
+    rating — оценка с её значениями (для изменённой — и прежними, и новыми: периоды/источник могли смениться).
+    """
+    day = _local_day(rating.assessed_at)
+    unit_buckets = set()
+    with transaction.atomic():
+        for period in Period.values:
+            start = period_start(day, period)
+            lookup = dict(officer_id=rating.officer_id, competency_id=rating.competency_id, source=rating.source,
+                          period=period, period_start=start)
+            row = CompetencyRatingRollup.objects.filter(**lookup).first()
+            lo, hi = _aware_midnight(start), _aware_midnight(period_end(start, period))
+            agg = CompetencyRating.objects.filter(
+                officer_id=rating.officer_id, competency_id=rating.competency_id, source=rating.source,
+                assessed_at__gte=lo, assessed_at__lt=hi,
+            ).aggregate(count=Count("id"), total=Sum("score"), min_score=Min("score"), max_score=Max("score"))
+            if row is None:
+                if not agg["count"]:
+                    continue
+                # оценку перенесли в период/источник, где строки ещё нет
+                unit_id = OfficerProfile.objects.filter(pk=rating.officer_id).values_list("unit_id", flat=True).first()
+                row = CompetencyRatingRollup.objects.create(**lookup, unit_id=unit_id, **agg)
+            elif agg["count"]:
+                CompetencyRatingRollup.objects.filter(pk=row.pk).update(**agg)
+            else:
+                row.delete()
+            if row.unit_id is not None:
+                unit_buckets.add((row.unit_id, rating.competency_id, period, start))
+        _refresh_unit_buckets(unit_buckets)
+
+
+def rebuild_rating_rollups() -> dict:
+    """
+    Полная пересборка агрегатов из CompetencyRating агрегирующими запросами.
+    Подразделение — текущее у офицера (на момент старых оценок оно не сохранялось).
+    """
+    officer_rows = []
+    for period, trunc in TRUNC.items():
+        rows = CompetencyRating.objects.annotate(start=trunc("assessed_at")).values(
+            "officer_id", "competency_id", "source", "start", "officer__unit_id",
+        ).annotate(count=Count("id"), total=Sum("score"), min_score=Min("score"), max_score=Max("score")).order_by()
+        for r in rows.iterator(chunk_size=5000):
+            officer_rows.append(CompetencyRatingRollup(
+                officer_id=r["officer_id"], competency_id=r["competency_id"], source=r["source"],
+                unit_id=r["officer__unit_id"], period=period, period_start=r["start"].date(), count=r["count"],
+                total=r["total"], min_score=r["min_score"], max_score=r["max_score"],
+            ))
+    with transaction.atomic(), audit_suppressed():
+        CompetencyRatingRollup.objects.all().delete()
+        UnitCompetencyRollup.objects.all().delete()
+        CompetencyRatingRollup.objects.bulk_create(officer_rows, batch_size=1000)
+        unit_rows = CompetencyRatingRollup.objects.filter(unit__isnull=False).values(
+            "unit_id", "competency_id", "period", "period_start",
+        ).annotate(n=Sum("count"), sum_total=Sum("total"), lo=Min("min_score"), hi=Max("max_score")).order_by()
+        created = UnitCompetencyRollup.objects.bulk_create([UnitCompetencyRollup(
+            unit_id=r["unit_id"], competency_id=r["competency_id"], period=r["period"],
+            period_start=r["period_start"], count=r["n"], total=r["sum_total"], min_score=r["lo"], max_score=r["hi"],
+        ) for r in unit_rows], batch_size=1000)
+    return {"officer_rows": len(officer_rows), "unit_rows": len(created)}
+
+
+def unit_competency_trends(unit_ids, period: str = Period.MONTH, competency_ids=None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None) -> list[dict]:
+    """
+    Ряды по компетенциям для набора подразделений (обычно юнит с подчинёнными) — один агрегирующий
+    запрос к UnitCompetencyRollup по индексу (unit, period, period_start).
+    """
+    qs = UnitCompetencyRollup.objects.filter(unit_id__in=list(unit_ids), period=period)
+    if competency_ids:
+        qs = qs.filter(competency_id__in=list(competency_ids))
+    if date_from:
+        qs = qs.filter(period_start__gte=period_start(date_from, period))
+    if date_to:
+        qs = qs.filter(period_start__lte=date_to)
+    rows = qs.values("competency_id", "competency__name", "period_start").annotate(
+        n=Sum("count"), sum_total=Sum("total"), lo=Min("min_score"), hi=Max("max_score"),
+    ).order_by("competency_id", "period_start")
+    return _series(rows, ("competency_id", "competency__name"))
+
+
+def officer_competency_trends(officer_id: int, period: str = Period.MONTH, competency_ids=None,
+                              date_from: Optional[date] = None, date_to: Optional[date] = None) -> list[dict]:
+    """Ряды офицера по компетенциям и источникам."""
+    qs = CompetencyRatingRollup.objects.filter(officer_id=officer_id, period=period)
+    if competency_ids:
+        qs = qs.filter(competency_id__in=list(competency_ids))
+    if date_from:
+        qs = qs.filter(period_start__gte=period_start(date_from, period))
+    if date_to:
+        qs = qs.filter(period_start__lte=date_to)
+    rows = qs.values("competency_id", "competency__name", "source", "period_start").annotate(
+        n=Sum("count"), sum_total=Sum("total"), lo=Min("min_score"), hi=Max("max_score"),
+    ).order_by("competency_id", "source", "period_start")
+    return _series(rows, ("competency_id", "competency__name", "source"))
+
+
+def _series(rows, key_fields) -> list[dict]:
+    series = {}
+    for r in rows:
+        key = tuple(r[f] for f in key_fields)
+        if key not in series:
+            head = {"competency": r["competency_id"], "competency_name": r["competency__name"]}
+            if "source" in key_fields:
+                head["source"] = r["source"]
+            series[key] = {**head, "points": []}
+        series[key]["points"].append({
+            "period_start": r["period_start"],
+            "count": r["n"],
+            "mean": round(float(r["sum_total"]) / r["n"], 2) if r["n"] else None,
+            "min": float(r["lo"]),
+            "max": float(r["hi"]),
+        })
+    return list(series.values())
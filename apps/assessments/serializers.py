@@ -23,9 +23,9 @@ class AssessmentSerializer(serializers.ModelSerializer):
         model = Assessment
         fields = [
             "id", "officer", "officer_email", "cycle", "assessment_type",
-            "created_by", "created_by_email", "created_at", "items"
+            "created_by", "created_by_email", "created_at", "aggregated_at", "items"
         ]
-        read_only_fields = ["created_by", "created_at"]
+        read_only_fields = ["created_by", "created_at", "aggregated_at"]
 
     def create(self, validated_data):
         items = validated_data.pop("items", [])
@@ -59,8 +59,8 @@ class Feedback360Serializer(serializers.ModelSerializer):
 
     class Meta:
         model = Feedback360
-        fields = ["id", "assessment", "rater", "rater_email", "payload", "is_anonymous", "created_at"]
-        read_only_fields = ["created_at"]
+        fields = ["id", "assessment", "rater", "rater_email", "payload", "is_anonymous", "status", "created_at"]
+        read_only_fields = ["status", "created_at"]
 
     def validate_payload(self, value):
         return validate_json_payload(FEEDBACK360_SCHEMA, value)
@@ -1,8 +1,18 @@
 from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Optional
 
-from apps.assessments.models import Assessment, AssessmentItem, Feedback360, CompetencyRating
-from apps.users.models import OfficerProfile
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from apps.audit.utils import audit_suppressed, log_event
+from apps.assessments.models import (
+    Assessment, AssessmentItem, Feedback360, CompetencyRating, OfficerCompetencySnapshot
+)
+from .summary import invalidate_cycle_summary
+
+SNAPSHOT_FIELDS = ["score", "source", "assessed_at"]
 
 
 def _avg(nums):
@@ -11,42 +21,248 @@ def _avg(nums):
     return float(Decimal(sum(nums) / len(nums)).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
 
 
-def aggregate_assessment_to_ratings(assessment: Assessment) -> list[CompetencyRating]:
+def replace_assessment_items(assessment: Assessment, items: list[dict], actor=None) -> dict:
+    """
+    Заменить набор AssessmentItem аттестации на items (validated_data, по одному на компетенцию)
+    по разнице с текущими: новые — bulk_create, изменившиеся — bulk_update, лишние — одним delete.
+    Всё в одной транзакции; вместо построчного аудита — одна сводная запись.
+    Возвращает {"created": n, "updated": n, "deleted": n}.
+    """
+    wanted = {it["competency"].pk: it for it in items}
+    existing, stale = {}, []
+    for item in AssessmentItem.objects.filter(assessment=assessment).order_by("id"):
+        if item.competency_id in existing or item.competency_id not in wanted:
+            stale.append(item)  # лишние и дубли по компетенции
+        else:
+            existing[item.competency_id] = item
+
+    to_create, to_update, changes = [], [], {"created": [], "updated": [], "deleted": []}
+    for cid, it in wanted.items():
+        score, comment = it["score"], it.get("comment", "")
+        item = existing.get(cid)
+        if item is None:
+            to_create.append(AssessmentItem(assessment=assessment, competency_id=cid, score=score, comment=comment))
+            changes["created"].append({"competency": cid, "score": score, "comment": comment})
+        elif (item.score, item.comment) != (score, comment):
+            changes["updated"].append({"competency": cid, "before": {"score": item.score, "comment": item.comment},
+                                       "after": {"score": score, "comment": comment}})
+            item.score, item.comment = score, comment
+            to_update.append(item)
+    changes["deleted"] = [{"competency": i.competency_id, "score": i.score, "comment": i.comment} for i in stale]
+
+    with transaction.atomic(), audit_suppressed():
+        if stale:
+            AssessmentItem.objects.filter(id__in=[i.id for i in stale]).delete()
+        if to_update:
+            AssessmentItem.objects.bulk_update(to_update, ["score", "comment"])
+        if to_create:
+            AssessmentItem.objects.bulk_create(to_create)
+    if to_create or to_update or stale:
+        log_event(actor=actor, action="UPDATE", obj=assessment, diff_json={"items": changes})
+        invalidate_cycle_summary()
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(stale)}
+
+
+def feedback360_scores(payload) -> list[tuple[int, float]]:
+    """
+    [(competency_id, score)] из payload 360. Поддерживаются обе формы:
+    - по схеме FEEDBACK360_SCHEMA: {"competencies": [{"competency_id": 1, "score": 4}, ...], ...}
+    - старая: {"<competency_id>": score, ...}
+    Нечисловые/битые записи пропускаются.
+    """
+    if not isinstance(payload, dict):
+        return []
+    if isinstance(payload.get("competencies"), list):
+        pairs = ((e.get("competency_id"), e.get("score")) for e in payload["competencies"] if isinstance(e, dict))
+    else:
+        pairs = payload.items()
+    result = []
+    for cid, sc in pairs:
+        try:
+            result.append((int(cid), float(sc)))
+        except (TypeError, ValueError):
+            continue
+    return result
+
+
+def aggregate_assessments_to_ratings(assessments: Iterable[Assessment],
+                                     calibration=None) -> dict[int, list[CompetencyRating]]:
+    """
+    Агрегаты CompetencyRating по набору аттестаций: items и 360 всех аттестаций — двумя запросами,
+    средние — за один проход, запись — одним bulk_create.
+    calibration — RaterCalibration (см. calibration.py): баллы 360 калибруются по оценщикам
+    одной векторной операцией на весь набор; None — как есть.
+    Источник: '360', если у аттестации есть заполненные 360 (PENDING не учитываются), иначе 'COMMANDER'.
+    Всем аттестациям набора проставляется aggregated_at.
+    Возвращает {assessment_id: [созданные оценки]}.
+    """
+    officers = {a.id: a.officer_id for a in assessments}
+    if not officers:
+        return {}
+    scores = {aid: defaultdict(list) for aid in officers}  # assessment_id -> competency_id -> [scores...]
+    # 1) базовые оценки из items (обычно выставляет командир / комиссия)
+    for aid, cid, score in AssessmentItem.objects.filter(assessment_id__in=list(officers)) \
+            .values_list("assessment_id", "competency_id", "score"):
+        scores[aid][cid].append(score)
+    # 2) 360 payload
+    with_360, fb_rows = set(), []  # (assessment_id, competency_id, rater_id, score)
+    for aid, rid, payload in Feedback360.objects.filter(assessment_id__in=list(officers),
+                                                        status=Feedback360.Status.SUBMITTED) \
+            .values_list("assessment_id", "rater_id", "payload"):
+        with_360.add(aid)
+        fb_rows.extend((aid, cid, rid, score) for cid, score in feedback360_scores(payload))
+    fb_scores = [r[3] for r in fb_rows]
+    if calibration is not None and fb_rows:
+        fb_scores = calibration.apply([r[2] for r in fb_rows], fb_scores).tolist()
+    for (aid, cid, _, _), score in zip(fb_rows, fb_scores):
+        scores[aid][cid].append(score)
+
+    # 3) средние → CompetencyRating
+    objs = []
+    for aid, by_competency in scores.items():
+        source = CompetencyRating.RatingSource.FEEDBACK_360 if aid in with_360 \
+            else CompetencyRating.RatingSource.COMMANDER
+        for cid, lst in by_competency.items():
+            avg = _avg(lst)
+            if avg is not None:
+                objs.append((aid, CompetencyRating(officer_id=officers[aid], competency_id=cid,
+                                                   score=avg, source=source)))
+    result = {aid: [] for aid in officers}
+    from .signals import competency_ratings_created
+    with transaction.atomic():
+        Assessment.objects.filter(id__in=list(officers)).update(aggregated_at=timezone.now())
+        invalidate_cycle_summary()
+        if not objs:
+            return result
+        created = CompetencyRating.objects.bulk_create([r for _, r in objs], batch_size=1000)
+        # bulk_create не шлёт post_save — снапшоты/индексы/очередь пересчёта уведомляем явно
+        competency_ratings_created.send(sender=CompetencyRating, ratings=created)
+    for (aid, _), rating in zip(objs, created):
+        result[aid].append(rating)
+    return result
+
+
+def aggregate_assessment_to_ratings(assessment: Assessment, calibration=None) -> list[CompetencyRating]:
     """
     Строим агрегированные CompetencyRating из:
     - AssessmentItem (обычно выставляет командир / комиссия)
-    - Feedback360.payload (dict: {competency_id: score})
+    - Feedback360.payload (обе формы, см. feedback360_scores)
     - Самооценку можно передавать как items с источником (в нашем дизайне источник — в CompetencyRating)
+    calibration — RaterCalibration для баллов 360 или None.
     """
-    # 1) базовые оценки из items
-    scores = defaultdict(list)  # competency_id -> [scores...]
-    for it in AssessmentItem.objects.filter(assessment=assessment):
-        scores[it.competency_id].append(it.score)
+    return aggregate_assessments_to_ratings([assessment], calibration=calibration)[assessment.id]
 
-    # 2) 360 payload
-    for fb in Feedback360.objects.filter(assessment=assessment):
-        for cid, sc in (fb.payload or {}).items():
-            try:
-                cid_int = int(cid)
-                scores[cid_int].append(int(sc))
-            except Exception:
-                continue
-
-    # 3) записываем агрегаты в CompetencyRating (source='360' если были 360, иначе 'COMMANDER')
-    created = []
-    officer: OfficerProfile = assessment.officer
-    for cid, lst in scores.items():
-        avg = _avg(lst)
-        if avg is None:
-            continue
-        created.append(
-            CompetencyRating.objects.create(
-                officer=officer,
-                competency_id=cid,
-                score=avg,
-                source=CompetencyRating.RatingSource.FEEDBACK_360 if Feedback360.objects.filter(
-                    assessment=assessment).exists()
-                else CompetencyRating.RatingSource.COMMANDER
-            )
+
+# ---- снапшот последних оценок ----
+def _upsert_snapshots(objs: list[OfficerCompetencySnapshot]):
+    if objs:
+        OfficerCompetencySnapshot.objects.bulk_create(
+            objs, batch_size=1000,
+            update_conflicts=True, unique_fields=["officer", "competency"], update_fields=SNAPSHOT_FIELDS,
         )
-    return created
+
+
+def _snapshot_from(rating: CompetencyRating) -> OfficerCompetencySnapshot:
+    return OfficerCompetencySnapshot(
+        officer_id=rating.officer_id, competency_id=rating.competency_id,
+        score=rating.score, source=rating.source, assessed_at=rating.assessed_at,
+    )
+
+
+def apply_ratings_to_snapshots(ratings: Iterable[CompetencyRating]) -> int:
+    """
+    Учесть новые оценки в OfficerCompetencySnapshot: побеждает самая свежая по assessed_at
+    (при равенстве — пришедшая позже). Возвращает число обновлённых пар.
+    """
+    latest = {}
+    for r in ratings:
+        key = (r.officer_id, r.competency_id)
+        if key not in latest or r.assessed_at >= latest[key].assessed_at:
+            latest[key] = r
+    if not latest:
+        return 0
+
+    existing = {
+        (oid, cid): assessed_at
+        for oid, cid, assessed_at in OfficerCompetencySnapshot.objects.filter(
+            officer_id__in={k[0] for k in latest}, competency_id__in={k[1] for k in latest}
+        ).values_list("officer_id", "competency_id", "assessed_at")
+    }
+    objs = [_snapshot_from(r) for key, r in latest.items()
+            if key not in existing or r.assessed_at >= existing[key]]
+    _upsert_snapshots(objs)
+    return len(objs)
+
+
+def refresh_competency_snapshot(officer_id: int, competency_id: int):
+    """Пересчитать снапшот пары по истории (после удаления или изменения оценки)."""
+    rating = CompetencyRating.objects.filter(officer_id=officer_id, competency_id=competency_id) \
+        .order_by("-assessed_at", "-id").first()
+    if rating is None:
+        OfficerCompetencySnapshot.objects.filter(officer_id=officer_id, competency_id=competency_id).delete()
+    else:
+        _upsert_snapshots([_snapshot_from(rating)])
+
+
+def rebuild_competency_snapshots(officer_ids: Optional[Iterable[int]] = None, chunk_size: int = 5000) -> int:
+    """
+    Полная пересборка снапшота из CompetencyRating (backfill).
+    Один проход по истории в порядке (офицер, компетенция, свежие первыми).
+    """
+    ratings = CompetencyRating.objects.all()
+    snapshots = OfficerCompetencySnapshot.objects.all()
+    if officer_ids is not None:
+        officer_ids = list(officer_ids)
+        ratings = ratings.filter(officer_id__in=officer_ids)
+        snapshots = snapshots.filter(officer_id__in=officer_ids)
+
+    seen = set()
+    batch = []
+    total = 0
+    rows = ratings.order_by("officer_id", "competency_id", "-assessed_at", "-id") \
+        .values_list("officer_id", "competency_id", "score", "source", "assessed_at")
+    for oid, cid, score, source, assessed_at in rows.iterator(chunk_size=chunk_size):
+        if (oid, cid) in seen:
+            continue
+        seen.add((oid, cid))
+        batch.append(OfficerCompetencySnapshot(officer_id=oid, competency_id=cid, score=score,
+                                               source=source, assessed_at=assessed_at))
+        if len(batch) >= chunk_size:
+            _upsert_snapshots(batch)
+            total += len(batch)
+            batch = []
+    _upsert_snapshots(batch)
+    total += len(batch)
+
+    # пары, у которых не осталось оценок
+    stale = [pk for pk, oid, cid in snapshots.values_list("id", "officer_id", "competency_id")
+             if (oid, cid) not in seen]
+    if stale:
+        OfficerCompetencySnapshot.objects.filter(id__in=stale).delete()
+    return total
+
+
+def latest_competency_scores(officer_id: int, competency_ids: Optional[Iterable[int]] = None) -> dict[int, float]:
+    """{competency_id: последний балл} офицера — один запрос к снапшоту."""
+    qs = OfficerCompetencySnapshot.objects.filter(officer_id=officer_id)
+    if competency_ids is not None:
+        qs = qs.filter(competency_id__in=list(competency_ids))
+    return {cid: float(score) for cid, score in qs.values_list("competency_id", "score")}
+
+
+def competency_score_matrix(officer_ids: list[int], competency_ids: list[int]) -> np.ndarray:
+    """
+    Матрица офицер × компетенция из снапшота последних оценок одним запросом.
+    Нет оценки — 0.0.
+    """
+    matrix = np.zeros((len(officer_ids), len(competency_ids)), dtype=np.float64)
+    if not officer_ids or not competency_ids:
+        return matrix
+    row = {oid: i for i, oid in enumerate(officer_ids)}
+    col = {cid: j for j, cid in enumerate(competency_ids)}
+    ratings = OfficerCompetencySnapshot.objects.filter(
+        officer_id__in=officer_ids, competency_id__in=competency_ids
+    ).values_list("officer_id", "competency_id", "score")
+    for oid, cid, score in ratings:
+        matrix[row[oid], col[cid]] = float(score)
+    return matrix
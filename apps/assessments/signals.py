@@ -0,0 +1,68 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from .models import Assessment, AssessmentItem, Feedback360, CompetencyRating
+from .services import apply_ratings_to_snapshots, refresh_competency_snapshot
+from .rollups import apply_ratings_to_rollups, refresh_rollups_for_rating
+from .summary import invalidate_cycle_summary
+
+# Новые CompetencyRating (kwargs: ratings — список).
+# Шлётся и для обычного save(), и явно из пакетных путей с bulk_create, где post_save не срабатывает.
+competency_ratings_created = Signal()
+
+# поля оценки, от которых зависят снапшот и агрегаты
+RATING_FIELDS = ("officer_id", "competency_id", "source", "score", "assessed_at")
+
+
+@receiver(pre_save, sender=CompetencyRating)
+def remember_rating(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        row = CompetencyRating.objects.filter(pk=instance.pk).values(*RATING_FIELDS).first()
+        instance._rating_before = CompetencyRating(**row) if row else None
+
+
+@receiver(post_save, sender=CompetencyRating)
+def rating_created(sender, instance, created, **kwargs):
+    before = instance.__dict__.pop("_rating_before", None)
+    if created:
+        competency_ratings_created.send(sender=CompetencyRating, ratings=[instance])
+        return
+    if before is None:
+        return
+    # изменённая оценка (админка/API): снапшот и агрегаты — по прежним и новым значениям
+    for officer_id, competency_id in {(before.officer_id, before.competency_id),
+                                      (instance.officer_id, instance.competency_id)}:
+        refresh_competency_snapshot(officer_id, competency_id)
+    refresh_rollups_for_rating(before)
+    refresh_rollups_for_rating(instance)
+
+
+@receiver(competency_ratings_created)
+def update_competency_snapshots(sender, ratings, **kwargs):
+    apply_ratings_to_snapshots(ratings)
+
+
+@receiver(competency_ratings_created)
+def update_rating_rollups(sender, ratings, **kwargs):
+    apply_ratings_to_rollups(ratings)
+
+
+@receiver(post_delete, sender=CompetencyRating)
+def refresh_snapshot_on_delete(sender, instance, **kwargs):
+    refresh_competency_snapshot(instance.officer_id, instance.competency_id)
+
+
+@receiver(post_delete, sender=CompetencyRating)
+def refresh_rollups_on_delete(sender, instance, **kwargs):
+    refresh_rollups_for_rating(instance)
+
+
+# пакетные пути (replace_assessment_items, агрегация, генерация оценщиков) сбрасывают сводку сами
+@receiver(post_save, sender=Assessment)
+@receiver(post_delete, sender=Assessment)
+@receiver(post_save, sender=AssessmentItem)
+@receiver(post_delete, sender=AssessmentItem)
+@receiver(post_save, sender=Feedback360)
+@receiver(post_delete, sender=Feedback360)
+def invalidate_cycle_summaries(sender, **kwargs):
+    invalidate_cycle_summary()
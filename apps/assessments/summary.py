@@ -0,0 +1,116 @@
+"""
+Сводка по циклу аттестаций для HR: сколько создано, с оценками (items), с заполненными 360,
+агрегировано; разбивка по подразделениям и список просроченных.
+
+Счётчики — сгруппированными агрегатными запросами по подразделению (без выгрузки аттестаций),
+итог цикла — сумма строк разбивки. Результат кэшируется по (цикл, юнит, параметры, версия);
+версия повышается при записи аттестаций, items и 360 (см. signals и пакетные пути в services/raters).
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.versions import get_version, bump_version
+from apps.directory.models import Unit
+from .models import Assessment, AssessmentItem, Feedback360
+
+CYCLE_SUMMARY_VERSION_KEY = "assessment_cycle_summary"
+CYCLE_SUMMARY_CACHE_TIMEOUT = 60 * 60
+DEFAULT_OVERDUE_DAYS = 30
+DEFAULT_OVERDUE_LIMIT = 50
+
+COUNTERS = ("assessments", "with_items", "with_feedback", "aggregated", "overdue",
+            "feedback_submitted", "feedback_pending")
+
+
+def invalidate_cycle_summary():
+    """Сбросить закэшированные сводки после коммита текущей транзакции."""
+    transaction.on_commit(lambda: bump_version(CYCLE_SUMMARY_VERSION_KEY))
+
+
+def _by_unit(assessments, overdue_before) -> dict:
+    """{unit_id: {счётчик: n}} — двумя сгруппированными запросами."""
+    rows = {}
+    for r in assessments.annotate(
+        has_items=Exists(AssessmentItem.objects.filter(assessment_id=OuterRef("pk"))),
+        has_feedback=Exists(Feedback360.objects.filter(assessment_id=OuterRef("pk"),
+                                                       status=Feedback360.Status.SUBMITTED)),
+    ).values("officer__unit_id").annotate(
+        assessments=Count("id"),
+        with_items=Count("id", filter=Q(has_items=True)),
+        with_feedback=Count("id", filter=Q(has_feedback=True)),
+        aggregated=Count("id", filter=Q(aggregated_at__isnull=False)),
+        overdue=Count("id", filter=Q(aggregated_at__isnull=True, created_at__lt=overdue_before)),
+    ).order_by():
+        unit_id = r.pop("officer__unit_id")
+        rows[unit_id] = {**r, "feedback_submitted": 0, "feedback_pending": 0}
+
+    for r in Feedback360.objects.filter(assessment__in=assessments) \
+            .values("assessment__officer__unit_id", "status").annotate(n=Count("id")).order_by():
+        row = rows.get(r["assessment__officer__unit_id"])
+        if row is not None:
+            key = "feedback_submitted" if r["status"] == Feedback360.Status.SUBMITTED else "feedback_pending"
+            row[key] += r["n"]
+    return rows
+
+
+def _overdue(assessments, overdue_before, limit: int) -> list[dict]:
+    """Самые старые неагрегированные аттестации старше порога."""
+    rows = assessments.filter(aggregated_at__isnull=True, created_at__lt=overdue_before).annotate(
+        items_count=Count("items", distinct=True),
+        pending_feedback=Count("feedback_360", filter=Q(feedback_360__status=Feedback360.Status.PENDING),
+                               distinct=True),
+    ).order_by("created_at", "id").values(
+        "id", "officer_id", "officer__full_name", "officer__user__email", "officer__unit_id",
+        "assessment_type", "created_at", "items_count", "pending_feedback",
+    )[:limit]
+    return [{
+        "assessment": r["id"],
+        "officer": r["officer_id"],
+        "full_name": r["officer__full_name"] or r["officer__user__email"],
+        "unit": r["officer__unit_id"],
+        "assessment_type": r["assessment_type"],
+        "created_at": r["created_at"],
+        "items": r["items_count"],
+        "pending_feedback": r["pending_feedback"],
+    } for r in rows]
+
+
+def cycle_summary(cycle: str, unit_ids=None, overdue_days: int = DEFAULT_OVERDUE_DAYS,
+                  overdue_limit: int = DEFAULT_OVERDUE_LIMIT, cache_suffix: str = "") -> dict:
+    """
+    Сводка по циклу. unit_ids — ограничить подразделениями (None — весь цикл);
+    просроченная — не агрегирована дольше overdue_days дней с создания.
+    cache_suffix — отличает ограничения по юнитам в ключе кэша (например, id корня поддерева).
+    """
+    version = get_version(CYCLE_SUMMARY_VERSION_KEY)
+    today = timezone.localdate()
+    key = f"assessments:cycle_summary:{version}:{cycle}:{cache_suffix}:{overdue_days}:{overdue_limit}:{today}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    assessments = Assessment.objects.filter(cycle=cycle)
+    if unit_ids is not None:
+        assessments = assessments.filter(officer__unit_id__in=list(unit_ids))
+    overdue_before = timezone.now() - timedelta(days=overdue_days)
+
+    rows = _by_unit(assessments, overdue_before)
+    names = dict(Unit.objects.filter(id__in=[u for u in rows if u is not None]).values_list("id", "name"))
+    units = sorted(({"unit": uid, "unit_name": names.get(uid), **counters} for uid, counters in rows.items()),
+                   key=lambda r: (-r["assessments"], r["unit"] or 0))
+    totals = {c: sum(r[c] for r in rows.values()) for c in COUNTERS}
+
+    result = {
+        "cycle": cycle,
+        "overdue_days": overdue_days,
+        "totals": totals,
+        "units": units,
+        "overdue": _overdue(assessments, overdue_before, overdue_limit),
+        "computed_at": timezone.now(),
+    }
+    cache.set(key, result, CYCLE_SUMMARY_CACHE_TIMEOUT)
+    return result
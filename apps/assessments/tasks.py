@@ -0,0 +1,80 @@
+from celery import shared_task
+
+from apps.jobs.services import run_job
+from apps.directory.hierarchy import subtree_q
+from .models import Assessment, Feedback360
+from .calibration import RaterCalibration
+from .services import aggregate_assessments_to_ratings
+from .raters import RaterDirectory, generate_pending_feedback, DEFAULT_MAX_COLLEAGUES, DEFAULT_MAX_SUBORDINATES
+
+AGGREGATE_CYCLE_JOB = "assessments.aggregate_cycle"
+GENERATE_RATERS_JOB = "assessments.generate_raters"
+CHUNK_SIZE = 500
+
+
+def cycle_assessments(cycle: str, units=None):
+    """Аттестации цикла; units — корни юнитов (с подчинёнными), которыми ограничен запустивший (None — весь цикл)."""
+    qs = Assessment.objects.filter(cycle=cycle)
+    return qs if units is None else qs.filter(subtree_q("officer__unit_id", units))
+
+
+def scope_units(scope):
+    """Ограничение задачи по области видимости: None — весь цикл (ADMIN/ROOT), иначе корни юнитов."""
+    return None if scope.sees_all else scope.unit_roots()
+
+
+@shared_task
+def aggregate_cycle_task(job_id: int):
+    """
+    Агрегация всех аттестаций цикла в CompetencyRating пачками по CHUNK_SIZE с прогрессом в Job.
+    params.calibrate — калибровать 360 по оценщикам (статистика — один раз на весь цикл);
+    params.units — только аттестации офицеров этих юнитов с подчинёнными (область видимости HR).
+    """
+    with run_job(job_id) as progress:
+        cycle = progress.params["cycle"]
+        assessments = cycle_assessments(cycle, progress.params.get("units"))
+        ids = list(assessments.order_by("id").values_list("id", flat=True))
+        progress.set_total(len(ids))
+        calibration = None
+        if progress.params.get("calibrate"):
+            calibration = RaterCalibration.for_raters(Feedback360.objects.filter(
+                assessment__in=assessments, status=Feedback360.Status.SUBMITTED,
+            ).values_list("rater_id", flat=True).distinct())
+        ratings = 0
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = list(Assessment.objects.filter(id__in=ids[start:start + CHUNK_SIZE]).only("id", "officer_id"))
+            try:
+                ratings += sum(len(r) for r in aggregate_assessments_to_ratings(chunk, calibration).values())
+            except Exception as e:
+                progress.error(str(e), assessments=[a.id for a in chunk[:10]], offset=start)
+            progress.advance(len(chunk))
+        progress.result = {"cycle": cycle, "assessments": len(ids), "ratings": ratings,
+                           "calibrated": calibration is not None}
+
+
+@shared_task
+def generate_raters_task(job_id: int):
+    """
+    Наборы оценщиков 360 и PENDING-записи для всех аттестаций цикла пачками по CHUNK_SIZE с прогрессом в Job.
+    params.units — только аттестации офицеров этих юнитов с подчинёнными (область видимости HR).
+    """
+    with run_job(job_id) as progress:
+        params = progress.params
+        assessments = list(cycle_assessments(params["cycle"], params.get("units"))
+                           .order_by("id").only("id", "officer_id"))
+        progress.set_total(len(assessments))
+        directory = RaterDirectory({a.officer_id for a in assessments})
+        totals = {"raters": 0, "feedback": 0}
+        for start in range(0, len(assessments), CHUNK_SIZE):
+            chunk = assessments[start:start + CHUNK_SIZE]
+            try:
+                stats = generate_pending_feedback(
+                    chunk, directory,
+                    max_colleagues=params.get("max_colleagues", DEFAULT_MAX_COLLEAGUES),
+                    max_subordinates=params.get("max_subordinates", DEFAULT_MAX_SUBORDINATES),
+                )
+                totals = {k: totals[k] + stats[k] for k in totals}
+            except Exception as e:
+                progress.error(str(e), assessments=[a.id for a in chunk[:10]], offset=start)
+            progress.advance(len(chunk))
+        progress.result = {"cycle": params["cycle"], "assessments": len(assessments), **totals}
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
@@ -10,37 +11,45 @@ from core.schemas import PayloadTemplatesResponseSerializer
 from core.json_payloads import FEEDBACK360_TEMPLATE, FEEDBACK360_SCHEMA
 
 from core.permissions import IsAdminOrRoot
-from apps.users.models import OfficerProfile, CustomUser, CommanderAssignment
+from apps.users.models import OfficerProfile, CustomUser
+from apps.users.scope import get_scope
 from apps.assessments.models import (
-    Assessment, AssessmentItem, CompetencyRating, Rater, Feedback360
+    Assessment, AssessmentItem, CompetencyRating, Rater, Feedback360, RatingRollupBase
 )
+from apps.directory.services import unit_subtree_ids, user_can_view_unit
+from apps.directory.filters import UnitSubtreeFilter
 from .serializers import (
     AssessmentSerializer, AssessmentItemSerializer, CompetencyRatingSerializer,
     RaterSerializer, Feedback360Serializer
 )
-from .services import aggregate_assessment_to_ratings
+from .services import aggregate_assessment_to_ratings, replace_assessment_items
+from .rollups import unit_competency_trends, officer_competency_trends
+from .calibration import RaterCalibration
+from .summary import cycle_summary, DEFAULT_OVERDUE_DAYS, DEFAULT_OVERDUE_LIMIT
+from .raters import DEFAULT_MAX_COLLEAGUES, DEFAULT_MAX_SUBORDINATES
+from .tasks import (
+    aggregate_cycle_task, AGGREGATE_CYCLE_JOB, generate_raters_task, GENERATE_RATERS_JOB,
+    cycle_assessments, scope_units,
+)
+from apps.jobs.services import start_job
+from apps.jobs.serializers import JobSerializer
+
+
+def _flag(value) -> bool:
+    return str(value).lower() in ("1", "true", "yes")
 
 
 def visible_officers_for(user: CustomUser):
-    role = getattr(user, "role", None)
-    base = OfficerProfile.objects.select_related("user")
-    if role == "OFFICER":
-        return base.filter(user=user)
-    if role == "COMMANDER":
-        subs = CommanderAssignment.objects.filter(
-            commander__user=user, until__isnull=True
-        ).values_list("officer_id", flat=True)
-        return base.filter(id__in=list(subs))
-    # HR/ADMIN/ROOT
-    return base
+    return OfficerProfile.objects.select_related("user").filter(get_scope(user).officer_q())
 
 
 # ---------- Assessments ----------
 class AssessmentViewSet(viewsets.ModelViewSet):
     serializer_class = AssessmentSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["officer", "assessment_type", "cycle"]
+    unit_subtree_field = "officer__unit"
     search_fields = ["cycle", "officer__user__email"]
     ordering = ["-created_at"]
 
@@ -62,8 +71,7 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         if role == "OFFICER":
             raise PermissionError("Офицер не может создавать аттестацию")
         if role == "COMMANDER":
-            if not CommanderAssignment.objects.filter(commander__user=user, officer=officer,
-                                                      until__isnull=True).exists():
+            if not get_scope(user).can_view_officer(officer.id):
                 raise PermissionError("Командир может аттестовать только подчинённых")
 
         serializer.save(created_by=user)
@@ -71,9 +79,10 @@ class AssessmentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def add_items(self, request, pk=None):
         """
-        Добавить/заменить набор оценок по компетенциям (удаляет старые items).
+        Заменить набор оценок по компетенциям: новые добавляются, изменившиеся обновляются,
+        отсутствующие в списке удаляются (пакетно, одной транзакцией, одной записью аудита).
         Командир/HR/ADMIN/ROOT.
-        body: { items: [{competency, score, comment?}, ...] }
+        body: { items: [{competency, score, comment?}, ...] } — компетенции не повторяются
         """
         assessment = self.get_object()
         user = request.user
@@ -84,12 +93,14 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         if not isinstance(items, list):
             return Response({"detail": "items must be a list"}, status=400)
 
-        assessment.items.all().delete()
-        for it in items:
-            ser = AssessmentItemSerializer(data=it)
-            ser.is_valid(raise_exception=True)
-            ser.save(assessment=assessment)
+        ser = AssessmentItemSerializer(data=items, many=True)
+        ser.is_valid(raise_exception=True)
+        competencies = [it["competency"].pk for it in ser.validated_data]
+        if len(competencies) != len(set(competencies)):
+            return Response({"detail": "duplicate competency in items"}, status=400)
 
+        replace_assessment_items(assessment, ser.validated_data, actor=user)
+        assessment = self.get_queryset().prefetch_related("items__competency").get(pk=assessment.pk)
         return Response(AssessmentSerializer(assessment).data, status=200)
 
     @extend_schema(
@@ -134,18 +145,104 @@ class AssessmentViewSet(viewsets.ModelViewSet):
         # офицер не может подставлять чужих ратеров без логики — принимаем как есть,
         # но можно усилить проверку по подразделению при необходимости.
 
-        obj = ser.save()
+        # заготовка из генерации набора оценщиков цикла — заполняем её, а не создаём вторую запись
+        pending = Feedback360.objects.filter(assessment=assessment, rater=rater,
+                                             status=Feedback360.Status.PENDING).order_by("id").first()
+        if pending is not None:
+            ser.instance = pending
+        obj = ser.save(status=Feedback360.Status.SUBMITTED)
         return Response(Feedback360Serializer(obj).data, status=201)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def aggregate(self, request, pk=None):
         """
         Агрегирует оценки в CompetencyRating (пересоздаёт новые записи для данного офицера).
+        body: {"calibrate": false} — калибровать баллы 360 по истории каждого оценщика
         """
         assessment = self.get_object()
-        created = aggregate_assessment_to_ratings(assessment)
+        calibration = None
+        if _flag(request.data.get("calibrate")):
+            calibration = RaterCalibration.for_raters(
+                assessment.feedback_360.filter(status=Feedback360.Status.SUBMITTED).values_list("rater_id", flat=True))
+        created = aggregate_assessment_to_ratings(assessment, calibration=calibration)
         return Response(CompetencyRatingSerializer(created, many=True).data, status=201)
 
+    @action(detail=False, methods=["post"], url_path="aggregate-cycle")
+    def aggregate_cycle(self, request):
+        """
+        Агрегировать все аттестации цикла в CompetencyRating фоновой задачей (202 + Job).
+        HR — только офицеров своих юнитов (с подчинёнными); ADMIN/ROOT — весь цикл.
+        body: {"cycle": "2025", "calibrate": false} — calibrate: калибровать 360 по оценщикам
+        """
+        if request.user.role not in ("HR", "ADMIN", "ROOT"):
+            return Response({"detail": "Forbidden"}, status=403)
+        cycle = request.data.get("cycle")
+        if not cycle:
+            return Response({"detail": "cycle is required"}, status=400)
+        units = scope_units(get_scope(request.user))
+        total = cycle_assessments(cycle, units).count()
+        if not total:
+            return Response({"detail": "No assessments in cycle"}, status=404)
+        job = start_job(aggregate_cycle_task, AGGREGATE_CYCLE_JOB,
+                        params={"cycle": cycle, "calibrate": _flag(request.data.get("calibrate")), "units": units},
+                        user=request.user, total=total)
+        return Response(JobSerializer(job).data, status=202)
+
+    @action(detail=False, methods=["get"], url_path="cycle-summary")
+    def cycle_summary(self, request):
+        """
+        Сводка по циклу: создано, с оценками, с заполненными 360, агрегировано, просрочено;
+        разбивка по подразделениям и список просроченных (старейшие первыми).
+        query: cycle=2025, unit=<id> (с подчинёнными), overdue_days=30, limit=50
+        Весь цикл — HR/ADMIN/ROOT; по юниту — в пределах видимости (в т.ч. командиру).
+        """
+        params = request.query_params
+        cycle = params.get("cycle")
+        if not cycle:
+            return Response({"detail": "cycle is required"}, status=400)
+        try:
+            unit_id = int(params["unit"]) if params.get("unit") else None
+            overdue_days = max(0, int(params.get("overdue_days", DEFAULT_OVERDUE_DAYS)))
+            limit = min(max(0, int(params.get("limit", DEFAULT_OVERDUE_LIMIT))), 500)
+        except ValueError:
+            return Response({"detail": "unit, overdue_days, limit must be integers"}, status=400)
+        if unit_id is None:
+            if request.user.role not in ("HR", "ADMIN", "ROOT"):
+                return Response({"detail": "Forbidden"}, status=403)
+            return Response(cycle_summary(cycle, overdue_days=overdue_days, overdue_limit=limit))
+        if not user_can_view_unit(request.user, unit_id):
+            return Response({"detail": "Forbidden"}, status=403)
+        return Response(cycle_summary(cycle, unit_ids=unit_subtree_ids(unit_id), overdue_days=overdue_days,
+                                      overdue_limit=limit, cache_suffix=f"unit{unit_id}"))
+
+    @action(detail=False, methods=["post"], url_path="generate-raters")
+    def generate_raters(self, request):
+        """
+        Сформировать наборы оценщиков 360 для всех аттестаций цикла фоновой задачей (202 + Job):
+        командиры, коллеги по подразделению, подчинённые; на каждую пару — Feedback360 в статусе PENDING.
+        Повторный запуск дублей не создаёт. HR — только офицеров своих юнитов (с подчинёнными); ADMIN/ROOT — весь цикл.
+        body: {"cycle": "2025", "max_colleagues": 5, "max_subordinates": 5}
+        """
+        if request.user.role not in ("HR", "ADMIN", "ROOT"):
+            return Response({"detail": "Forbidden"}, status=403)
+        cycle = request.data.get("cycle")
+        if not cycle:
+            return Response({"detail": "cycle is required"}, status=400)
+        try:
+            params = {
+                "cycle": cycle,
+                "units": scope_units(get_scope(request.user)),
+                "max_colleagues": max(0, int(request.data.get("max_colleagues", DEFAULT_MAX_COLLEAGUES))),
+                "max_subordinates": max(0, int(request.data.get("max_subordinates", DEFAULT_MAX_SUBORDINATES))),
+            }
+        except (TypeError, ValueError):
+            return Response({"detail": "max_colleagues and max_subordinates must be integers"}, status=400)
+        total = cycle_assessments(cycle, params["units"]).count()
+        if not total:
+            return Response({"detail": "No assessments in cycle"}, status=404)
+        job = start_job(generate_raters_task, GENERATE_RATERS_JOB, params=params, user=request.user, total=total)
+        return Response(JobSerializer(job).data, status=202)
+
     @extend_schema(
         summary="Шаблон payload и JSON-schema для Feedback360",
         responses={200: PayloadTemplatesResponseSerializer},
@@ -192,8 +289,9 @@ class RaterViewSet(viewsets.ModelViewSet):
 class CompetencyRatingViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CompetencyRatingSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["officer", "competency", "source"]
+    unit_subtree_field = "officer__unit"
     search_fields = ["officer__user__email", "competency__name"]
     ordering = ["-assessed_at"]
 
@@ -201,3 +299,36 @@ class CompetencyRatingViewSet(viewsets.ReadOnlyModelViewSet):
         officers = visible_officers_for(self.request.user)
         return CompetencyRating.objects.select_related("officer", "officer__user", "competency").filter(
             officer__in=officers)
+
+    @action(detail=False, methods=["get"], url_path="trends")
+    def trends(self, request):
+        """
+        Динамика оценок из помесячных/поквартальных агрегатов (без сырых оценок).
+        query: unit=<id> (с подчинёнными, все источники) или officer=<id> (по источникам);
+               period=MONTH|QUARTER, competency=<id> (можно повторять), from/to=YYYY-MM-DD
+        unit — HR/командир по своим юнитам, ADMIN/ROOT — по любому; officer — в пределах видимости.
+        """
+        params = request.query_params
+        period = params.get("period", RatingRollupBase.Period.MONTH).upper()
+        if period not in RatingRollupBase.Period.values:
+            return Response({"detail": "period must be MONTH or QUARTER"}, status=400)
+        try:
+            competency_ids = [int(c) for c in params.getlist("competency")]
+            unit_id = int(params["unit"]) if params.get("unit") else None
+            officer_id = int(params["officer"]) if params.get("officer") else None
+            date_from, date_to = parse_date(params.get("from") or ""), parse_date(params.get("to") or "")
+        except ValueError:
+            return Response({"detail": "unit, officer, competency must be ids; from/to — YYYY-MM-DD"}, status=400)
+        if (unit_id is None) == (officer_id is None):
+            return Response({"detail": "specify either unit or officer"}, status=400)
+
+        filters_ = dict(period=period, competency_ids=competency_ids, date_from=date_from, date_to=date_to)
+        if unit_id is not None:
+            if not user_can_view_unit(request.user, unit_id):
+                return Response({"detail": "Forbidden"}, status=403)
+            series = unit_competency_trends(unit_subtree_ids(unit_id), **filters_)
+            return Response({"unit": unit_id, "period": period, "series": series})
+        if not visible_officers_for(request.user).filter(id=officer_id).exists():
+            return Response({"detail": "Not found"}, status=404)
+        series = officer_competency_trends(officer_id, **filters_)
+        return Response({"officer": officer_id, "period": period, "series": series})
@@ -4,13 +4,16 @@ from django.dispatch import receiver
 from django.forms.models import model_to_dict
 from django.conf import settings
 
-from .utils import log_event
+from .utils import log_event, is_audit_suppressed
 
 AUDIT_EXCLUDE_MODELS = getattr(settings, "AUDIT_EXCLUDE_MODELS", set())
 AUDIT_SKIP_DURING_MIGRATIONS = getattr(settings, "AUDIT_SKIP_DURING_MIGRATIONS", True)
 
 
 def _skip_now() -> bool:
+    # Пакетная операция сама пишет сводную запись (audit_suppressed)
+    if is_audit_suppressed():
+        return True
     # Во время миграций сигналы шумят данными, а таблиц может не быть
     if not AUDIT_SKIP_DURING_MIGRATIONS:
         return False
@@ -1,3 +1,6 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.db import connection
@@ -8,6 +11,26 @@ from django.db.models.fields.files import ImageFieldFile, FileField
 import json
 
 
+_suppressed = ContextVar("audit_suppressed", default=False)
+
+
+@contextmanager
+def audit_suppressed():
+    """
+    Внутри блока сигналы post_save/post_delete не пишут аудит построчно —
+    для пакетных операций, которые логируют одну сводную запись через log_event.
+    """
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def is_audit_suppressed() -> bool:
+    return _suppressed.get()
+
+
 def _contenttypes_ready() -> bool:
     """Проверяем, что таблица django_content_type существует (важно при migrate)."""
     try:
@@ -11,7 +11,7 @@ from core.json_payloads import NOTIFICATION_TEMPLATES, NOTIFICATION_SCHEMA
 
 from core.responses import APIResponse
 from core.permissions import IsAdminOrRoot, IsCommanderOrHR
-from apps.users.models import CommanderProfile, OfficerProfile, CommanderAssignment
+from apps.users.scope import get_scope
 from .models import Notification, SupportTicket, TicketMessage
 from .serializers import (
     NotificationSerializer, SupportTicketSerializer, TicketMessageSerializer
@@ -28,21 +28,14 @@ def _commander_visible_user_ids(user) -> set[int]:
     """
     if getattr(user, "role", None) != "COMMANDER":
         return set()
-    me = CommanderProfile.objects.filter(user=user).select_related("unit").first()
-    if not me or not me.unit_id:
-        return {user.id}
-    today = timezone.now().date()
-    # 1) офицеры его подразделения
-    qs_unit = OfficerProfile.objects.filter(unit_id=me.unit_id).values_list("user_id", flat=True)
-    # 2) активные оверрайды
-    include_officer_ids = CommanderAssignment.objects.filter(
-        commander=me
-    ).filter(
-        Q(until__isnull=True) | Q(until__gte=today)
-    ).values_list("officer_id", flat=True)
-    qs_override = OfficerProfile.objects.filter(id__in=include_officer_ids).values_list("user_id", flat=True)
-    ids = set(qs_unit) | set(qs_override) | {user.id}
-    return ids
+    return set(get_scope(user).command_user_ids().values_list("user_id", flat=True)) | {user.id}
+
+
+def _can_manage_ticket(user, ticket) -> bool:
+    """HR/ADMIN/ROOT; автор; командир — тикеты своего состава."""
+    if is_staffish(user) or ticket.author_id == user.id:
+        return True
+    return getattr(user, "role", None) == "COMMANDER" and get_scope(user).can_view_user(ticket.author_id)
 
 
 # ---------- Notifications ----------
@@ -146,8 +139,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         if is_staffish(user):
             return base.all()
         if getattr(user, "role", None) == "COMMANDER":
-            allowed_ids = _commander_visible_user_ids(user)
-            return base.filter(author_id__in=allowed_ids)
+            return base.filter(Q(author=user) | Q(author_id__in=get_scope(user).command_user_ids()))
         # прочие — только свои
         return base.filter(author=user)
 
@@ -162,7 +154,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
             return super().update(request, *args, **kwargs)
 
         if getattr(user, "role", None) == "COMMANDER":
-            if ticket.author_id in _commander_visible_user_ids(user):
+            if get_scope(user).can_view_user(ticket.author_id):
                 return super().update(request, *args, **kwargs)
             return APIResponse.forbidden("Нет доступа (не ваш состав)")
 
@@ -178,7 +170,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
             return super().destroy(request, *args, **kwargs)
 
         if getattr(user, "role", None) == "COMMANDER":
-            if ticket.author_id in _commander_visible_user_ids(user):
+            if get_scope(user).can_view_user(ticket.author_id):
                 return super().destroy(request, *args, **kwargs)
             return APIResponse.forbidden("Нет доступа (не ваш состав)")
 
@@ -190,7 +182,10 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def my(self, request):
         qs = SupportTicket.objects.filter(author=request.user).order_by("-created_at")
-        return APIResponse.success(SupportTicketSerializer(qs, many=True).data)
+        page = self.paginate_queryset(qs)
+        if page is None:
+            return APIResponse.success(SupportTicketSerializer(qs, many=True).data)
+        return APIResponse.success(self.paginator.get_paginated_data(SupportTicketSerializer(page, many=True).data))
 
     @extend_schema(
         summary="Ответить в тикете",
@@ -206,11 +201,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         ticket = self.get_object()
         user = request.user
         # доступ: HR/ADMIN/ROOT; или автор; или COMMANDER в пределах состава
-        if not (
-            is_staffish(user)
-            or ticket.author_id == user.id
-            or (getattr(user, "role", None) == "COMMANDER" and ticket.author_id in _commander_visible_user_ids(user))
-        ):
+        if not _can_manage_ticket(user, ticket):
             return APIResponse.forbidden("Нет доступа к тикету")
 
         text = request.data.get("body", "").strip()
@@ -226,11 +217,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         """
         ticket = self.get_object()
         user = request.user
-        if not (
-            is_staffish(user)
-            or ticket.author_id == user.id
-            or (getattr(user, "role", None) == "COMMANDER" and ticket.author_id in _commander_visible_user_ids(user))
-        ):
+        if not _can_manage_ticket(user, ticket):
             return APIResponse.forbidden("Нет доступа")
         ticket.status = SupportTicket.TicketStatus.CLOSED
         ticket.save(update_fields=["status"])
@@ -249,7 +236,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         """
         ticket = self.get_object()
         if getattr(request.user, "role", None) == "COMMANDER":
-            if ticket.author_id not in _commander_visible_user_ids(request.user):
+            if not _can_manage_ticket(request.user, ticket):
                 return APIResponse.forbidden("Командир может менять статус только в тикетах своего состава")
         status_value = request.data.get("status")
         valid = [c[0] for c in SupportTicket.TicketStatus.choices]
@@ -274,7 +261,6 @@ class TicketMessageViewSet(viewsets.ReadOnlyModelViewSet):
         if is_staffish(user):
             return qs
         if getattr(user, "role", None) == "COMMANDER":
-            allowed_ids = _commander_visible_user_ids(user)
-            return qs.filter(ticket__author_id__in=allowed_ids)
+            return qs.filter(Q(ticket__author=user) | Q(ticket__author_id__in=get_scope(user).command_user_ids()))
         # не staff и не командир: только свои тикеты
         return qs.filter(ticket__author=user)
@@ -5,3 +5,6 @@ class DirectoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.directory'
     verbose_name = 'Справочники'
+
+    def ready(self):
+        from . import signals  # noqa
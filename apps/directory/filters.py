@@ -0,0 +1,32 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .hierarchy import subtree_q, ancestors_q
+
+
+class UnitSubtreeFilter(BaseFilterBackend):
+    """
+    Фильтры по иерархии юнитов через замыкание (UnitClosure), для любого вьюсета:
+    ?unit_subtree=<id>  — юнит и все подчинённые;
+    ?unit_ancestors=<id> — юнит и все вышестоящие.
+    Путь к юниту задаётся атрибутом вьюсета unit_subtree_field ("unit", "officer__unit";
+    "" — сам queryset юнитов). Без атрибута фильтр не действует.
+    """
+    subtree_param = "unit_subtree"
+    ancestors_param = "unit_ancestors"
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, "unit_subtree_field", None)
+        if field is None:
+            return queryset
+        path = f"{field}_id" if field else "id"
+        for param, make_q in ((self.subtree_param, subtree_q), (self.ancestors_param, ancestors_q)):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                unit_id = int(value)
+            except ValueError:
+                raise ValidationError({param: ["Ожидается id юнита"]})
+            queryset = queryset.filter(make_q(path, unit_id))
+        return queryset
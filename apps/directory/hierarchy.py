@@ -0,0 +1,118 @@
+"""
+Иерархия юнитов через таблицу замыкания UnitClosure.
+
+- insert_unit — новый юнит: (он сам, 0) + все предки родителя на уровень глубже;
+- move_unit   — перенос поддерева: связи «внешние предки × поддерево» удаляются и строятся заново
+                от нового родителя, level поддерева сдвигается одним UPDATE на каждую глубину;
+- rebuild_unit_closure — полный пересчёт (миграция, ремонт), одним проходом по (id, parent_id).
+Фильтры по поддереву/предкам — subtree_q/ancestors_q (подзапрос к замыканию, без дублей строк).
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import Unit, UnitClosure
+
+
+def closure_rows(parents: dict) -> tuple[list[tuple[int, int, int]], dict]:
+    """
+    По {unit_id: parent_id} — ([(ancestor, descendant, depth)], {unit_id: level}).
+    Циклы в данных разрываются (юнит считается корнем).
+    """
+    rows, levels = [], {}
+    for uid in parents:
+        chain, seen, cur = [], set(), uid
+        while cur is not None and cur not in seen and cur in parents:
+            seen.add(cur)
+            chain.append(cur)
+            cur = parents[cur]
+        for depth, ancestor in enumerate(chain):
+            rows.append((ancestor, uid, depth))
+        levels[uid] = len(chain) - 1
+    return rows, levels
+
+
+def rebuild_unit_closure() -> int:
+    """Пересобрать замыкание и level для всех юнитов; возвращает число связей."""
+    parents = dict(Unit.objects.values_list("id", "parent_id"))
+    rows, levels = closure_rows(parents)
+    by_level = defaultdict(list)
+    for uid, level in levels.items():
+        by_level[level].append(uid)
+    with transaction.atomic():
+        UnitClosure.objects.all().delete()
+        UnitClosure.objects.bulk_create(
+            [UnitClosure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in rows], batch_size=2000)
+        for level, ids in by_level.items():
+            Unit.objects.filter(id__in=ids).update(level=level)
+    return len(rows)
+
+
+def check_parent(unit: Unit):
+    """
+    Последний рубеж перед сохранением: юнит нельзя сделать потомком самого себя.
+    Пользовательская проверка — Unit.clean() (админка, full_clean) и сериализатор; сюда доходит
+    только сохранение в обход них, и это ошибка целостности, а не ввода.
+    """
+    if unit.parent_in_subtree():
+        raise IntegrityError(f"Юнит {unit.pk} нельзя подчинить самому себе или своему подчинённому")
+
+
+def _parent_links(parent_id):
+    """[(ancestor_id, depth)] родителя, включая его самого; пусто для корня."""
+    if parent_id is None:
+        return []
+    return list(UnitClosure.objects.filter(descendant_id=parent_id).values_list("ancestor_id", "depth"))
+
+
+def insert_unit(unit: Unit):
+    links = _parent_links(unit.parent_id)
+    UnitClosure.objects.bulk_create(
+        [UnitClosure(ancestor_id=unit.pk, descendant_id=unit.pk, depth=0)]
+        + [UnitClosure(ancestor_id=a, descendant_id=unit.pk, depth=d + 1) for a, d in links],
+        ignore_conflicts=True,
+    )
+    level = len(links)
+    if unit.level != level:
+        Unit.objects.filter(pk=unit.pk).update(level=level)
+        unit.level = level
+
+
+def move_unit(unit: Unit):
+    """Юнит (с поддеревом) перенесён под unit.parent_id."""
+    subtree = dict(UnitClosure.objects.filter(ancestor_id=unit.pk).values_list("descendant_id", "depth"))
+    if not subtree:  # замыкания ещё нет (данные до миграции) — строим как для нового
+        insert_unit(unit)
+        return
+    links = _parent_links(unit.parent_id)
+    with transaction.atomic():
+        UnitClosure.objects.filter(descendant_id__in=list(subtree)) \
+            .exclude(ancestor_id__in=list(subtree)).delete()
+        UnitClosure.objects.bulk_create([
+            UnitClosure(ancestor_id=a, descendant_id=d, depth=pd + 1 + sd)
+            for a, pd in links for d, sd in subtree.items()
+        ], batch_size=2000)
+        by_depth = defaultdict(list)
+        for d, sd in subtree.items():
+            by_depth[sd].append(d)
+        for sd, ids in by_depth.items():
+            Unit.objects.filter(id__in=ids).update(level=len(links) + sd)
+    unit.level = len(links)
+
+
+def subtree_q(field: str, unit_ids) -> Q:
+    """Q: значение field (id юнита, например "unit_id" или "officer__unit_id") — в поддеревьях unit_ids."""
+    roots = [unit_ids] if isinstance(unit_ids, int) else list(unit_ids)
+    return Q(**{f"{field}__in": UnitClosure.objects.filter(ancestor_id__in=roots).values("descendant_id")})
+
+
+def ancestors_q(field: str, unit_id: int) -> Q:
+    """Q: значение field — сам юнит unit_id или один из его предков."""
+    return Q(**{f"{field}__in": UnitClosure.objects.filter(descendant_id=unit_id).values("ancestor_id")})
+
+
+def unit_ancestor_ids(unit_id: int) -> list[int]:
+    """Предки юнита от корня к нему самому."""
+    return list(UnitClosure.objects.filter(descendant_id=unit_id).order_by("-depth")
+                .values_list("ancestor_id", flat=True))
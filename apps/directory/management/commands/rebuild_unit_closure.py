@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.directory.hierarchy import rebuild_unit_closure
+
+
+class Command(BaseCommand):
+    help = "Пересобрать замыкание иерархии юнитов (UnitClosure) и level — после loaddata или массовых правок parent"
+
+    def handle(self, *args, **opts):
+        links = rebuild_unit_closure()
+        self.stdout.write(self.style.SUCCESS(f"Замыкание пересобрано: связей {links}"))
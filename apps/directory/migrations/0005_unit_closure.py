@@ -0,0 +1,45 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:31
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.directory.hierarchy import closure_rows
+
+
+def backfill_closure(apps, schema_editor):
+    Unit = apps.get_model('directory', 'Unit')
+    UnitClosure = apps.get_model('directory', 'UnitClosure')
+    rows, levels = closure_rows(dict(Unit.objects.values_list('id', 'parent_id')))
+    UnitClosure.objects.bulk_create(
+        [UnitClosure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in rows], batch_size=2000)
+    by_level = defaultdict(list)
+    for uid, level in levels.items():
+        by_level[level].append(uid)
+    for level, ids in by_level.items():
+        Unit.objects.filter(id__in=ids).update(level=level)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0004_alter_position_code_alter_position_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='directory.unit')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='directory.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='directory_u_descend_b15a46_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
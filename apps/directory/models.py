@@ -1,4 +1,5 @@
 # Справочники
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 
@@ -19,11 +20,40 @@ class Unit(models.Model):
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=50, unique=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
-    level = models.PositiveSmallIntegerField(null=True, blank=True)  # можно вычислять сигналом
+    level = models.PositiveSmallIntegerField(null=True, blank=True)  # глубина от корня (0), ведётся сигналом
     is_active = models.BooleanField(default=True)
 
     def __str__(self): return self.name
 
+    def parent_in_subtree(self) -> bool:
+        """Родитель — сам юнит или его подчинённый (перенос под него замкнул бы иерархию в цикл)."""
+        if self.pk is None or self.parent_id is None:
+            return False
+        return self.parent_id == self.pk or UnitClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.parent_id).exists()
+
+    def clean(self):
+        super().clean()
+        if self.parent_in_subtree():
+            raise ValidationError({"parent": "Юнит нельзя подчинить самому себе или своему подчинённому"})
+
+
+class UnitClosure(models.Model):
+    """
+    Замыкание иерархии юнитов: пара (предок, потомок) для всех уровней, включая (юнит, юнит) с depth=0.
+    Ведётся сигналами на создание/перенос Unit (см. apps.directory.hierarchy);
+    «юнит с подчинёнными» — один индексированный join вместо обхода дерева.
+    """
+    ancestor = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [models.Index(fields=['descendant', 'depth'])]
+
+    def __str__(self): return f"{self.ancestor_id} → {self.descendant_id} ({self.depth})"
+
 
 class Position(models.Model):
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE)
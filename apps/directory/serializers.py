@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import (
-    Rank, Unit, Position, PositionRequirement, Competency, CompetencyRequirement, Provider, TrainingCourse, PositionQualification
+    Rank, Unit, UnitClosure, Position, PositionRequirement, Competency, CompetencyRequirement, Provider, TrainingCourse,
+    PositionQualification
 )
 
 
@@ -16,6 +17,14 @@ class UnitSerializer(serializers.ModelSerializer):
     class Meta:
         model = Unit
         fields = ["id", "name", "code", "parent", "parent_name", "level", "is_active"]
+        read_only_fields = ["level"]  # глубина в иерархии, ведётся сигналом
+
+    def validate_parent(self, parent):
+        unit = self.instance
+        if unit is not None and parent is not None and (
+                parent.pk == unit.pk or UnitClosure.objects.filter(ancestor=unit, descendant=parent).exists()):
+            raise serializers.ValidationError("Юнит нельзя подчинить самому себе или своему подчинённому")
+        return parent
 
 
 class PositionSerializer(serializers.ModelSerializer):
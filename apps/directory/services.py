@@ -1,43 +1,257 @@
-from typing import Dict, List, Tuple
-from django.db.models import Prefetch
-from apps.directory.models import Position, CompetencyRequirement
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Prefetch, Count
+
+from core.versions import get_version, get_versions
+from apps.directory.models import Position, PositionRequirement, CompetencyRequirement, Unit, UnitClosure
 from apps.users.models import OfficerProfile
+from apps.assessments.services import latest_competency_scores
+from apps.staffing.models import Vacancy
+
+# ---- профили требований позиций ----
+# глобальная версия (звания/компетенции) + версия требований конкретной позиции, см. apps.directory.signals
+PROFILES_VERSION_KEY = "requirement_profiles"
+PROFILE_CACHE_TIMEOUT = 24 * 60 * 60
+PROFILE_LRU_SIZE = 2048
+
+_profiles = OrderedDict()  # position_id -> RequirementProfile (LRU процесса)
+_profiles_lock = threading.Lock()
+
+
+def position_version_key(position_id: int) -> str:
+    return f"position_requirements:{position_id}"
+
+
+@dataclass(frozen=True)
+class RequirementProfile:
+    """
+    Скомпилированные требования позиции: базовое (первое PositionRequirement) и по компетенциям
+    (в порядке id). Неизменяемый — один экземпляр делится между запросами и потоками.
+    """
+    position_id: int
+    version: Tuple[int, int]
+    has_base: bool = False
+    min_rank_id: Optional[int] = None
+    min_rank_order: Optional[int] = None
+    min_rank_name: Optional[str] = None
+    min_service_years: int = 0
+    competency_ids: Tuple[int, ...] = ()
+    competency_names: Tuple[str, ...] = ()
+    min_scores: Tuple[int, ...] = ()
+    mandatory: Tuple[bool, ...] = ()
+
+    @cached_property
+    def digest(self) -> str:
+        """Хэш содержимого требований (не зависит от счётчиков версий в кэше)."""
+        content = [self.has_base, self.min_rank_order, self.min_service_years,
+                   self.competency_ids, self.min_scores, self.mandatory]
+        return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+    @cached_property
+    def min_scores_array(self) -> np.ndarray:
+        arr = np.array(self.min_scores, dtype=np.float64)
+        arr.flags.writeable = False
+        return arr
+
+    @cached_property
+    def mandatory_array(self) -> np.ndarray:
+        arr = np.array(self.mandatory, dtype=bool)
+        arr.flags.writeable = False
+        return arr
+
+
+def _compile_profiles(versions: Dict[int, Tuple[int, int]]) -> Dict[int, RequirementProfile]:
+    """Два запроса на любое число позиций."""
+    base = {}
+    for req in PositionRequirement.objects.filter(position_id__in=list(versions)).select_related("min_rank") \
+            .order_by("id"):
+        base.setdefault(req.position_id, req)
+    comps = {pid: [] for pid in versions}
+    for cr in CompetencyRequirement.objects.filter(position_id__in=list(versions)).select_related("competency") \
+            .order_by("position_id", "id"):
+        comps[cr.position_id].append(cr)
+
+    profiles = {}
+    for pid, version in versions.items():
+        req, crs = base.get(pid), comps[pid]
+        profiles[pid] = RequirementProfile(
+            position_id=pid,
+            version=version,
+            has_base=req is not None,
+            min_rank_id=req.min_rank_id if req else None,
+            min_rank_order=req.min_rank.order if req else None,
+            min_rank_name=req.min_rank.name if req else None,
+            min_service_years=req.min_service_years if req else 0,
+            competency_ids=tuple(cr.competency_id for cr in crs),
+            competency_names=tuple(cr.competency.name for cr in crs),
+            min_scores=tuple(cr.min_score for cr in crs),
+            mandatory=tuple(cr.is_mandatory for cr in crs),
+        )
+    return profiles
+
+
+def get_requirement_profiles(position_ids: Iterable[int]) -> Dict[int, RequirementProfile]:
+    """
+    Профили требований позиций: LRU процесса → общий кэш → БД.
+    Актуальность — по версиям (правка требований, званий, компетенций их повышает).
+    """
+    ids = list(dict.fromkeys(position_ids))
+    if not ids:
+        return {}
+    raw = get_versions([PROFILES_VERSION_KEY] + [position_version_key(pid) for pid in ids])
+    versions = {pid: (raw[PROFILES_VERSION_KEY], raw[position_version_key(pid)]) for pid in ids}
+
+    result, missing = {}, {}
+    with _profiles_lock:
+        for pid, version in versions.items():
+            profile = _profiles.get(pid)
+            if profile is not None and profile.version == version:
+                _profiles.move_to_end(pid)
+                result[pid] = profile
+            else:
+                missing[pid] = version
+    if not missing:
+        return result
+
+    keys = {pid: f"req_profile:{pid}:{v[0]}.{v[1]}" for pid, v in missing.items()}
+    shared = cache.get_many(list(keys.values()))
+    fetched = {pid: shared[key] for pid, key in keys.items() if key in shared}
+    compiled = _compile_profiles({pid: v for pid, v in missing.items() if pid not in fetched})
+    if compiled:
+        cache.set_many({keys[pid]: profile for pid, profile in compiled.items()}, timeout=PROFILE_CACHE_TIMEOUT)
+
+    with _profiles_lock:
+        for pid, profile in {**fetched, **compiled}.items():
+            _profiles[pid] = profile
+            _profiles.move_to_end(pid)
+            result[pid] = profile
+        while len(_profiles) > PROFILE_LRU_SIZE:
+            _profiles.popitem(last=False)
+    return result
+
+
+def get_requirement_profile(position_id: int) -> RequirementProfile:
+    return get_requirement_profiles([position_id])[position_id]
+
 
 def check_basic_position_requirements(officer: OfficerProfile, position: Position) -> Dict:
     """
     Проверка базовых требований позиции: минимальный ранг, стаж.
     Возвращает dict с passed: bool и деталями.
     """
-    req = position.positionrequirement_set.first()
-    if not req:
+    req = get_requirement_profile(position.pk)
+    if not req.has_base:
         return {"passed": True, "details": "Нет базовых требований"}
-    passed_rank = (officer.rank_id is not None and officer.rank.order >= req.min_rank.order)
-    # стаж в годах
-    service_years = max(0, (officer.service_start_date and (officer.service_start_date.year)) and (  # упрощенно
-                         (position.pk and 0) or 0))
+    passed_rank = (officer.rank_id is not None and officer.rank.order >= req.min_rank_order)
     # Лучше считать через dateutil.relativedelta; здесь отдаём флаг, без вычисления точных лет:
     passed = passed_rank  # и стаж можешь добавить, когда будет точный расчёт
     return {
         "passed": passed,
-        "min_rank": req.min_rank.name,
+        "min_rank": req.min_rank_name,
         "officer_rank": getattr(officer.rank, "name", None),
         "note": "Проверка стажа добавить при интеграции точного расчёта"
     }
 
-def compute_competency_gaps(officer_scores: Dict[int, float], position: Position) -> List[Dict]:
+def compute_competency_gaps(officer_scores: Optional[Dict[int, float]], position: Position,
+                            officer: Optional[OfficerProfile] = None) -> List[Dict]:
     """
-    officer_scores: {competency_id: score}
+    officer_scores: {competency_id: score}; если None — берём последние оценки officer из снапшота.
     Возвращает список пробелов по компетенциям для позиции.
     """
     gaps = []
-    reqs = CompetencyRequirement.objects.filter(position=position).select_related("competency")
-    for r in reqs:
-        curr = officer_scores.get(r.competency_id, 0)
-        if curr < r.min_score:
+    profile = get_requirement_profile(position.pk)
+    if officer_scores is None:
+        officer_scores = latest_competency_scores(officer.id, profile.competency_ids) if officer else {}
+    for cid, name, required in zip(profile.competency_ids, profile.competency_names, profile.min_scores):
+        curr = officer_scores.get(cid, 0)
+        if curr < required:
             gaps.append({
-                "competency_id": r.competency_id,
-                "competency": r.competency.name,
+                "competency_id": cid,
+                "competency": name,
                 "current": curr,
-                "required": r.min_score
+                "required": required
             })
     return gaps
+
+
+def unit_subtree_ids(unit_id) -> set[int]:
+    """
+    id юнита и всех его потомков — один запрос к замыканию UnitClosure.
+    unit_id — id или несколько id корней.
+    """
+    roots = [unit_id] if isinstance(unit_id, int) else list(unit_id)
+    return set(UnitClosure.objects.filter(ancestor_id__in=roots).values_list("descendant_id", flat=True))
+
+
+def user_can_view_unit(user, unit_id: int) -> bool:
+    """ADMIN/ROOT — любой юнит; HR — свои юниты; COMMANDER — свой; с подчинёнными (см. apps.users.scope)."""
+    from apps.users.scope import get_scope
+    return get_scope(user).can_view_unit(unit_id)
+
+
+# ---- дерево юнитов ----
+# структура, состав и вакансии; повышается сигналами Unit/OfficerProfile (directory) и Vacancy (staffing)
+UNIT_TREE_VERSION_KEY = "unit_tree"
+UNIT_TREE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def unit_tree_etag(root_id: Optional[int]) -> str:
+    """ETag дерева — от версии данных и корня, без построения самого дерева."""
+    raw = f"{get_version(UNIT_TREE_VERSION_KEY)}:{root_id}"
+    return '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+
+
+def unit_tree(root_id: Optional[int] = None) -> list[dict]:
+    """
+    Иерархия юнитов вложенными узлами (root_id — поддерево, None — все корни).
+    Узел: id, name, code, level, is_active, officers/vacancies (свои), officers_total/vacancies_total
+    (с подчинёнными), children. Три плоских запроса (юниты, офицеры и открытые вакансии по юнитам),
+    сборка и суммирование — за O(n). Кэшируется по версии UNIT_TREE_VERSION_KEY.
+    """
+    key = f"directory:unit_tree:{get_version(UNIT_TREE_VERSION_KEY)}:{root_id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    officers = dict(OfficerProfile.objects.filter(unit__isnull=False).values("unit_id")
+                    .annotate(n=Count("id")).order_by().values_list("unit_id", "n"))
+    vacancies = dict(Vacancy.objects.exclude(status=Vacancy.VacancyStatus.CLOSED).values("unit_id")
+                     .annotate(n=Count("id")).order_by().values_list("unit_id", "n"))
+    nodes, children = {}, {}
+    for uid, parent_id, name, code, level, is_active in Unit.objects.order_by("name", "id") \
+            .values_list("id", "parent_id", "name", "code", "level", "is_active"):
+        nodes[uid] = {"id": uid, "name": name, "code": code, "level": level, "is_active": is_active,
+                      "officers": officers.get(uid, 0), "vacancies": vacancies.get(uid, 0), "children": []}
+        children.setdefault(parent_id, []).append(uid)
+
+    if root_id is not None:
+        roots = [root_id] if root_id in nodes else []
+    else:
+        roots = list(children.get(None, []))
+    # обход в глубину без рекурсии; итоги поддеревьев — в обратном порядке обхода
+    order, stack, seen = [], list(roots), set()
+    while stack:
+        uid = stack.pop()
+        if uid in seen:
+            continue
+        seen.add(uid)
+        order.append(uid)
+        for child in children.get(uid, ()):
+            nodes[uid]["children"].append(nodes[child])
+            stack.append(child)
+    for uid in reversed(order):
+        node = nodes[uid]
+        node["officers_total"] = node["officers"] + sum(c["officers_total"] for c in node["children"])
+        node["vacancies_total"] = node["vacancies"] + sum(c["vacancies_total"] for c in node["children"])
+
+    result = [nodes[uid] for uid in roots]
+    cache.set(key, result, UNIT_TREE_CACHE_TIMEOUT)
+    return result
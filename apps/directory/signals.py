@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.versions import bump_version
+from apps.users.models import OfficerProfile
+from .models import Rank, Competency, PositionRequirement, CompetencyRequirement, Unit
+from .services import PROFILES_VERSION_KEY, position_version_key, UNIT_TREE_VERSION_KEY
+from .hierarchy import check_parent, insert_unit, move_unit
+
+
+# версии повышаем после коммита, иначе другой воркер успеет закэшировать профиль по старым данным
+@receiver(post_save, sender=PositionRequirement)
+@receiver(post_delete, sender=PositionRequirement)
+@receiver(post_save, sender=CompetencyRequirement)
+@receiver(post_delete, sender=CompetencyRequirement)
+def invalidate_position_profile(sender, instance, **kwargs):
+    key = position_version_key(instance.position_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+@receiver(post_save, sender=Rank)
+@receiver(post_delete, sender=Rank)
+@receiver(post_save, sender=Competency)
+@receiver(post_delete, sender=Competency)
+def invalidate_all_profiles(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(PROFILES_VERSION_KEY))
+
+
+# замыкание иерархии (UnitClosure); удаление чистит связи каскадом.
+# loaddata (raw) пропускаем — после загрузки фикстур: manage.py rebuild_unit_closure
+@receiver(pre_save, sender=Unit)
+def remember_unit_parent(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._old_parent_id = None
+        return
+    instance._old_parent_id = Unit.objects.filter(pk=instance.pk).values_list("parent_id", flat=True).first()
+    if instance.parent_id != instance._old_parent_id:
+        check_parent(instance)
+
+
+@receiver(post_save, sender=Unit)
+def maintain_unit_closure(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        insert_unit(instance)
+    elif instance.parent_id != getattr(instance, "_old_parent_id", instance.parent_id):
+        move_unit(instance)
+
+
+# дерево юнитов (unit_tree): структура и численность; вакансии — см. apps.staffing.signals
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+@receiver(post_delete, sender=OfficerProfile)
+def invalidate_unit_tree(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(UNIT_TREE_VERSION_KEY))
+
+
+@receiver(pre_save, sender=OfficerProfile)
+def remember_officer_unit(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._unit_before = OfficerProfile.objects.filter(pk=instance.pk).values_list("unit_id", flat=True).first()
+
+
+@receiver(post_save, sender=OfficerProfile)
+def invalidate_unit_tree_on_transfer(sender, instance, created, **kwargs):
+    before = instance.__dict__.pop("_unit_before", None)
+    if created or before != instance.unit_id:
+        transaction.on_commit(lambda: bump_version(UNIT_TREE_VERSION_KEY))
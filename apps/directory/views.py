@@ -1,3 +1,4 @@
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
@@ -13,12 +14,24 @@ from .serializers import (
     RankSerializer, UnitSerializer, PositionSerializer, PositionRequirementSerializer,
     CompetencySerializer, CompetencyRequirementSerializer, ProviderSerializer, TrainingCourseSerializer, PositionQualificationSerializer
 )
-from apps.users.models import CommanderProfile
+from apps.users.scope import get_scope
+from .filters import UnitSubtreeFilter
+from .hierarchy import subtree_q
+from .services import unit_tree, unit_tree_etag
+
+
+def etag_matches(request, etag: str) -> bool:
+    """If-None-Match: список тегов через запятую или «*»; сравнение слабое (без W/), тег целиком."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return "*" in tags or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
 
 
 class BaseCatalogViewSet(viewsets.ModelViewSet):
     """Базовый каталог: чтение для всех аутентифицированных, запись — только ADMIN/ROOT"""
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.SearchFilter, filters.OrderingFilter]
     ordering_fields = "__all__"
     ordering = ["id"]
 
@@ -40,24 +53,51 @@ class RankViewSet(BaseCatalogViewSet):
 class UnitViewSet(BaseCatalogViewSet):
     queryset = Unit.objects.select_related("parent").all()
     serializer_class = UnitSerializer
-    filterset_fields = ["is_active", "parent"]
+    filterset_fields = ["is_active", "parent", "level"]
     search_fields = ["name", "code"]
+    unit_subtree_field = ""
 
     def get_queryset(self):
         qs = super().get_queryset()
         u = self.request.user
-        # Командир видит только свой юнит
+        # Командир видит свой юнит с подчинёнными
         if getattr(u, "role", "") == "COMMANDER":
-            me = CommanderProfile.objects.filter(user=u).select_related("unit").first()
-            return qs.filter(id=me.unit_id) if me and me.unit_id else qs.none()
+            unit_id = get_scope(u).commander_unit_id
+            return qs.filter(subtree_q("id", unit_id)) if unit_id else qs.none()
         return qs
 
+    @action(detail=False, methods=["get"])
+    def tree(self, request):
+        """
+        Вся иерархия (или поддерево ?root=<id>) вложенными узлами с числом офицеров и открытых вакансий
+        (своих и с подчинёнными). Командир — только от своего юнита. Поддерживает ETag / If-None-Match → 304.
+        """
+        try:
+            root_id = int(request.query_params["root"]) if request.query_params.get("root") else None
+        except ValueError:
+            return Response({"detail": "root must be an id"}, status=400)
+        if getattr(request.user, "role", "") == "COMMANDER":
+            scope = get_scope(request.user)
+            if root_id is None:
+                root_id = scope.commander_unit_id
+            if root_id is None or not scope.can_view_unit(root_id):
+                return Response({"detail": "Forbidden"}, status=403)
+
+        etag = unit_tree_etag(root_id)
+        if etag_matches(request, etag):
+            return Response(status=304, headers={"ETag": etag})
+        tree = unit_tree(root_id)
+        if root_id is not None and not tree:
+            return Response({"detail": "Not found"}, status=404)
+        return Response(tree, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
 
 class PositionViewSet(BaseCatalogViewSet):
     queryset = Position.objects.select_related("unit").all()
     serializer_class = PositionSerializer
     filterset_fields = ["is_active", "unit"]
     search_fields = ["title", "code", "unit__name"]
+    unit_subtree_field = "unit"
 
 
 class PositionRequirementViewSet(BaseCatalogViewSet):
@@ -71,8 +111,8 @@ class PositionRequirementViewSet(BaseCatalogViewSet):
         u = self.request.user
         # Командир видит должности только своего юнита
         if getattr(u, "role", "") == "COMMANDER":
-            me = CommanderProfile.objects.filter(user=u).select_related("unit").first()
-            return qs.filter(unit_id=me.unit_id) if me and me.unit_id else qs.none()
+            unit_id = get_scope(u).commander_unit_id
+            return qs.filter(position__unit_id=unit_id) if unit_id else qs.none()
         return qs
 
 
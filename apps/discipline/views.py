@@ -5,46 +5,37 @@ from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from apps.users.models import OfficerProfile, CommanderProfile, HRProfile, CommanderAssignment
+from apps.directory.filters import UnitSubtreeFilter
+from apps.directory.hierarchy import subtree_q
+from apps.users.scope import get_scope
 from core.permissions import IsAdminOrRoot, IsHR, IsCommander
 from .models import Reward, Sanction, MeasureStatus
 from .serializers import RewardSerializer, SanctionSerializer
 
 
 def _filter_queryset_by_role(request, qs):
-    u = request.user
-    if u.role == "OFFICER":
-        try:
-            me = OfficerProfile.objects.get(user=u)
-        except OfficerProfile.DoesNotExist:
-            return qs.none()
-        return qs.filter(officer=me)
-    if u.role == "COMMANDER":
-        try:
-            me = CommanderProfile.objects.get(user=u)
-        except CommanderProfile.DoesNotExist:
-            return qs.none()
-        active_ids = CommanderAssignment.objects.filter(
-            commander=me
-        ).filter(Q(until__isnull=True) | Q(until__gte=timezone.now().date())
-                 ).values_list("officer_id", flat=True)
-        return qs.filter(Q(officer_id__in=active_ids) | Q(unit=me.unit))
-    if u.role == "HR":
-        try:
-            hr = HRProfile.objects.get(user=u)
-        except HRProfile.DoesNotExist:
-            return qs.none()
-        return qs.filter(Q(unit__in=hr.responsible_units.all()) | Q(officer__unit__in=hr.responsible_units.all()))
+    scope = get_scope(request.user)
+    if scope.role == "OFFICER":
+        return qs.filter(officer__user_id=scope.user_id)
+    # юниты — с подчинёнными (замыкание UnitClosure)
+    if scope.role == "COMMANDER":
+        q = Q(officer_id__in=sorted(scope.assigned_officer_ids))
+        roots = scope.unit_roots()
+        return qs.filter(q | subtree_q("unit_id", roots) if roots else q)
+    if scope.role == "HR":
+        roots = scope.unit_roots()
+        return qs.filter(subtree_q("unit_id", roots) | subtree_q("officer__unit_id", roots))
     return qs  # ADMIN/ROOT
 
 
 class _BaseMeasureViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ["title", "description", "order_number", "officer__full_name", "officer__user__email"]
     filterset_fields = [
         "status", "officer", "unit", "order_date",
     ]
+    unit_subtree_field = "unit"
     ordering = ["-created_at"]
 
     def get_queryset(self):
@@ -5,3 +5,6 @@ class InsightsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.insights'
     verbose_name = 'Аналитика и Отчеты'
+
+    def ready(self):
+        from . import signals  # noqa
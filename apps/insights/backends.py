@@ -0,0 +1,206 @@
+"""
+Бэкенды прогноза карьерной траектории.
+
+- heuristic — эвристика (база 50% + компетенции 50%), работает всегда;
+- logistic  — логистическая регрессия, обученная командой train_forecast_model
+              на переходах из PositionHistory и сохранённая в .npz (INSIGHTS_MODEL_PATH);
+              признаки берутся на дату перехода, истории званий нет — у признаков звания вес 0.
+
+Бэкенд выбирается INSIGHTS_FORECAST_BACKEND и грузится один раз на процесс; если файл модели
+не найден или повреждён — используется эвристика. Все бэкенды считают сразу пачку офицеров
+на одну позицию: predict(features, req, current) -> (вероятности %, горизонты в месяцах).
+"""
+import logging
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = "v0.1-heuristic"
+
+# признаки пары офицер × позиция (порядок = столбцы матрицы и веса модели)
+FEATURE_NAMES = (
+    "has_base",
+    "rank_gap",            # порядок звания офицера − минимальный (0 — нет звания/требования)
+    "has_rank",
+    "service_ratio",       # выслуга / требуемая, не больше 3
+    "has_service",
+    "competency_coverage", # средняя доля выполнения требований по компетенциям
+    "mandatory_coverage",  # то же по обязательным
+    "competency_deficit",  # средний недобор баллов / 5
+)
+
+
+def _round2(x: float) -> float:
+    return float(Decimal(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _horizons(prob: np.ndarray) -> np.ndarray:
+    # чем хуже соответствие, тем длиннее горизонт
+    return np.select([prob >= 85, prob >= 70, prob >= 50], [3, 6, 12], default=18)
+
+
+def _finish(prob: np.ndarray) -> tuple[list[float], list[int]]:
+    rounded = [_round2(x) for x in prob.tolist()]
+    return rounded, _horizons(np.array(rounded)).tolist()
+
+
+def forecast_arrays(features, req, current: np.ndarray) -> tuple[list[float], list[int]]:
+    """
+    Эвристика прогноза для всех офицеров разом (по одной позиции).
+    current — последние оценки офицер × компетенция в порядке req.competency_ids.
+    """
+    n = len(features)
+    has_rank = features.rank_order >= 0
+    has_ssd = ~np.isnan(features.years)
+
+    # --- Блок 1. Базовые требования (50%)
+    base_score = np.ones(n, dtype=np.float64)
+    if req.has_base:
+        parts = np.zeros(n, dtype=np.float64)
+        got = np.zeros(n, dtype=np.float64)
+        # ранг: не дотягивает — чуть штрафуем
+        parts += has_rank
+        got += np.where(has_rank, np.where(features.rank_order >= req.min_rank_order, 1.0, 0.6), 0.0)
+        # стаж: не ниже 0.3
+        if req.min_service_years:
+            y = features.years
+            parts += has_ssd
+            got += np.where(has_ssd, np.where(
+                y >= req.min_service_years, 1.0, np.maximum(0.3, y / max(1, req.min_service_years))), 0.0)
+        base_score = np.where(parts > 0, got / np.maximum(parts, 1.0), 1.0)
+
+    # --- Блок 2. Компетенции (50%), обязательные весим чуть выше
+    comp_score = np.ones(n, dtype=np.float64)
+    if req.competency_ids:
+        required = np.array([float(m or 1) for m in req.min_scores], dtype=np.float64)
+        weights = np.where(req.mandatory_array, 1.2, 1.0)
+        parts = np.minimum(current / required, 1.0)
+        got = np.zeros(n, dtype=np.float64)
+        for j in range(len(required)):
+            got += parts[:, j] * weights[j]
+        max_total = sum(1.2 if mandatory else 1.0 for mandatory in req.mandatory)
+        comp_score = got / max_total
+
+    return _finish((0.5 * base_score + 0.5 * comp_score) * 100.0)
+
+
+def feature_matrix(rank_order: np.ndarray, years: np.ndarray, req, current: np.ndarray) -> np.ndarray:
+    """Матрица признаков (офицеры × FEATURE_NAMES) для одной позиции."""
+    n = len(rank_order)
+    X = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float64)
+    has_rank = rank_order >= 0
+    has_ssd = ~np.isnan(years)
+    X[:, 2] = has_rank
+    X[:, 4] = has_ssd
+    if req.has_base:
+        X[:, 0] = 1.0
+        X[:, 1] = np.where(has_rank, rank_order - req.min_rank_order, 0)
+        X[:, 3] = np.where(has_ssd, np.minimum(np.nan_to_num(years) / max(1, req.min_service_years), 3.0), 0.0)
+    if req.competency_ids:
+        required = np.array([float(m or 1) for m in req.min_scores], dtype=np.float64)
+        coverage = np.minimum(current / required, 1.0)
+        X[:, 5] = coverage.mean(axis=1)
+        mandatory = req.mandatory_array
+        X[:, 6] = coverage[:, mandatory].mean(axis=1) if mandatory.any() else 1.0
+        X[:, 7] = np.maximum(required - current, 0.0).mean(axis=1) / 5.0
+    else:
+        X[:, 5] = X[:, 6] = 1.0
+    return X
+
+
+class HeuristicBackend:
+    name = "heuristic"
+    version = MODEL_VERSION
+
+    def predict(self, features, req, current):
+        return forecast_arrays(features, req, current)
+
+
+class LogisticBackend:
+    """Логистическая регрессия: p = sigmoid(((X − mean) / std) · w + b)."""
+    name = "logistic"
+
+    def __init__(self, weights, bias, mean, std, version: str):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.version = version
+
+    @classmethod
+    def load(cls, path) -> "LogisticBackend":
+        with np.load(path, allow_pickle=False) as data:
+            if tuple(data["feature_names"].tolist()) != FEATURE_NAMES:
+                raise ValueError("Набор признаков модели не совпадает с текущим кодом")
+            return cls(data["weights"], data["bias"], data["mean"], data["std"], str(data["version"]))
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as fh:  # np.savez с путём сам дописывает .npz
+            np.savez(fh, weights=self.weights, bias=self.bias, mean=self.mean, std=self.std,
+                     version=np.array(self.version), feature_names=np.array(FEATURE_NAMES))
+
+    def probabilities(self, X: np.ndarray) -> np.ndarray:
+        z = ((X - self.mean) / self.std) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+    def predict(self, features, req, current):
+        X = feature_matrix(features.rank_order, features.years, req, current)
+        return _finish(self.probabilities(X) * 100.0)
+
+
+def train_logistic(X: np.ndarray, y: np.ndarray, version: str, l2: float = 1e-3,
+                   lr: float = 0.5, epochs: int = 2000) -> LogisticBackend:
+    """Полнопакетный градиентный спуск по логлоссу с L2 на стандартизированных признаках (CPU, NumPy)."""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std < 1e-9] = 1.0
+    Xs = (X - mean) / std
+    w = np.zeros(X.shape[1])
+    b = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-np.clip(Xs @ w + b, -30, 30)))
+        err = p - y
+        w -= lr * (Xs.T @ err / len(y) + l2 * w)
+        b -= lr * err.mean()
+    return LogisticBackend(w, b, mean, std, version)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def load_forecast_backend():
+    name = getattr(settings, "INSIGHTS_FORECAST_BACKEND", "heuristic")
+    if name == LogisticBackend.name:
+        path = getattr(settings, "INSIGHTS_MODEL_PATH", "")
+        try:
+            return LogisticBackend.load(path)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Модель прогноза %s не загружена (%s), используем эвристику", path, e)
+    elif name != HeuristicBackend.name:
+        logger.warning("Неизвестный INSIGHTS_FORECAST_BACKEND=%s, используем эвристику", name)
+    return HeuristicBackend()
+
+
+def get_forecast_backend():
+    """Бэкенд прогноза — один на процесс (воркер)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = load_forecast_backend()
+    return _backend
+
+
+def reset_forecast_backend():
+    """Сбросить загруженный бэкенд (после переобучения модели в том же процессе)."""
+    global _backend
+    with _backend_lock:
+        _backend = None
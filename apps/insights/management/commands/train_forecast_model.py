@@ -0,0 +1,115 @@
+from bisect import bisect_left
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.assessments.models import CompetencyRating
+from apps.directory.services import get_requirement_profiles
+from apps.officers.models import PositionHistory
+from apps.users.models import OfficerProfile
+from apps.insights.backends import FEATURE_NAMES, feature_matrix, train_logistic
+from apps.insights.services import _years
+
+
+class RatingHistory:
+    """Оценки офицер × компетенция по времени: последняя оценка строго до даты (как снапшот на ту дату)."""
+
+    def __init__(self, officer_ids, competency_ids):
+        self._series = {}  # (officer, competency) -> ([даты], [баллы]) по возрастанию
+        rows = CompetencyRating.objects.filter(
+            officer_id__in=officer_ids, competency_id__in=competency_ids
+        ).order_by("officer_id", "competency_id", "assessed_at", "id").values_list(
+            "officer_id", "competency_id", "assessed_at", "score")
+        for oid, cid, assessed_at, score in rows.iterator():
+            dates, scores = self._series.setdefault((oid, cid), ([], []))
+            dates.append(timezone.localdate(assessed_at))
+            scores.append(float(score))
+
+    def score(self, officer_id: int, competency_id: int, before) -> float:
+        dates, scores = self._series.get((officer_id, competency_id), ((), ()))
+        i = bisect_left(dates, before)
+        return scores[i - 1] if i else 0.0
+
+    def matrix(self, officer_id: int, competency_ids, before) -> np.ndarray:
+        return np.array([[self.score(officer_id, cid, before) for cid in competency_ids]], dtype=np.float64)
+
+
+class Command(BaseCommand):
+    help = ("Обучить логистическую модель прогноза на переходах из PositionHistory и сохранить в .npz. "
+            "Пример — пара соседних назначений офицера (по start_date): положительный — позиция, на которую "
+            "он перешёл, отрицательные — случайные другие позиции на ту же дату. Признаки берутся на дату "
+            "перехода: выслуга на эту дату и последние оценки с assessed_at до неё. Истории званий нет, "
+            "поэтому признаки звания в обучении считаются неизвестными и получают нулевой вес.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.INSIGHTS_MODEL_PATH)
+        parser.add_argument("--negatives", type=int, default=3, help="Отрицательных примеров на один переход")
+        parser.add_argument("--holdout", type=float, default=0.2, help="Доля офицеров для проверки")
+        parser.add_argument("--epochs", type=int, default=2000)
+        parser.add_argument("--l2", type=float, default=1e-3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(opts["seed"])
+        history = {}  # офицер -> [(start_date, позиция)] по возрастанию
+        rows = PositionHistory.objects.order_by("officer_id", "start_date", "id").values_list(
+            "officer_id", "start_date", "position_id")
+        for oid, start, pid in rows.iterator():
+            history.setdefault(oid, []).append((start, pid))
+
+        transitions = []  # (офицер, дата перехода, предыдущая позиция, новая позиция)
+        for oid, items in history.items():
+            for (_, prev_pid), (start, next_pid) in zip(items, items[1:]):
+                if next_pid != prev_pid:
+                    transitions.append((oid, start, prev_pid, next_pid))
+        if not transitions:
+            raise CommandError("В PositionHistory нет переходов между позициями — обучать не на чем")
+
+        position_ids = np.array(sorted({pid for items in history.values() for _, pid in items}), dtype=np.int64)
+        examples = []  # (офицер, дата, позиция, метка)
+        for oid, start, prev_pid, next_pid in transitions:
+            examples.append((oid, start, next_pid, 1.0))
+            pool = position_ids[(position_ids != next_pid) & (position_ids != prev_pid)]
+            for pid in rng.choice(pool, size=min(len(pool), opts["negatives"]), replace=False).tolist():
+                examples.append((oid, start, pid, 0.0))
+
+        officer_ids = sorted(history)
+        service_start = dict(OfficerProfile.objects.filter(id__in=officer_ids).values_list("id", "service_start_date"))
+        profiles = get_requirement_profiles({pid for _, _, pid, _ in examples})
+        ratings = RatingHistory(officer_ids, sorted({cid for p in profiles.values() for cid in p.competency_ids}))
+
+        blocks, labels, groups = [], [], []
+        no_rank = np.array([-1], dtype=np.int64)  # звание на дату перехода неизвестно
+        for oid, start, pid, label in examples:
+            req = profiles[pid]
+            ssd = service_start.get(oid)
+            years = np.array([_years(ssd, start) if ssd else np.nan], dtype=np.float64)
+            blocks.append(feature_matrix(no_rank, years, req, ratings.matrix(oid, req.competency_ids, start)))
+            labels.append(label)
+            groups.append(oid)
+        X, y, groups = np.vstack(blocks), np.array(labels), np.array(groups, dtype=np.int64)
+
+        # проверка — на офицерах, которых не было в обучении (их переходы не должны «подсказывать» модели)
+        n_test_officers = int(len(officer_ids) * opts["holdout"]) if len(y) >= 10 else 0
+        test_officers = rng.permutation(np.array(officer_ids, dtype=np.int64))[:n_test_officers]
+        is_test = np.isin(groups, test_officers)
+        test, train = np.flatnonzero(is_test), np.flatnonzero(~is_test)
+        if not len(train):
+            raise CommandError("Все примеры попали в проверку — уменьшите --holdout")
+        version = "v1-logistic-" + datetime.now().strftime("%Y%m%d%H%M%S")
+        model = train_logistic(X[train], y[train], version, l2=opts["l2"], epochs=opts["epochs"])
+        model.save(opts["output"])
+
+        self.stdout.write(f"Переходов: {len(transitions)}, примеров: {len(y)} (положительных {int(y.sum())}), "
+                          f"проверка: {len(test)}")
+        for name, w in zip(FEATURE_NAMES, model.weights.tolist()):
+            self.stdout.write(f"  {name:>20}: {w:+.3f}")
+        if len(test):
+            p = np.clip(model.probabilities(X[test]), 1e-9, 1 - 1e-9)
+            logloss = -np.mean(y[test] * np.log(p) + (1 - y[test]) * np.log(1 - p))
+            accuracy = np.mean((p >= 0.5) == (y[test] == 1))
+            self.stdout.write(f"logloss={logloss:.4f} accuracy={accuracy:.3f}")
+        self.stdout.write(self.style.SUCCESS(f"Модель {version} сохранена в {opts['output']}"))
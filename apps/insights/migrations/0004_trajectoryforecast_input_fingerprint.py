@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insights', '0003_alter_trajectoryforecast_target_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajectoryforecast',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -11,6 +11,8 @@ class TrajectoryForecast(models.Model):
                                       validators=[MinValueValidator(0), MaxValueValidator(100)])
     horizon_months = models.PositiveSmallIntegerField()
     model_version = models.CharField(max_length=50)
+    # sha256 входов прогноза (см. insights.services.input_fingerprint) — для мемоизации
+    input_fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
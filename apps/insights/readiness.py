@@ -0,0 +1,121 @@
+"""
+Готовность подразделения (с подчинёнными) к позиции — агрегаты для дашборда.
+
+Всё считается агрегатными запросами в БД:
+- распределение вероятностей по последнему прогнозу (TrajectoryForecast) каждого офицера;
+- офицеры не ниже порога (по убыванию вероятности);
+- пробелы по требуемым компетенциям из снапшота последних оценок (нет оценки — 0, как в скоринге).
+Результат кэшируется по (юнит, позиция, параметры, версия данных, версия требований позиции).
+"""
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Q, Sum, Case, When, F, DecimalField, Subquery
+
+from core.versions import get_version
+from apps.assessments.models import OfficerCompetencySnapshot
+from apps.directory.services import get_requirement_profile, unit_subtree_ids
+from apps.users.models import OfficerProfile
+from .models import TrajectoryForecast
+
+# прогнозы, оценки, состав и структура подразделений, см. apps.insights.signals
+READINESS_VERSION_KEY = "unit_readiness"
+READINESS_CACHE_TIMEOUT = 60 * 60
+# корзины распределения — те же пороги, что и горизонты прогноза
+READINESS_BUCKETS = ((0, 50), (50, 70), (70, 85), (85, None))
+
+
+def _bucket_label(lo, hi) -> str:
+    return f"{lo}-{hi}" if hi is not None else f"{lo}+"
+
+
+def _forecast_stats(officers, position_id: int, threshold: float, top: int) -> dict:
+    latest = TrajectoryForecast.objects.filter(officer__in=officers, target_position_id=position_id) \
+        .values("officer_id").annotate(last_id=Max("id")).values("last_id")
+    forecasts = TrajectoryForecast.objects.filter(id__in=Subquery(latest))
+
+    buckets = {}
+    for i, (lo, hi) in enumerate(READINESS_BUCKETS):
+        cond = Q(probability__gte=lo)
+        if hi is not None:
+            cond &= Q(probability__lt=hi)
+        buckets[f"b{i}"] = Count("id", filter=cond)
+    agg = forecasts.aggregate(
+        forecasted=Count("id"), avg_probability=Avg("probability"),
+        above_threshold=Count("id", filter=Q(probability__gte=threshold)), **buckets,
+    )
+    ready = forecasts.filter(probability__gte=threshold).order_by("-probability", "officer_id") \
+        .values("officer_id", "officer__full_name", "officer__user__email", "probability",
+                "horizon_months", "created_at")[:top]
+    return {
+        "forecasted": agg["forecasted"],
+        "avg_probability": round(float(agg["avg_probability"]), 2) if agg["avg_probability"] is not None else None,
+        "distribution": [{"range": _bucket_label(lo, hi), "count": agg[f"b{i}"]}
+                         for i, (lo, hi) in enumerate(READINESS_BUCKETS)],
+        "above_threshold": agg["above_threshold"],
+        "ready_officers": [{
+            "officer": r["officer_id"],
+            "full_name": r["officer__full_name"] or r["officer__user__email"],
+            "probability": float(r["probability"]),
+            "horizon_months": r["horizon_months"],
+            "forecast_at": r["created_at"],
+        } for r in ready],
+    }
+
+
+def _competency_gaps(officers, n_officers: int, profile) -> list[dict]:
+    if not profile.competency_ids:
+        return []
+    required = dict(zip(profile.competency_ids, profile.min_scores))
+    below = reduce(or_, (Q(competency_id=cid, score__lt=m) for cid, m in required.items()))
+    deficit = Case(*[When(competency_id=cid, score__lt=m, then=m - F("score")) for cid, m in required.items()],
+                   default=0, output_field=DecimalField(max_digits=4, decimal_places=1))
+    rows = {r["competency_id"]: r for r in OfficerCompetencySnapshot.objects.filter(
+        officer__in=officers, competency_id__in=list(required),
+    ).values("competency_id").annotate(
+        rated=Count("id"), avg_score=Avg("score"), rated_below=Count("id", filter=below), deficit=Sum(deficit),
+    ).order_by()}
+
+    gaps = []
+    for cid, name, m, mandatory in zip(profile.competency_ids, profile.competency_names,
+                                       profile.min_scores, profile.mandatory):
+        r = rows.get(cid, {})
+        rated = r.get("rated", 0)
+        unrated = n_officers - rated
+        gaps.append({
+            "competency_id": cid,
+            "competency": name,
+            "required": m,
+            "is_mandatory": mandatory,
+            "avg_score": round(float(r["avg_score"]), 2) if r.get("avg_score") is not None else None,
+            "unrated": unrated,
+            "officers_below": r.get("rated_below", 0) + unrated,
+            "avg_deficit": round((float(r.get("deficit") or 0) + unrated * m) / n_officers, 2) if n_officers else 0.0,
+        })
+    gaps.sort(key=lambda g: (-g["officers_below"], -g["avg_deficit"], g["competency_id"]))
+    return gaps
+
+
+def unit_readiness(unit_id: int, position_id: int, threshold: float = 70, top: int = 20) -> dict:
+    """Сводка готовности подразделения unit_id (с подчинёнными) к позиции position_id."""
+    profile = get_requirement_profile(position_id)
+    key = "unit_readiness:{}:{}:{}:{}:{}:{}.{}".format(
+        unit_id, position_id, threshold, top, get_version(READINESS_VERSION_KEY), *profile.version)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    officers = OfficerProfile.objects.filter(unit_id__in=unit_subtree_ids(unit_id)).values("id")
+    n_officers = officers.count()
+    data = {
+        "unit": unit_id,
+        "position": position_id,
+        "threshold": threshold,
+        "officers": n_officers,
+        **_forecast_stats(officers, position_id, threshold, top),
+        "competency_gaps": _competency_gaps(officers, n_officers, profile),
+    }
+    data["not_forecasted"] = n_officers - data["forecasted"]
+    cache.set(key, data, timeout=READINESS_CACHE_TIMEOUT)
+    return data
@@ -1,67 +1,151 @@
+import hashlib
+import json
 from datetime import date
-from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Optional
 
+import numpy as np
+from django.db import transaction
+
+from core.versions import bump_version
 from apps.users.models import OfficerProfile
-from apps.directory.models import Position, PositionRequirement, CompetencyRequirement
-from apps.assessments.models import CompetencyRating
+from apps.directory.models import Position
+from apps.directory.services import RequirementProfile, get_requirement_profile, get_requirement_profiles
+from apps.assessments.services import competency_score_matrix
+from .models import TrajectoryForecast
+from .backends import get_forecast_backend
+from .readiness import READINESS_VERSION_KEY
 
-MODEL_VERSION = "v0.1-heuristic"
+BULK_BATCH_SIZE = 1000
 
-def _round2(x: float) -> float:
-    return float(Decimal(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
 def _years(d1, d2) -> float:
     return (d2 - d1).days / 365.25
 
+
+class OfficerFeatures:
+    """Признаки офицеров массивами: порядок звания (-1 — нет), выслуга (nan — нет даты)."""
+
+    def __init__(self, rows, today: Optional[date] = None):
+        today = today or date.today()
+        rows = list(rows)  # (id, rank_id, rank__order, service_start_date)
+        self.today = today
+        self.ids = [r[0] for r in rows]
+        self.service_start = [r[3] for r in rows]
+        self.rank_order = np.array([r[2] if r[1] is not None else -1 for r in rows], dtype=np.int64)
+        self.years = np.array([_years(r[3], today) if r[3] else np.nan for r in rows], dtype=np.float64)
+
+    @classmethod
+    def from_queryset(cls, officer_qs):
+        return cls(officer_qs.order_by("id").values_list("id", "rank_id", "rank__order", "service_start_date"))
+
+    @classmethod
+    def from_officer(cls, officer: OfficerProfile):
+        return cls([(officer.id, officer.rank_id, officer.rank.order if officer.rank_id else None,
+                     officer.service_start_date)])
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def input_fingerprint(officer_id: int, position_id: int, rank_order: int, service_start: Optional[date],
+                      scores, req: RequirementProfile, today: date, model_version: str) -> str:
+    """
+    Отпечаток входов прогноза: звание, дата начала службы, последние оценки по требуемым компетенциям,
+    содержимое требований позиции и версия модели. Выслуга растёт со временем, поэтому в отпечаток
+    входит и текущий месяц — без изменений входов прогноз пересчитывается не чаще раза в месяц.
+    """
+    content = [model_version, officer_id, position_id, rank_order,
+               service_start.isoformat() if service_start else None,
+               [round(x, 1) for x in scores], req.digest, today.strftime("%Y-%m")]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+def iter_forecasts(officer_qs, position_ids: Iterable[int]):
+    """
+    Прогнозы офицеры × позиции: признаки, профили и оценки грузятся один раз,
+    по каждой позиции — один векторный проход.
+    Отдаёт (officer_id, position_id, prob, horizon, input_fingerprint).
+    """
+    backend = get_forecast_backend()
+    features = OfficerFeatures.from_queryset(officer_qs)
+    profiles = get_requirement_profiles(position_ids)
+    if not len(features) or not profiles:
+        return
+    comp_ids = sorted({cid for p in profiles.values() for cid in p.competency_ids})
+    col = {cid: j for j, cid in enumerate(comp_ids)}
+    ratings = competency_score_matrix(features.ids, comp_ids)
+    rank_order = features.rank_order.tolist()
+    for pid, req in profiles.items():
+        current = ratings[:, [col[cid] for cid in req.competency_ids]]
+        prob, horizon = backend.predict(features, req, current)
+        rows = current.tolist()
+        for i, oid in enumerate(features.ids):
+            fp = input_fingerprint(oid, pid, rank_order[i], features.service_start[i], rows[i], req,
+                                   features.today, backend.version)
+            yield oid, pid, prob[i], horizon[i], fp
+
+
+def generate_forecasts(officer_qs, position_ids: Iterable[int], progress=None, force: bool = False) -> dict:
+    """
+    Пакетная генерация TrajectoryForecast (bulk_create пачками по BULK_BATCH_SIZE).
+    Пары, для которых уже есть прогноз с тем же отпечатком входов, не пересоздаются (если не force).
+    progress — JobProgress фоновой задачи (advance по мере обработки) или None.
+    Возвращает {"created": n, "reused": m}.
+    """
+    stats = {"created": 0, "reused": 0}
+    model_version = get_forecast_backend().version
+    batch = []
+
+    def flush():
+        nonlocal batch
+        if not force:
+            known = set(TrajectoryForecast.objects.filter(
+                input_fingerprint__in=[f.input_fingerprint for f in batch]
+            ).values_list("input_fingerprint", flat=True))
+            new = [f for f in batch if f.input_fingerprint not in known]
+        else:
+            new = batch
+        with transaction.atomic():
+            TrajectoryForecast.objects.bulk_create(new)
+        stats["created"] += len(new)
+        stats["reused"] += len(batch) - len(new)
+        if progress is not None:
+            progress.advance(len(batch))
+        batch = []
+
+    for oid, pid, prob, horizon, fp in iter_forecasts(officer_qs, position_ids):
+        batch.append(TrajectoryForecast(officer_id=oid, target_position_id=pid, probability=prob,
+                                        horizon_months=horizon, model_version=model_version,
+                                        input_fingerprint=fp))
+        if len(batch) >= BULK_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    if stats["created"]:
+        transaction.on_commit(lambda: bump_version(READINESS_VERSION_KEY))
+    return stats
+
+
+def get_or_create_forecast(officer: OfficerProfile, position: Position,
+                           force: bool = False) -> tuple[TrajectoryForecast, bool]:
+    """
+    Прогноз офицера на позицию с мемоизацией по отпечатку входов:
+    входы не менялись — возвращаем существующую запись (created=False); force — всегда пересчитать.
+    """
+    oid, pid, prob, horizon, fp = next(iter_forecasts(OfficerProfile.objects.filter(pk=officer.pk), [position.pk]))
+    if not force:
+        existing = TrajectoryForecast.objects.filter(input_fingerprint=fp).order_by("-created_at").first()
+        if existing is not None:
+            return existing, False
+    obj = TrajectoryForecast.objects.create(officer=officer, target_position=position, probability=prob,
+                                            horizon_months=horizon, model_version=get_forecast_backend().version,
+                                            input_fingerprint=fp)
+    return obj, True
+
+
 def forecast_officer_to_position(officer: OfficerProfile, position: Position) -> tuple[float, int]:
     """Возвращает (probability %, horizon_months)."""
-    today = date.today()
-
-    # --- Блок 1. Базовые требования (50%)
-    base_req = PositionRequirement.objects.filter(position=position).first()
-    base_score = 1.0
-    if base_req:
-        parts = 0
-        got = 0.0
-        # ранг
-        if officer.rank and base_req.min_rank:
-            parts += 1
-            got += 1.0 if officer.rank.order >= base_req.min_rank.order else 0.6  # чуть штрафуем
-        # стаж
-        if officer.service_start_date and base_req.min_service_years:
-            parts += 1
-            y = _years(officer.service_start_date, today)
-            if y >= base_req.min_service_years:
-                got += 1.0
-            else:
-                got += max(0.3, y / max(1, base_req.min_service_years))  # не ниже 0.3
-        base_score = (got / parts) if parts else 1.0
-
-    # --- Блок 2. Компетенции (50%)
-    comp_reqs = list(CompetencyRequirement.objects.filter(position=position))
-    comp_score = 1.0
-    if comp_reqs:
-        latest = {r.competency_id: float(r.score)
-                  for r in CompetencyRating.objects.filter(officer=officer).order_by("-assessed_at")}
-        got = 0.0
-        for cr in comp_reqs:
-            req = float(cr.min_score or 1)
-            cur = latest.get(cr.competency_id, 0.0)
-            part = min(cur / req, 1.0)
-            # обязательные компетенции весим чуть выше
-            got += part * (1.2 if cr.is_mandatory else 1.0)
-        max_total = sum(1.2 if cr.is_mandatory else 1.0 for cr in comp_reqs)
-        comp_score = got / max_total if max_total else 1.0
-
-    prob = _round2((0.5 * base_score + 0.5 * comp_score) * 100.0)
-
-    # --- Горизонт (чем хуже соответствие, тем длиннее)
-    if prob >= 85:
-        horizon = 3
-    elif prob >= 70:
-        horizon = 6
-    elif prob >= 50:
-        horizon = 12
-    else:
-        horizon = 18
-    return prob, horizon
+    req = get_requirement_profile(position.pk)
+    current = competency_score_matrix([officer.id], list(req.competency_ids))
+    prob, horizon = get_forecast_backend().predict(OfficerFeatures.from_officer(officer), req, current)
+    return prob[0], horizon[0]
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.versions import bump_version
+from apps.assessments.models import CompetencyRating
+from apps.assessments.signals import competency_ratings_created
+from apps.directory.models import Unit
+from apps.users.models import OfficerProfile
+from .models import TrajectoryForecast
+from .readiness import READINESS_VERSION_KEY
+
+
+# bulk_create прогнозов сигналов не шлёт — generate_forecasts повышает версию сам
+@receiver(competency_ratings_created)
+@receiver(post_delete, sender=CompetencyRating)
+@receiver(post_save, sender=TrajectoryForecast)
+@receiver(post_delete, sender=TrajectoryForecast)
+@receiver(post_save, sender=OfficerProfile)
+@receiver(post_delete, sender=OfficerProfile)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_unit_readiness(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(READINESS_VERSION_KEY))
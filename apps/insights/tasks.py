@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from apps.jobs.services import run_job
+from apps.users.models import OfficerProfile
+from .services import generate_forecasts
+
+GENERATE_FORECASTS_JOB = "insights.generate_forecasts"
+
+
+@shared_task
+def generate_forecasts_task(job_id: int):
+    """Пакетная генерация прогнозов офицеры × позиции с прогрессом в Job."""
+    with run_job(job_id) as progress:
+        officers = OfficerProfile.objects.filter(id__in=progress.params["officers"])
+        positions = progress.params["positions"]
+        progress.set_total(officers.count() * len(positions))
+        progress.result = generate_forecasts(officers, positions, progress=progress,
+                                             force=progress.params.get("force", False))
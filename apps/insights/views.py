@@ -8,23 +8,24 @@ from core.permissions import IsAdminOrRoot, IsCommanderOrHR
 from core.responses import APIResponse
 from .models import TrajectoryForecast
 from .serializers import TrajectoryForecastSerializer
-from .services import forecast_officer_to_position, MODEL_VERSION
+from .services import get_or_create_forecast, generate_forecasts
+from .readiness import unit_readiness
+from .tasks import generate_forecasts_task, GENERATE_FORECASTS_JOB
+from apps.jobs.services import start_job
+from apps.jobs.serializers import JobSerializer
 from apps.users.models import OfficerProfile
-from apps.directory.models import Position
+from apps.users.scope import get_scope
+from apps.directory.models import Position, Unit
+from apps.directory.services import unit_subtree_ids, user_can_view_unit
+from apps.directory.filters import UnitSubtreeFilter
+
+# больше пар офицер × позиция — считаем фоновой задачей
+FORECAST_SYNC_LIMIT = 5000
 
 
 def _visible_officers(user):
-    # такие же правила видимости, как в других аппах
-    role = getattr(user, "role", None)
-    qs = OfficerProfile.objects.select_related("user")
-    if role == "OFFICER":
-        return qs.filter(user=user)
-    if role == "COMMANDER":
-        from apps.users.models import CommanderAssignment
-        ids = CommanderAssignment.objects.filter(commander__user=user, until__isnull=True) \
-            .values_list("officer_id", flat=True)
-        return qs.filter(id__in=list(ids))
-    return qs  # HR/ADMIN/ROOT
+    # такие же правила видимости, как в других аппах (apps.users.scope)
+    return OfficerProfile.objects.select_related("user").filter(get_scope(user).officer_q())
 
 
 class TrajectoryForecastViewSet(viewsets.ModelViewSet):
@@ -34,8 +35,9 @@ class TrajectoryForecastViewSet(viewsets.ModelViewSet):
     """
     serializer_class = TrajectoryForecastSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ["officer", "target_position", "model_version"]
+    unit_subtree_field = "officer__unit"
     ordering = ["-created_at"]
     search_fields = ["officer__user__email", "target_position__title", "model_version"]
 
@@ -54,7 +56,8 @@ class TrajectoryForecastViewSet(viewsets.ModelViewSet):
     def generate(self, request):
         """
         Генерация прогноза по офицеру и целевой позиции.
-        body: {"officer": <id>, "target_position": <id>}
+        body: {"officer": <id>, "target_position": <id>, "force": false}
+        Если входы прогноза не менялись — возвращается существующий (200), force=true — пересчитать.
         - OFFICER: запрещено генерировать (только чтение)
         - COMMANDER/HR/ADMIN/ROOT: можно
         """
@@ -79,17 +82,87 @@ class TrajectoryForecastViewSet(viewsets.ModelViewSet):
 
         # Командир может генерить только для своих подчинённых
         if request.user.role == "COMMANDER":
-            from apps.users.models import CommanderAssignment
-            if not CommanderAssignment.objects.filter(commander__user=request.user, officer=officer,
-                                                      until__isnull=True).exists():
+            if not get_scope(request.user).can_view_officer(officer.id):
                 return APIResponse.forbidden("Можно генерировать только для подчинённых")
 
-        prob, horizon = forecast_officer_to_position(officer, position)
-        obj = TrajectoryForecast.objects.create(
-            officer=officer,
-            target_position=position,
-            probability=prob,
-            horizon_months=horizon,
-            model_version=MODEL_VERSION
-        )
+        force = str(request.data.get("force", False)).lower() in ("1", "true", "yes")
+        obj, created = get_or_create_forecast(officer, position, force=force)
+        if not created:
+            return APIResponse.success(TrajectoryForecastSerializer(obj).data, "Прогноз актуален")
         return APIResponse.created(TrajectoryForecastSerializer(obj).data, "Прогноз создан")
+
+    @action(detail=False, methods=["post"], url_path="generate-batch")
+    def generate_batch(self, request):
+        """
+        Пакетная генерация прогнозов: все офицеры области × список позиций.
+        body: {"positions": [<id>, ...], "officers": [<id>, ...] и/или "unit": <id> (с подчинёнными),
+               "force": false — пересоздать и прогнозы с неизменившимися входами}
+        Командир — только по своим подчинённым. Больше FORECAST_SYNC_LIMIT пар — фоновая задача (202 + Job).
+        """
+        if request.user.role not in ("COMMANDER", "HR", "ADMIN", "ROOT"):
+            return APIResponse.forbidden("Недостаточно прав для генерации")
+
+        data = request.data
+        try:
+            position_ids = [int(p) for p in data.get("positions") or []]
+            officer_ids = [int(o) for o in data.get("officers") or []]
+            unit_id = int(data["unit"]) if data.get("unit") else None
+        except (TypeError, ValueError):
+            return APIResponse.validation_error({"detail": ["positions, officers, unit должны быть id"]})
+        if not position_ids:
+            return APIResponse.validation_error({"positions": ["обязательное поле"]})
+        if not officer_ids and unit_id is None:
+            return APIResponse.validation_error({"detail": ["Укажите officers или unit"]})
+
+        position_ids = list(Position.objects.filter(id__in=position_ids).values_list("id", flat=True))
+        if not position_ids:
+            return APIResponse.not_found("Позиции не найдены")
+
+        officers = _visible_officers(request.user)
+        if unit_id is not None:
+            officers = officers.filter(unit_id__in=unit_subtree_ids(unit_id))
+        if officer_ids:
+            officers = officers.filter(id__in=officer_ids)
+        officer_ids = list(officers.values_list("id", flat=True))
+        if not officer_ids:
+            return APIResponse.not_found("Нет доступных офицеров")
+
+        force = str(data.get("force", False)).lower() in ("1", "true", "yes")
+        if len(officer_ids) * len(position_ids) > FORECAST_SYNC_LIMIT:
+            job = start_job(generate_forecasts_task, GENERATE_FORECASTS_JOB,
+                            params={"officers": officer_ids, "positions": position_ids, "force": force},
+                            user=request.user, total=len(officer_ids) * len(position_ids))
+            return APIResponse.success(JobSerializer(job).data, message="Генерация прогнозов запущена",
+                                       code=status.HTTP_202_ACCEPTED)
+
+        stats = generate_forecasts(OfficerProfile.objects.filter(id__in=officer_ids), position_ids, force=force)
+        return APIResponse.created({**stats, "officers": len(officer_ids), "positions": len(position_ids)},
+                                   "Прогнозы созданы")
+
+    @action(detail=False, methods=["get"], url_path="unit-readiness")
+    def readiness(self, request):
+        """
+        Готовность подразделения (с подчинёнными) к позиции одним запросом:
+        распределение вероятностей по последним прогнозам, офицеры не ниже порога,
+        пробелы по требуемым компетенциям.
+        query: unit, position (обязательные), threshold (по умолчанию 70), top (до 100, по умолчанию 20)
+        HR — по своим юнитам, командир — по своему, ADMIN/ROOT — по любому.
+        """
+        params = request.query_params
+        try:
+            unit_id = int(params["unit"])
+            position_id = int(params["position"])
+            threshold = float(params.get("threshold", 70))
+            top = max(1, min(int(params.get("top", 20)), 100))
+        except KeyError:
+            return APIResponse.validation_error({"detail": ["unit и position обязательны"]})
+        except (TypeError, ValueError):
+            return APIResponse.validation_error({"detail": ["unit, position, top — id/числа, threshold — число"]})
+
+        if not Unit.objects.filter(id=unit_id).exists():
+            return APIResponse.not_found("Подразделение не найдено")
+        if not Position.objects.filter(id=position_id).exists():
+            return APIResponse.not_found("Позиция не найдена")
+        if not user_can_view_unit(request.user, unit_id):
+            return APIResponse.forbidden("Нет доступа к подразделению")
+        return APIResponse.success(unit_readiness(unit_id, position_id, threshold=threshold, top=top))
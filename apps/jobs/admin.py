@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "processed", "total", "created_by", "created_at", "finished_at")
+    list_filter = ("kind", "status", "created_at")
+    search_fields = ("kind", "created_by__email")
+    readonly_fields = ("created_at", "started_at", "finished_at")
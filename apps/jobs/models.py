@@ -0,0 +1,30 @@
+# Фоновые задачи (долгие пересчёты, пакетные операции)
+from django.db import models
+
+
+class Job(models.Model):
+    """Фоновая задача с прогрессом (processed/total) для опроса с фронта"""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'В очереди'
+        RUNNING = 'RUNNING', 'Выполняется'
+        SUCCESS = 'SUCCESS', 'Завершена'
+        FAILED = 'FAILED', 'Ошибка'
+
+    kind = models.CharField(max_length=50, db_index=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    params = models.JSONField(default=dict, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_by', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} • {self.get_status_display()} ({self.processed}/{self.total})"
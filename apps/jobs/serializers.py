@@ -0,0 +1,19 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            "id", "kind", "status", "params", "processed", "total", "progress",
+            "errors", "result", "created_by", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj) -> float:
+        if obj.status == Job.Status.SUCCESS:
+            return 100.0
+        return round(obj.processed * 100.0 / obj.total, 1) if obj.total else 0.0
@@ -0,0 +1,78 @@
+"""
+Фоновые задачи: запись Job + запуск celery-таска после коммита.
+
+Таск получает job_id и работает внутри run_job(): статусы RUNNING → SUCCESS/FAILED,
+прогресс пишется queryset.update() (сразу виден при опросе, без сигналов аудита).
+Без брокера (CELERY_TASK_ALWAYS_EAGER) таск выполняется в том же процессе.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+MAX_ERRORS = 100
+
+
+def create_job(kind: str, params: dict = None, user=None, total: int = 0) -> Job:
+    return Job.objects.create(
+        kind=kind, params=params or {}, total=total,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def start_job(task, kind: str, params: dict = None, user=None, total: int = 0) -> Job:
+    """Создать Job и поставить celery-таск task(job_id) после коммита транзакции."""
+    job = create_job(kind, params=params, user=user, total=total)
+    transaction.on_commit(lambda: task.delay(job.id))
+    return job
+
+
+class JobProgress:
+    """Обёртка над Job для таска: прогресс и ошибки без гонок с опросом."""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.params = job.params or {}
+        self.errors = []
+        self.result = None
+
+    def set_total(self, total: int):
+        self.job.total = total
+        Job.objects.filter(pk=self.job.pk).update(total=total)
+
+    def advance(self, n: int = 1):
+        self.job.processed += n
+        Job.objects.filter(pk=self.job.pk).update(processed=F("processed") + n)
+
+    def error(self, message: str, **details):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"message": message, **details})
+            Job.objects.filter(pk=self.job.pk).update(errors=self.errors)
+
+
+@contextmanager
+def run_job(job_id: int):
+    """
+    Контекст выполнения таска:
+        with run_job(job_id) as progress:
+            progress.set_total(n); ...; progress.advance(k); progress.result = {...}
+    Исключение внутри — FAILED с текстом ошибки; ошибки по частям (progress.error) — тоже FAILED.
+    """
+    job = Job.objects.get(pk=job_id)
+    Job.objects.filter(pk=job_id).update(status=Job.Status.RUNNING, started_at=timezone.now())
+    progress = JobProgress(job)
+    try:
+        yield progress
+    except Exception as e:
+        progress.error(str(e) or e.__class__.__name__)
+        Job.objects.filter(pk=job_id).update(
+            status=Job.Status.FAILED, errors=progress.errors, finished_at=timezone.now()
+        )
+        return
+    Job.objects.filter(pk=job_id).update(
+        status=Job.Status.FAILED if progress.errors else Job.Status.SUCCESS,
+        result=progress.result, errors=progress.errors, finished_at=timezone.now(),
+    )
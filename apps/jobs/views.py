@@ -0,0 +1,23 @@
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets, filters
+from rest_framework.permissions import IsAuthenticated
+
+from core.permissions import IsAdminOrRoot
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Опрос статуса фоновых задач: ADMIN/ROOT видят все, остальные — только свои."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ["kind", "status"]
+    ordering_fields = ["created_at"]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if IsAdminOrRoot().has_permission(self.request, self):
+            return qs
+        return qs.filter(created_by=self.request.user)
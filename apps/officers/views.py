@@ -7,6 +7,7 @@ from rest_framework.response import Response
 
 from core.permissions import IsOwnProfile, CanViewSubordinates, IsAdminOrRoot
 from apps.users.models import OfficerProfile
+from apps.users.scope import get_scope
 from .models import PositionHistory, OfficerDocument, CourseEnrollment, Certificate
 from .serializers import (
     PositionHistorySerializer, OfficerDocumentSerializer,
@@ -22,18 +23,8 @@ def officer_queryset_for_user(user):
     - COMMANDER: только подчинённые (по CommanderAssignment, действующие)
     - HR/ADMIN/ROOT: все
     """
-    qs = OfficerProfile.objects.select_related("user", "rank", "unit", "current_position")
-    role = getattr(user, "role", None)
-    if role == "OFFICER":
-        return qs.filter(user=user)
-    if role == "COMMANDER":
-        from apps.users.models import CommanderAssignment
-        sub_ids = CommanderAssignment.objects.filter(
-            commander__user=user, until__isnull=True
-        ).values_list("officer_id", flat=True)
-        return qs.filter(id__in=sub_ids)
-    # HR/ADMIN/ROOT
-    return qs
+    return OfficerProfile.objects.select_related("user", "rank", "unit", "current_position") \
+        .filter(get_scope(user).officer_q())
 
 
 # -------- PositionHistory --------
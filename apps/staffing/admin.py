@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Vacancy, CandidateMatch, Assignment
+from .models import Vacancy, CandidateMatch, Assignment, CandidateMatchQueue
 
 
 @admin.register(Vacancy)
@@ -18,6 +18,13 @@ class CandidateMatchAdmin(admin.ModelAdmin):
     autocomplete_fields = ("vacancy", "officer")
 
 
+@admin.register(CandidateMatchQueue)
+class CandidateMatchQueueAdmin(admin.ModelAdmin):
+    list_display = ("id", "vacancy", "officer", "reason", "queued_at")
+    list_filter = ("reason",)
+    raw_id_fields = ("vacancy", "officer")
+
+
 @admin.register(Assignment)
 class AssignmentAdmin(admin.ModelAdmin):
     list_display = ("id", "vacancy", "officer", "state", "decided_at")
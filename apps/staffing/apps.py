@@ -5,3 +5,6 @@ class StaffingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.staffing'
     verbose_name = 'Укомплектование'
+
+    def ready(self):
+        from . import signals  # noqa
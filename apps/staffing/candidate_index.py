@@ -0,0 +1,216 @@
+"""
+Предрасчитанный индекс офицеров для org-wide поиска кандидатов на вакансию.
+
+Индекс держит всех офицеров в виде массивов NumPy (порядок звания, дата начала службы,
+последние оценки по компетенциям) и обновляется лениво, когда меняется версия "officer_index".
+Версию повышает invalidate_officer_index (после коммита, см. apps.staffing.signals) и кладёт
+под новой версией список изменённых офицеров: процесс догоняет версию, перечитывая только их строки.
+Полная пересборка — если дельта потеряна/не записана (например, смена званий) или слишком велика.
+"""
+import copy
+import threading
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from core.versions import get_version, bump_version
+from apps.assessments.models import OfficerCompetencySnapshot
+from apps.directory.services import unit_subtree_ids, get_requirement_profile
+from apps.users.models import OfficerProfile
+from .models import Vacancy
+from .services import _score_arrays, _gaps_for_row, _round2
+
+INDEX_VERSION_KEY = "officer_index"
+INDEX_DELTA_TIMEOUT = 60 * 60
+MAX_PATCH_VERSIONS = 1000   # сколько версий догоняем дельтами (больше — пересборка)
+MAX_PATCH_OFFICERS = 5000   # сколько изменённых офицеров патчим (больше — пересборка дешевле)
+MAX_TOP_K = 500
+
+OFFICER_FIELDS = ("id", "unit_id", "rank_id", "rank__order", "service_start_date")
+
+_lock = threading.Lock()
+_index = None
+
+
+def _delta_key(version: int) -> str:
+    return f"staffing:officer_index:delta:{version}"
+
+
+def invalidate_officer_index(officer_ids=None):
+    """
+    После коммита — новая версия индекса. officer_ids — изменённые офицеры (их строки перечитаются),
+    None — все (полная пересборка).
+    """
+    ids = None if officer_ids is None else sorted(set(officer_ids))
+
+    def publish():
+        version = bump_version(INDEX_VERSION_KEY)
+        if ids is not None:
+            cache.set(_delta_key(version), ids, INDEX_DELTA_TIMEOUT)
+
+    transaction.on_commit(publish)
+
+
+class OfficerVectorIndex:
+    """Снимок офицеров: звание, выслуга, матрица офицер × компетенция."""
+
+    def __init__(self, version: int):
+        self.version = version
+        rows = list(OfficerProfile.objects.order_by("id").values_list(*OFFICER_FIELDS))
+        self.officer_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.row = {oid: i for i, oid in enumerate(self.officer_ids.tolist())}
+        self.active = np.ones(len(rows), dtype=bool)
+        self.unit_ids = np.empty(len(rows), dtype=np.int64)
+        self.rank_order = np.empty(len(rows), dtype=np.int64)
+        self.service_start = np.empty(len(rows), dtype=np.float64)
+        self._set_officers(rows)
+
+        comp_ids = sorted(set(OfficerCompetencySnapshot.objects.values_list("competency_id", flat=True).distinct()))
+        self.comp_col = {cid: j for j, cid in enumerate(comp_ids)}
+        self.scores = np.zeros((len(rows), len(comp_ids)), dtype=np.float64)
+        ratings = OfficerCompetencySnapshot.objects.values_list("officer_id", "competency_id", "score")
+        for oid, cid, score in ratings.iterator(chunk_size=5000):
+            i = self.row.get(oid)
+            if i is not None:
+                self.scores[i, self.comp_col[cid]] = float(score)
+
+    def _set_officers(self, rows):
+        """Поля офицеров (строки OFFICER_FIELDS) в их строки индекса."""
+        for oid, unit_id, rank_id, rank_order, service_start in rows:
+            i = self.row[oid]
+            self.unit_ids[i] = unit_id if unit_id is not None else -1
+            self.rank_order[i] = rank_order if rank_id is not None else -1
+            self.service_start[i] = service_start.toordinal() if service_start else np.nan
+
+    def patched(self, version: int, officer_ids) -> "OfficerVectorIndex":
+        """
+        Копия индекса с перечитанными строками officer_ids (текущий индекс не меняется — им могут
+        пользоваться другие потоки). Новые офицеры дописываются, удалённые гасятся в active.
+        """
+        ids = sorted(officer_ids)
+        rows = list(OfficerProfile.objects.filter(id__in=ids).values_list(*OFFICER_FIELDS))
+        snapshots = list(OfficerCompetencySnapshot.objects.filter(officer_id__in=ids)
+                         .values_list("officer_id", "competency_id", "score"))
+        added = [r[0] for r in rows if r[0] not in self.row]
+        new_comps = sorted({cid for _, cid, _ in snapshots if cid not in self.comp_col})
+        n_old, n_added = len(self.officer_ids), len(added)
+
+        index = copy.copy(self)
+        index.version = version
+        index.officer_ids = np.concatenate([self.officer_ids, np.array(added, dtype=np.int64)])
+        index.row = {**self.row, **{oid: n_old + i for i, oid in enumerate(added)}}
+        index.active = np.concatenate([self.active, np.zeros(n_added, dtype=bool)])
+        index.unit_ids = np.concatenate([self.unit_ids, np.full(n_added, -1, dtype=np.int64)])
+        index.rank_order = np.concatenate([self.rank_order, np.full(n_added, -1, dtype=np.int64)])
+        index.service_start = np.concatenate([self.service_start, np.full(n_added, np.nan)])
+        index.comp_col = {**self.comp_col, **{cid: len(self.comp_col) + j for j, cid in enumerate(new_comps)}}
+        index.scores = np.zeros((n_old + n_added, len(index.comp_col)), dtype=np.float64)
+        index.scores[:n_old, :len(self.comp_col)] = self.scores
+
+        touched = [index.row[oid] for oid in ids if oid in index.row]
+        index.active[touched] = False
+        index.scores[touched] = 0.0
+        index._set_officers(rows)
+        index.active[[index.row[r[0]] for r in rows]] = True
+        for oid, cid, score in snapshots:
+            i = index.row.get(oid)
+            if i is not None:
+                index.scores[i, index.comp_col[cid]] = float(score)
+        return index
+
+    def __len__(self):
+        return len(self.officer_ids)
+
+    def years_of_service(self, today: date) -> np.ndarray:
+        return (today.toordinal() - self.service_start) / 365.25
+
+    def competency_columns(self, rows: np.ndarray, competency_ids: list[int]) -> np.ndarray:
+        """Подматрица выбранных офицеров по нужным компетенциям (нет столбца — оценок нет ни у кого)."""
+        current = np.zeros((len(rows), len(competency_ids)), dtype=np.float64)
+        for j, cid in enumerate(competency_ids):
+            col = self.comp_col.get(cid)
+            if col is not None:
+                current[:, j] = self.scores[rows, col]
+        return current
+
+
+def _changed_officers(since: int, version: int) -> Optional[set]:
+    """Офицеры, изменённые между версиями; None — дельт не хватает или их слишком много."""
+    if version - since > MAX_PATCH_VERSIONS:
+        return None
+    keys = [_delta_key(v) for v in range(since + 1, version + 1)]
+    deltas = cache.get_many(keys)
+    if len(deltas) != len(keys):
+        return None
+    changed = set().union(*deltas.values())
+    return changed if len(changed) <= MAX_PATCH_OFFICERS else None
+
+
+def get_officer_index() -> OfficerVectorIndex:
+    """Индекс текущей версии: догоняется дельтами, при их нехватке — пересобирается (один раз на процесс)."""
+    global _index
+    version = get_version(INDEX_VERSION_KEY)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        index = _index
+        if index is None or index.version != version:
+            changed = _changed_officers(index.version, version) \
+                if index is not None and index.version < version else None
+            _index = index.patched(version, changed) if changed is not None else OfficerVectorIndex(version)
+        return _index
+
+
+def top_candidates_for_vacancy(vacancy: Vacancy, k: int = 20, unit_id: Optional[int] = None,
+                               min_rank_order: Optional[int] = None,
+                               max_rank_order: Optional[int] = None) -> list[dict]:
+    """
+    Топ-K кандидатов на вакансию по всем подразделениям.
+    Баллы и гэпы те же, что у build_matches_for_vacancy; фильтры — поддерево юнита и диапазон званий.
+    """
+    index = get_officer_index()
+    k = max(1, min(int(k), MAX_TOP_K))
+
+    mask = index.active.copy()
+    if unit_id is not None:
+        mask &= np.isin(index.unit_ids, list(unit_subtree_ids(unit_id)))
+    if min_rank_order is not None:
+        mask &= index.rank_order >= min_rank_order
+    if max_rank_order is not None:
+        mask &= (index.rank_order >= 0) & (index.rank_order <= max_rank_order)
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return []
+
+    profile = get_requirement_profile(vacancy.position_id)
+    current = index.competency_columns(rows, list(profile.competency_ids))
+    scored = _score_arrays(profile, index.rank_order[rows],
+                           index.years_of_service(date.today())[rows], current)
+
+    final = scored["final"]
+    top = np.argpartition(-final, k - 1)[:k] if len(final) > k else np.arange(len(final))
+    # равные баллы — по id офицера, чтобы выдача была стабильной
+    top = top[np.lexsort((index.officer_ids[rows[top]], -final[top]))]
+
+    officer_ids = index.officer_ids[rows[top]].tolist()
+    profiles = OfficerProfile.objects.select_related("user", "rank", "unit").in_bulk(officer_ids)
+
+    result = []
+    for pos, oid in zip(top, officer_ids):
+        officer = profiles.get(oid)
+        if officer is None:  # удалён после построения индекса
+            continue
+        result.append({
+            "officer": oid,
+            "officer_name": officer.full_name or officer.user.email,
+            "rank_name": officer.rank.name if officer.rank else None,
+            "unit": officer.unit_id,
+            "unit_name": officer.unit.name if officer.unit else None,
+            "match_score": _round2(float(final[pos]) * 100.0),
+            "gaps": _gaps_for_row(scored, pos, profile, officer.rank.name if officer.rank else None),
+        })
+    return result
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.staffing.recompute import process_match_queue
+
+
+class Command(BaseCommand):
+    help = "Пересчитать CandidateMatch для пар из очереди (однократно или в цикле)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--loop", action="store_true", help="Работать постоянно, опрашивая очередь")
+        parser.add_argument("--interval", type=float, default=5.0, help="Пауза между опросами в режиме --loop, сек")
+
+    def handle(self, *args, **opts):
+        while True:
+            processed = process_match_queue(batch_size=opts["batch_size"])
+            if processed:
+                self.stdout.write(f"Пересчитано пар: {processed}")
+            if not opts["loop"]:
+                break
+            time.sleep(opts["interval"])
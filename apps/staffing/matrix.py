@@ -0,0 +1,64 @@
+"""
+Матрица баллов «вакансии × офицеры» для планирования.
+
+Профили требований всех позиций и последние оценки всех офицеров грузятся один раз,
+баллы считаются тем же векторным скорингом, что и build_matches_for_vacancy (по позиции —
+один проход по всем офицерам). Строки отдаются генератором, чтобы ответ можно было стримить.
+"""
+from datetime import date
+
+import numpy as np
+
+from apps.assessments.services import competency_score_matrix
+from apps.directory.services import get_requirement_profiles
+from .services import _score_arrays, _gaps_for_row, _round2, _years_between
+
+MAX_MATRIX_CELLS = 2_000_000
+
+
+class OfficerBlock:
+    """Офицеры матрицы в виде массивов (без загрузки моделей)."""
+
+    def __init__(self, officer_qs):
+        today = date.today()
+        rows = list(officer_qs.order_by("id").values_list(
+            "id", "rank_id", "rank__order", "rank__name", "service_start_date"
+        ))
+        self.ids = [r[0] for r in rows]
+        self.rank_order = np.array([r[2] if r[1] is not None else -1 for r in rows], dtype=np.int64)
+        self.rank_names = [r[3] for r in rows]
+        self.years = np.array([_years_between(r[4], today) if r[4] else np.nan for r in rows], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def iter_score_matrix(vacancies, officers: OfficerBlock, include_gaps: bool = True):
+    """
+    Генератор строк (vacancy, scores, gaps): scores — баллы по officers.ids,
+    gaps — список гэпов по тем же офицерам (None, если include_gaps=False).
+    Вакансии идут по позициям: одна позиция считается один раз.
+    """
+    vacancies = sorted(vacancies, key=lambda v: (v.position_id, v.id))
+    if not vacancies or not len(officers):
+        for v in vacancies:
+            yield v, [], [] if include_gaps else None
+        return
+
+    profiles = get_requirement_profiles(v.position_id for v in vacancies)
+    comp_ids = sorted({cid for p in profiles.values() for cid in p.competency_ids})
+    col = {cid: j for j, cid in enumerate(comp_ids)}
+    ratings = competency_score_matrix(officers.ids, comp_ids)
+
+    current_position, row = None, None
+    for vacancy in vacancies:
+        if vacancy.position_id != current_position:
+            current_position = vacancy.position_id
+            profile = profiles[current_position]
+            current = ratings[:, [col[cid] for cid in profile.competency_ids]]
+            scored = _score_arrays(profile, officers.rank_order, officers.years, current)
+            scores = [_round2(x * 100.0) for x in scored["final"].tolist()]
+            gaps = [_gaps_for_row(scored, i, profile, officers.rank_names[i])
+                    for i in range(len(officers))] if include_gaps else None
+            row = (scores, gaps)
+        yield vacancy, row[0], row[1]
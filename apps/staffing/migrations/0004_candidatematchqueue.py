@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-17 00:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_officerprofile_awards_officerprofile_children_count_and_more'),
+        ('staffing', '0003_alter_vacancy_position_alter_vacancy_unit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateMatchQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(blank=True, max_length=32)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('officer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.officerprofile')),
+                ('vacancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='staffing.vacancy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['queued_at'], name='staffing_ca_queued__41959d_idx')],
+                'unique_together': {('vacancy', 'officer')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.25 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+def backfill_mandatory_gaps(apps, schema_editor):
+    CandidateMatch = apps.get_model('staffing', 'CandidateMatch')
+    batch = []
+    for m in CandidateMatch.objects.only('id', 'gaps').iterator(chunk_size=2000):
+        count = sum(1 for g in (m.gaps or []) if g.get('type') == 'COMPETENCY' and g.get('mandatory'))
+        if count:
+            m.mandatory_gap_count = count
+            m.has_mandatory_gap = True
+            batch.append(m)
+        if len(batch) >= 2000:
+            CandidateMatch.objects.bulk_update(batch, ['mandatory_gap_count', 'has_mandatory_gap'])
+            batch = []
+    CandidateMatch.objects.bulk_update(batch, ['mandatory_gap_count', 'has_mandatory_gap'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staffing', '0004_candidatematchqueue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatematch',
+            name='has_mandatory_gap',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='candidatematch',
+            name='mandatory_gap_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_mandatory_gaps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='candidatematch',
+            index=models.Index(fields=['vacancy', '-match_score', 'id'], name='staffing_cm_vacancy_score_idx'),
+        ),
+    ]
@@ -33,6 +33,9 @@ class CandidateMatch(models.Model):
     match_score = models.DecimalField(max_digits=5, decimal_places=2,
                                       validators=[MinValueValidator(0), MaxValueValidator(100)])
     gaps = models.JSONField(default=list, blank=True)  # список {competency, current, required}
+    # денормализация gaps для фильтров в SQL (заполняется в upsert_candidate_matches)
+    mandatory_gap_count = models.PositiveSmallIntegerField(default=0)
+    has_mandatory_gap = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -42,6 +45,7 @@ class CandidateMatch(models.Model):
 
     class Meta:
         unique_together = ('vacancy', 'officer')
+        indexes = [models.Index(fields=['vacancy', '-match_score', 'id'], name='staffing_cm_vacancy_score_idx')]
 
 
 class Assignment(models.Model):
@@ -81,3 +85,18 @@ class Assignment(models.Model):
         self.decided_at = timezone.now()
         self.decision_chain.append(
             {'actor': getattr(by_user, 'email', ''), 'action': 'assigned', 'at': timezone.now().isoformat()})
+
+
+class CandidateMatchQueue(models.Model):
+    """Очередь пересчёта: пары (вакансия, офицер), чей CandidateMatch устарел."""
+    vacancy = models.ForeignKey(Vacancy, on_delete=models.CASCADE, related_name='+')
+    officer = models.ForeignKey('users.OfficerProfile', on_delete=models.CASCADE, related_name='+')
+    reason = models.CharField(max_length=32, blank=True)
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.vacancy_id} ↔ {self.officer_id} ({self.reason})"
+
+    class Meta:
+        unique_together = ('vacancy', 'officer')
+        indexes = [models.Index(fields=['queued_at'])]
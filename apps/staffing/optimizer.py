@@ -0,0 +1,187 @@
+"""
+Глобальное распределение офицеров по открытым вакансиям (один офицер — одна вакансия).
+
+Баллы берутся из CandidateMatch. Задача о назначениях решается точно
+(scipy.optimize.linear_sum_assignment, если SciPy установлен, иначе венгерский алгоритм
+на NumPy); для очень больших задач — жадно (лучшие пары первыми).
+Результат — черновики Assignment (state=draft), созданные одним bulk_create.
+Перед созданием вакансии и офицеры пар блокируются (select_for_update) и заново проверяются
+на активные заявки: параллельный запуск не создаст второй черновик на ту же вакансию или офицера.
+"""
+from typing import Optional
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import OfficerProfile
+from .models import Vacancy, CandidateMatch, Assignment
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy не обязателен
+    linear_sum_assignment = None
+
+# выше этого числа ячеек (вакансии × офицеры) в режиме auto — жадный алгоритм
+OPTIMAL_MAX_CELLS = 10_000_000
+# заявки в этих состояниях «занимают» и вакансию, и офицера
+ACTIVE_ASSIGNMENT_STATES = ("draft", "recommended", "hr_review", "approved", "assigned")
+METHODS = ("auto", "optimal", "greedy")
+
+
+def _hungarian(cost: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Венгерский алгоритм (потенциалы + кратчайшие увеличивающие пути), минимизация.
+    cost: n × m, n <= m. Внутренний цикл по столбцам векторизован. O(n² · m).
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] — строка (с 1), занявшая столбец j; 0 — свободен
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv)
+            minv[better] = cur[better]
+            way[1:][better] = j0
+
+            masked = np.where(free, minv, np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            used_cols = np.flatnonzero(used)
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def _solve_optimal(scores: np.ndarray, allowed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Недопустимые пары получают цену больше любой суммы баллов и потом отбрасываются,
+    поэтому сначала максимизируется число закрытых вакансий, затем — сумма баллов.
+    """
+    transposed = scores.shape[0] > scores.shape[1]
+    if transposed:
+        scores, allowed = scores.T, allowed.T
+    forbidden = scores.max(initial=0.0) * (min(scores.shape) + 1) + 1.0
+    cost = np.where(allowed, -scores, forbidden)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+    else:
+        rows, cols = _hungarian(cost)
+    keep = allowed[rows, cols]
+    rows, cols = rows[keep], cols[keep]
+    return (cols, rows) if transposed else (rows, cols)
+
+
+def _solve_greedy(scores: np.ndarray, allowed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Пары по убыванию балла; берём пару, если вакансия и офицер ещё свободны."""
+    rows, cols = np.nonzero(allowed)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    taken_rows = np.zeros(scores.shape[0], dtype=bool)
+    taken_cols = np.zeros(scores.shape[1], dtype=bool)
+    res_rows, res_cols = [], []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if not taken_rows[r] and not taken_cols[c]:
+            taken_rows[r] = taken_cols[c] = True
+            res_rows.append(r)
+            res_cols.append(c)
+    return np.array(res_rows, dtype=np.int64), np.array(res_cols, dtype=np.int64)
+
+
+def _lock_free_pairs(pairs: list) -> list:
+    """
+    Внутри транзакции: заблокировать вакансии и офицеров пар (по возрастанию id — без взаимных
+    блокировок) и оставить только пары, где вакансия всё ещё OPEN и ни у кого нет активной заявки.
+    Конкурирующий запуск ждёт коммита и видит уже созданные черновики.
+    """
+    vacancy_ids = sorted({vid for vid, _, _ in pairs})
+    officer_ids = sorted({oid for _, oid, _ in pairs})
+    open_ids = set(Vacancy.objects.select_for_update().filter(
+        id__in=vacancy_ids, status=Vacancy.VacancyStatus.OPEN).order_by("id").values_list("id", flat=True))
+    list(OfficerProfile.objects.select_for_update().filter(id__in=officer_ids).order_by("id").values_list("id"))
+    busy = Assignment.objects.filter(state__in=ACTIVE_ASSIGNMENT_STATES)
+    busy_vacancies = set(busy.filter(vacancy_id__in=vacancy_ids).values_list("vacancy_id", flat=True))
+    busy_officers = set(busy.filter(officer_id__in=officer_ids).values_list("officer_id", flat=True))
+    return [(vid, oid, score) for vid, oid, score in pairs
+            if vid in open_ids and vid not in busy_vacancies and oid not in busy_officers]
+
+
+def optimize_assignments(vacancies, min_score: Optional[float] = None, method: str = "auto",
+                         dry_run: bool = False, user=None) -> dict:
+    """
+    Распределить офицеров по вакансиям (queryset/список OPEN-вакансий) по баллам CandidateMatch.
+    Вакансии и офицеры с активными заявками (Assignment не rejected) не участвуют.
+    dry_run — только посчитать, заявки не создавать.
+    """
+    busy = Assignment.objects.filter(state__in=ACTIVE_ASSIGNMENT_STATES)
+    busy_vacancies = set(busy.values_list("vacancy_id", flat=True))
+    busy_officers = set(busy.values_list("officer_id", flat=True))
+    vacancy_ids = sorted(
+        {v.id for v in vacancies if v.status == Vacancy.VacancyStatus.OPEN} - busy_vacancies
+    )
+
+    matches = CandidateMatch.objects.filter(vacancy_id__in=vacancy_ids)
+    if min_score is not None:
+        matches = matches.filter(match_score__gte=min_score)
+    triples = [t for t in matches.values_list("vacancy_id", "officer_id", "match_score")
+               if t[1] not in busy_officers]
+
+    officer_ids = sorted({t[1] for t in triples})
+    row = {vid: i for i, vid in enumerate(vacancy_ids)}
+    col = {oid: j for j, oid in enumerate(officer_ids)}
+    scores = np.zeros((len(vacancy_ids), len(officer_ids)), dtype=np.float64)
+    allowed = np.zeros(scores.shape, dtype=bool)
+    for vid, oid, score in triples:
+        scores[row[vid], col[oid]] = float(score)
+        allowed[row[vid], col[oid]] = True
+
+    if method == "auto":
+        method = "optimal" if scores.size <= OPTIMAL_MAX_CELLS else "greedy"
+    if not triples:
+        rows = cols = np.zeros(0, dtype=np.int64)
+    elif method == "optimal":
+        rows, cols = _solve_optimal(scores, allowed)
+    else:
+        rows, cols = _solve_greedy(scores, allowed)
+
+    pairs = [(vacancy_ids[r], officer_ids[c], float(scores[r, c])) for r, c in zip(rows.tolist(), cols.tolist())]
+    created = 0
+    if pairs and not dry_run:
+        with transaction.atomic():
+            pairs = _lock_free_pairs(pairs)
+            now = timezone.now().isoformat()
+            actor = getattr(user, "email", "")
+            objs = [Assignment(vacancy_id=vid, officer_id=oid, decision_chain=[
+                {"actor": actor, "action": "optimized", "at": now, "match_score": score}
+            ]) for vid, oid, score in pairs]
+            created = len(Assignment.objects.bulk_create(objs, batch_size=500))
+
+    assigned = {vid for vid, _, _ in pairs}
+    return {
+        "method": method,
+        "solver": ("scipy" if linear_sum_assignment is not None else "numpy") if method == "optimal" else "greedy",
+        "total_score": round(sum(score for _, _, score in pairs), 2),
+        "assignments": [{"vacancy": vid, "officer": oid, "match_score": score} for vid, oid, score in pairs],
+        "unassigned_vacancies": [vid for vid in vacancy_ids if vid not in assigned],
+        "created": created,
+    }
@@ -0,0 +1,139 @@
+"""
+Инкрементальный пересчёт CandidateMatch.
+
+События (новая оценка, смена звания/выслуги/юнита офицера, правка требований позиции)
+ставят в CandidateMatchQueue только затронутые пары (вакансия, офицер) открытых вакансий.
+Воркер (process_match_queue / команда process_match_queue) пересчитывает их пачками.
+Кандидаты вакансии — офицеры её юнита плюс те, у кого уже есть CandidateMatch.
+"""
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.directory.models import CompetencyRequirement
+from apps.users.models import OfficerProfile
+from .models import Vacancy, CandidateMatch, CandidateMatchQueue
+from .services import score_officers_for_vacancy, upsert_candidate_matches
+
+
+def enqueue_pairs(pairs: Iterable[tuple[int, int]], reason: str = "") -> int:
+    """Поставить пары (vacancy_id, officer_id) в очередь; повторная постановка обновляет queued_at."""
+    now = timezone.now()
+    objs = [CandidateMatchQueue(vacancy_id=v, officer_id=o, reason=reason, queued_at=now) for v, o in set(pairs)]
+    if objs:
+        CandidateMatchQueue.objects.bulk_create(
+            objs, batch_size=1000,
+            update_conflicts=True, unique_fields=["vacancy", "officer"], update_fields=["reason", "queued_at"],
+        )
+    return len(objs)
+
+
+def _open_vacancies():
+    return Vacancy.objects.filter(status=Vacancy.VacancyStatus.OPEN)
+
+
+def enqueue_for_officers(officer_competencies: dict[int, Optional[set]], reason: str = "") -> int:
+    """
+    officer_competencies: {officer_id: {competency_id, ...}} — изменились оценки по этим компетенциям
+    (берём только вакансии, чьи позиции их требуют); None — изменился сам офицер (все его вакансии).
+    """
+    if not officer_competencies:
+        return 0
+    officer_units = dict(OfficerProfile.objects.filter(id__in=list(officer_competencies)).values_list("id", "unit_id"))
+    if not officer_units:
+        return 0
+
+    existing = defaultdict(set)  # officer_id -> {vacancy_id}
+    for vid, oid in CandidateMatch.objects.filter(
+            officer_id__in=list(officer_units), vacancy__status=Vacancy.VacancyStatus.OPEN
+    ).values_list("vacancy_id", "officer_id"):
+        existing[oid].add(vid)
+
+    vacancy_ids = set().union(*existing.values()) if existing else set()
+    by_unit = defaultdict(set)
+    vacancy_position = {}
+    for vid, unit_id, position_id in _open_vacancies().filter(
+            unit_id__in={u for u in officer_units.values() if u}
+    ).values_list("id", "unit_id", "position_id"):
+        by_unit[unit_id].add(vid)
+        vacancy_position[vid] = position_id
+    for vid, position_id in Vacancy.objects.filter(id__in=vacancy_ids - set(vacancy_position)) \
+            .values_list("id", "position_id"):
+        vacancy_position[vid] = position_id
+
+    position_comps = defaultdict(set)
+    if any(comps is not None for comps in officer_competencies.values()):
+        for position_id, cid in CompetencyRequirement.objects.filter(
+                position_id__in=set(vacancy_position.values())
+        ).values_list("position_id", "competency_id"):
+            position_comps[position_id].add(cid)
+
+    pairs = []
+    for oid, unit_id in officer_units.items():
+        comps = officer_competencies[oid]
+        for vid in by_unit.get(unit_id, set()) | existing.get(oid, set()):
+            if comps is None or position_comps[vacancy_position[vid]] & comps:
+                pairs.append((vid, oid))
+    return enqueue_pairs(pairs, reason)
+
+
+def enqueue_for_ratings(ratings, reason: str = "RATING") -> int:
+    officer_competencies = defaultdict(set)
+    for r in ratings:
+        officer_competencies[r.officer_id].add(r.competency_id)
+    return enqueue_for_officers(officer_competencies, reason)
+
+
+def enqueue_for_positions(position_ids: Iterable[int], reason: str = "REQUIREMENT") -> int:
+    """Требования позиции изменились — все кандидаты её открытых вакансий."""
+    vacancies = list(_open_vacancies().filter(position_id__in=list(position_ids)).values_list("id", "unit_id"))
+    if not vacancies:
+        return 0
+    by_unit = defaultdict(list)
+    for vid, unit_id in vacancies:
+        by_unit[unit_id].append(vid)
+
+    pairs = [(vid, oid)
+             for oid, unit_id in OfficerProfile.objects.filter(unit_id__in=list(by_unit)).values_list("id", "unit_id")
+             for vid in by_unit[unit_id]]
+    pairs += list(CandidateMatch.objects.filter(vacancy_id__in=[v for v, _ in vacancies])
+                  .values_list("vacancy_id", "officer_id"))
+    return enqueue_pairs(pairs, reason)
+
+
+def process_match_queue(batch_size: int = 500, max_batches: Optional[int] = None) -> int:
+    """
+    Пересчитать пары из очереди пачками. Возвращает число обработанных пар.
+    Пара, поставленная заново во время пересчёта (queued_at новее прочитанного), остаётся в очереди.
+    """
+    processed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            qs = CandidateMatchQueue.objects.order_by("queued_at", "id")
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            batch = list(qs.values_list("id", "vacancy_id", "officer_id", "queued_at")[:batch_size])
+            if not batch:
+                break
+
+            by_vacancy = defaultdict(list)
+            for _, vid, oid, _ in batch:
+                by_vacancy[vid].append(oid)
+            vacancies = Vacancy.objects.in_bulk(list(by_vacancy))
+            for vid, officer_ids in by_vacancy.items():
+                vacancy = vacancies.get(vid)
+                if vacancy is None or vacancy.status != Vacancy.VacancyStatus.OPEN:
+                    continue
+                officers = list(OfficerProfile.objects.filter(id__in=officer_ids).select_related("rank"))
+                upsert_candidate_matches(vacancy, officers, score_officers_for_vacancy(officers, vacancy))
+
+            CandidateMatchQueue.objects.filter(
+                id__in=[row[0] for row in batch], queued_at__lte=max(row[3] for row in batch)
+            ).delete()
+
+        processed += len(batch)
+        batches += 1
+    return processed
@@ -1,10 +1,13 @@
 from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 
+import numpy as np
+from django.db import transaction
+
 from apps.staffing.models import CandidateMatch, Vacancy
 from apps.users.models import OfficerProfile
-from apps.directory.models import PositionRequirement, CompetencyRequirement
-from apps.assessments.models import CompetencyRating
+from apps.directory.services import RequirementProfile, get_requirement_profile
+from apps.assessments.services import competency_score_matrix
 
 
 def _years_between(d1: date, d2: date) -> float:
@@ -15,6 +18,96 @@ def _round2(x: float) -> float:
     return float(Decimal(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
 
+def _score_arrays(profile: RequirementProfile, rank_order: np.ndarray, years: np.ndarray,
+                  current: np.ndarray) -> dict:
+    """
+    Скоринг массивами NumPy.
+    rank_order: порядок звания (-1 — звания нет); years: выслуга (nan — нет даты начала службы);
+    current: матрица офицер × компетенция в порядке profile.competency_ids.
+    """
+    n = len(rank_order)
+    has_rank = rank_order >= 0
+    has_ssd = ~np.isnan(years)
+    rank_ok = np.zeros(n, dtype=bool)
+    service_ok = np.zeros(n, dtype=bool)
+    base_got = np.zeros(n, dtype=np.float64)
+    base_parts = np.zeros(n, dtype=np.float64)
+
+    # --- базовые требования
+    if profile.has_base:
+        rank_ok = has_rank & (rank_order >= profile.min_rank_order)
+        base_parts += has_rank
+        base_got += np.where(rank_ok, 1.0, 0.0)
+
+        service_ok = has_ssd & (years >= profile.min_service_years)
+        base_parts += has_ssd
+        base_got += np.where(has_ssd, np.where(service_ok, 1.0, years / max(1, profile.min_service_years)), 0.0)
+
+    base_score = np.where(base_parts > 0, base_got / np.maximum(base_parts, 1.0), 1.0)
+
+    # --- компетенции
+    if profile.competency_ids:
+        required = profile.min_scores_array
+        parts = np.minimum(current / np.maximum(1.0, required), 1.0)
+        got = np.zeros(n, dtype=np.float64)
+        # суммируем по столбцам последовательно — тот же порядок сложения, что и в поштучном цикле
+        for j in range(len(required)):
+            got += parts[:, j]
+        comp_score = got / len(required)
+        below = current < required
+    else:
+        comp_score = np.ones(n, dtype=np.float64)
+        below = np.zeros((n, 0), dtype=bool)
+
+    return {
+        "final": 0.5 * base_score + 0.5 * comp_score,
+        "has_rank": has_rank, "rank_ok": rank_ok,
+        "has_ssd": has_ssd, "service_ok": service_ok,
+        "years": years, "current": current, "below": below,
+    }
+
+
+def _gaps_for_row(scored: dict, i: int, profile: RequirementProfile, rank_name) -> list:
+    gaps = []
+    if profile.has_base:
+        if scored["has_rank"][i] and not scored["rank_ok"][i]:
+            gaps.append({"type": "RANK", "required": profile.min_rank_name, "current": rank_name})
+        if scored["has_ssd"][i] and not scored["service_ok"][i]:
+            gaps.append({"type": "SERVICE_YEARS", "required": profile.min_service_years,
+                         "current": round(float(scored["years"][i]), 1)})
+    for j in np.flatnonzero(scored["below"][i]).tolist():
+        gaps.append({"type": "COMPETENCY", "competency": profile.competency_names[j],
+                     "required": profile.min_scores[j], "current": float(scored["current"][i, j]),
+                     "mandatory": profile.mandatory[j]})
+    return gaps
+
+
+def score_officers_for_vacancy(officers, vacancy: Vacancy) -> list[tuple[float, list]]:
+    """
+    Пакетный скоринг: профиль требований позиции (кэш) и оценки всех офицеров грузятся один раз,
+    баллы считаются массивами NumPy (офицер × компетенция).
+    Формула та же, что в score_officer_for_vacancy: база (ранг, выслуга) 50% + компетенции 50%.
+    Офицеры должны быть загружены с select_related("rank").
+    """
+    officers = list(officers)
+    if not officers:
+        return []
+    today = date.today()
+    profile = get_requirement_profile(vacancy.position_id)
+
+    rank_order = np.array([o.rank.order if o.rank_id else -1 for o in officers], dtype=np.int64)
+    years = np.array([_years_between(o.service_start_date, today) if o.service_start_date else np.nan
+                      for o in officers], dtype=np.float64)
+    current = competency_score_matrix([o.id for o in officers], list(profile.competency_ids))
+    scored = _score_arrays(profile, rank_order, years, current)
+
+    return [
+        (_round2(float(scored["final"][i]) * 100.0),
+         _gaps_for_row(scored, i, profile, officer.rank.name if officer.rank_id else None))
+        for i, officer in enumerate(officers)
+    ]
+
+
 def score_officer_for_vacancy(officer: OfficerProfile, vacancy: Vacancy) -> tuple[float, list]:
     """
     Простой скоринг:
@@ -22,73 +115,46 @@ def score_officer_for_vacancy(officer: OfficerProfile, vacancy: Vacancy) -> tupl
     - Компетенции по позиции = 50%
     Гэпы накапливаем в списке.
     """
-    pos = vacancy.position
-    today = date.today()
-    gaps = []
+    return score_officers_for_vacancy([officer], vacancy)[0]
 
-    # --- базовые требования
-    base_req = PositionRequirement.objects.filter(position=pos).first()
-    base_score = 0.0
-    base_parts = 0
-
-    if base_req:
-        # ранг: сравниваем order
-        if officer.rank and base_req.min_rank:
-            base_parts += 1
-            ok = officer.rank.order >= base_req.min_rank.order
-            base_score += 1.0 if ok else 0.0
-            if not ok:
-                gaps.append({"type": "RANK", "required": base_req.min_rank.name,
-                             "current": officer.rank.name if officer.rank else None})
-
-        # стаж
-        if officer.service_start_date:
-            base_parts += 1
-            years = _years_between(officer.service_start_date, today)
-            ok = years >= base_req.min_service_years
-            base_score += 1.0 if ok else (years / max(1, base_req.min_service_years))
-            if not ok:
-                gaps.append({"type": "SERVICE_YEARS", "required": base_req.min_service_years,
-                             "current": round(years, 1)})
-
-    base_score = (base_score / base_parts) if base_parts else 1.0
 
-    # --- компетенции
-    comp_reqs = list(CompetencyRequirement.objects.filter(position=pos))
-    if comp_reqs:
-        # последние рейтинги офицера
-        own = {r.competency_id: float(r.score) for r in
-               CompetencyRating.objects.filter(officer=officer).order_by("-assessed_at")}
-        got = 0.0
-        for cr in comp_reqs:
-            req = cr.min_score
-            cur = own.get(cr.competency_id, 0.0)
-            # нормируем 1..5
-            part = min(cur / max(1, req), 1.0)
-            got += part
-            if cur < req:
-                gaps.append({"type": "COMPETENCY", "competency": cr.competency.name,
-                             "required": req, "current": cur, "mandatory": cr.is_mandatory})
-        comp_score = got / len(comp_reqs)
-    else:
-        comp_score = 1.0
+def mandatory_gap_count(gaps: list) -> int:
+    return sum(1 for g in gaps if g.get("type") == "COMPETENCY" and g.get("mandatory"))
 
-    # финальный вес
-    final = 0.5 * base_score + 0.5 * comp_score
-    return _round2(final * 100.0), gaps
+
+def upsert_candidate_matches(vacancy: Vacancy, officers, results) -> list[CandidateMatch]:
+    """Записать результаты скоринга в CandidateMatch пачками (bulk_create + bulk_update)."""
+    officers = list(officers)
+    existing = {m.officer_id: m for m in CandidateMatch.objects.filter(
+        vacancy=vacancy, officer_id__in=[o.id for o in officers])}
+    to_create, to_update, matches = [], [], []
+    for officer, (score, gaps) in zip(officers, results):
+        mandatory = mandatory_gap_count(gaps)
+        obj = existing.get(officer.id)
+        if obj is None:
+            obj = CandidateMatch(vacancy=vacancy, officer=officer, match_score=score, gaps=gaps)
+            to_create.append(obj)
+        else:
+            obj.officer = officer
+            obj.match_score = score
+            obj.gaps = gaps
+            to_update.append(obj)
+        obj.mandatory_gap_count = mandatory
+        obj.has_mandatory_gap = mandatory > 0
+        matches.append(obj)
+
+    with transaction.atomic():
+        CandidateMatch.objects.bulk_create(to_create, batch_size=500)
+        CandidateMatch.objects.bulk_update(
+            to_update, ["match_score", "gaps", "mandatory_gap_count", "has_mandatory_gap"], batch_size=500
+        )
+    return matches
 
 
 def build_matches_for_vacancy(vacancy: Vacancy) -> list[CandidateMatch]:
     """
     Пересчитать CandidateMatch для вакансии по всем офицерам из того же юнита.
     """
-    qs = OfficerProfile.objects.filter(unit=vacancy.unit)
-    created = []
-    for off in qs:
-        score, gaps = score_officer_for_vacancy(off, vacancy)
-        obj, _ = CandidateMatch.objects.update_or_create(
-            vacancy=vacancy, officer=off,
-            defaults={"match_score": score, "gaps": gaps}
-        )
-        created.append(obj)
-    return created
+    officers = list(OfficerProfile.objects.filter(unit=vacancy.unit_id).select_related("rank", "user"))
+    results = score_officers_for_vacancy(officers, vacancy)
+    return upsert_candidate_matches(vacancy, officers, results)
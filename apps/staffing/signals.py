@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.versions import bump_version
+from apps.assessments.models import CompetencyRating
+from apps.assessments.signals import competency_ratings_created
+from apps.directory.models import Rank, PositionRequirement, CompetencyRequirement
+from apps.directory.services import UNIT_TREE_VERSION_KEY
+from apps.users.models import OfficerProfile
+from .models import Vacancy
+from .candidate_index import invalidate_officer_index
+from .recompute import enqueue_for_ratings, enqueue_for_officers, enqueue_for_positions
+
+# поля офицера, от которых зависит скоринг и состав кандидатов
+MATCH_FIELDS = ("rank_id", "service_start_date", "unit_id")
+MATCH_UPDATE_FIELDS = {"rank", "rank_id", "service_start_date", "unit", "unit_id"}
+
+
+# ---- индекс кандидатов (candidate_index): перечитываются только изменённые офицеры ----
+@receiver(competency_ratings_created)
+def reindex_rated_officers(sender, ratings, **kwargs):
+    invalidate_officer_index({r.officer_id for r in ratings})
+
+
+@receiver(post_save, sender=CompetencyRating)
+def reindex_edited_rating(sender, instance, created, **kwargs):
+    if not created:  # новые приходят через competency_ratings_created
+        invalidate_officer_index([instance.officer_id])
+
+
+@receiver(post_delete, sender=CompetencyRating)
+@receiver(post_delete, sender=OfficerProfile)
+def reindex_deleted(sender, instance, **kwargs):
+    invalidate_officer_index([instance.officer_id if sender is CompetencyRating else instance.pk])
+
+
+@receiver(post_save, sender=Rank)
+def reindex_ranks(sender, **kwargs):
+    """Порядок званий есть у всех офицеров — полная пересборка."""
+    invalidate_officer_index()
+
+
+# ---- очередь пересчёта CandidateMatch ----
+@receiver(competency_ratings_created)
+def enqueue_rated_officers(sender, ratings, **kwargs):
+    ratings = list(ratings)
+    transaction.on_commit(lambda: enqueue_for_ratings(ratings))
+
+
+@receiver(pre_save, sender=OfficerProfile)
+def remember_match_fields(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk:
+        return
+    if update_fields is not None and not MATCH_UPDATE_FIELDS & set(update_fields):
+        return
+    instance._match_fields_before = OfficerProfile.objects.filter(pk=instance.pk).values_list(*MATCH_FIELDS).first()
+
+
+@receiver(post_save, sender=OfficerProfile)
+def enqueue_changed_officer(sender, instance, created, **kwargs):
+    before = instance.__dict__.pop("_match_fields_before", None)
+    after = tuple(getattr(instance, f) for f in MATCH_FIELDS)
+    if created or (before is not None and before != after):
+        invalidate_officer_index([instance.pk])  # в индексе — все офицеры, в т.ч. без юнита
+    if (created and instance.unit_id) or (before is not None and before != after):
+        transaction.on_commit(lambda: enqueue_for_officers({instance.pk: None}, reason="OFFICER"))
+
+
+@receiver(post_save, sender=PositionRequirement)
+@receiver(post_delete, sender=PositionRequirement)
+@receiver(post_save, sender=CompetencyRequirement)
+@receiver(post_delete, sender=CompetencyRequirement)
+def enqueue_position_candidates(sender, instance, **kwargs):
+    position_id = instance.position_id
+    transaction.on_commit(lambda: enqueue_for_positions([position_id]))
+
+
+@receiver(post_save, sender=Vacancy)
+@receiver(post_delete, sender=Vacancy)
+def invalidate_unit_tree(sender, **kwargs):
+    """Число открытых вакансий в дереве юнитов (apps.directory.services.unit_tree)."""
+    transaction.on_commit(lambda: bump_version(UNIT_TREE_VERSION_KEY))
@@ -0,0 +1,28 @@
+from celery import shared_task
+
+from apps.jobs.services import run_job
+from apps.users.models import OfficerProfile
+from .models import Vacancy
+from .services import score_officers_for_vacancy, upsert_candidate_matches
+
+GENERATE_MATCHES_JOB = "staffing.generate_matches"
+CHUNK_SIZE = 500
+
+
+@shared_task
+def generate_matches_task(job_id: int):
+    """Пересчёт CandidateMatch вакансии пачками по CHUNK_SIZE офицеров с прогрессом в Job."""
+    with run_job(job_id) as progress:
+        vacancy = Vacancy.objects.get(pk=progress.params["vacancy"])
+        officers = list(OfficerProfile.objects.filter(unit=vacancy.unit_id).select_related("rank", "user"))
+        progress.set_total(len(officers))
+        saved = 0
+        for start in range(0, len(officers), CHUNK_SIZE):
+            chunk = officers[start:start + CHUNK_SIZE]
+            try:
+                upsert_candidate_matches(vacancy, chunk, score_officers_for_vacancy(chunk, vacancy))
+                saved += len(chunk)
+            except Exception as e:
+                progress.error(str(e), officers=[o.id for o in chunk[:10]], offset=start)
+            progress.advance(len(chunk))
+        progress.result = {"vacancy": vacancy.id, "matches": saved}
@@ -1,3 +1,8 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
@@ -5,39 +10,221 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django_fsm import TransitionNotAllowed
 
+from core.pagination import KeysetPagination
 from core.permissions import IsAdminOrRoot, IsCommanderOrHR, IsHR
 from core.responses import APIResponse
-from apps.users.models import CommanderProfile, HRProfile
-from apps.directory.models import Unit
+from apps.jobs.services import start_job
+from apps.jobs.serializers import JobSerializer
+from apps.users.models import OfficerProfile
+from apps.users.scope import get_scope
+from apps.directory.models import Unit, Rank
+from apps.directory.services import unit_subtree_ids
+from apps.directory.filters import UnitSubtreeFilter
 from .models import Vacancy, CandidateMatch, Assignment
 from .serializers import VacancySerializer, CandidateMatchSerializer, AssignmentSerializer
-from .services import build_matches_for_vacancy
+from .tasks import generate_matches_task, GENERATE_MATCHES_JOB
+from .candidate_index import top_candidates_for_vacancy, MAX_TOP_K
+from .matrix import OfficerBlock, iter_score_matrix, MAX_MATRIX_CELLS
+from .optimizer import optimize_assignments, METHODS
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: writerow возвращает строку для стрима."""
+
+    def write(self, value):
+        return value
 
 
 class VacancyViewSet(viewsets.ModelViewSet):
     queryset = Vacancy.objects.select_related("position", "unit").all()
     serializer_class = VacancySerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ["unit", "position", "status"]
+    unit_subtree_field = "unit"
     ordering_fields = ["open_from", "open_to"]
     search_fields = ["position__title", "unit__name"]
+    candidates_ordering = ("-match_score", "id")
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, (IsHR | IsAdminOrRoot)])
     def generate_matches(self, request, pk=None):
+        """
+        Пересчёт кандидатов в фоне: 202 + Job; статус и прогресс — GET /jobs/{id}/,
+        результат — GET .../candidates/ после status=SUCCESS.
+        """
         vacancy = self.get_object()
-        try:
-            objs = build_matches_for_vacancy(vacancy)
-        except Exception as e:
-            return APIResponse.error(f"Не удалось пересчитать кандидатов: {e}", status=400)
-        data = CandidateMatchSerializer(objs, many=True, context={"request": request}).data
-        return APIResponse.success(data, message="Кандидаты пересчитаны")
+        job = start_job(generate_matches_task, GENERATE_MATCHES_JOB, params={"vacancy": vacancy.id},
+                        user=request.user)
+        return APIResponse.success(JobSerializer(job).data, message="Пересчёт кандидатов запущен",
+                                   code=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
     def candidates(self, request, pk=None):
-        qs = CandidateMatch.objects.select_related("officer", "officer__rank").filter(vacancy_id=pk).order_by(
-            "-match_score")
-        return APIResponse.success(CandidateMatchSerializer(qs, many=True).data)
+        """
+        Кандидаты вакансии по убыванию балла, keyset-пагинация (cursor, page_size).
+        query: top — только первые N (без пагинации), min_score — не ниже балла,
+               has_mandatory_gap — true/false (есть ли провалы по обязательным компетенциям)
+        """
+        params = request.query_params
+        qs = CandidateMatch.objects.select_related("officer__user", "officer__rank").filter(vacancy_id=pk)
+        try:
+            top = int(params["top"]) if params.get("top") else None
+            if params.get("min_score"):
+                qs = qs.filter(match_score__gte=Decimal(params["min_score"]))
+        except (ValueError, InvalidOperation):
+            return APIResponse.validation_error({"detail": ["top и min_score должны быть числами"]})
+        if params.get("has_mandatory_gap") is not None:
+            qs = qs.filter(has_mandatory_gap=params["has_mandatory_gap"].lower() in ("1", "true", "yes"))
+
+        paginator = KeysetPagination()
+        if top is not None:
+            if top < 1 or top > paginator.max_page_size:
+                return APIResponse.validation_error({"top": [f"Допустимо от 1 до {paginator.max_page_size}"]})
+            rows = qs.order_by(*self.candidates_ordering)[:top]
+            return APIResponse.success({"next": None, "next_cursor": None,
+                                        "results": CandidateMatchSerializer(rows, many=True).data})
+
+        page = paginator.paginate_queryset(qs.order_by(*self.candidates_ordering), request)
+        return APIResponse.success(paginator.get_paginated_data(CandidateMatchSerializer(page, many=True).data))
+
+    @action(detail=True, methods=["get"], url_path="top-candidates",
+            permission_classes=[IsAuthenticated, (IsHR | IsAdminOrRoot)])
+    def top_candidates(self, request, pk=None):
+        """
+        Топ-K кандидатов по всем подразделениям (по предрасчитанному индексу офицеров).
+        query: k (по умолчанию 20, максимум 500), unit (юнит вместе с подчинёнными),
+               min_rank / max_rank (id звания)
+        """
+        vacancy = self.get_object()
+        params = request.query_params
+        try:
+            k = int(params.get("k", 20))
+            unit_id = int(params["unit"]) if params.get("unit") else None
+            min_rank_id = int(params["min_rank"]) if params.get("min_rank") else None
+            max_rank_id = int(params["max_rank"]) if params.get("max_rank") else None
+        except ValueError:
+            return APIResponse.validation_error({"detail": ["k, unit, min_rank, max_rank должны быть числами"]})
+        if k < 1 or k > MAX_TOP_K:
+            return APIResponse.validation_error({"k": [f"Допустимо от 1 до {MAX_TOP_K}"]})
+
+        rank_orders = dict(Rank.objects.filter(id__in=[r for r in (min_rank_id, max_rank_id) if r])
+                           .values_list("id", "order"))
+        unknown = {name: [f"Звание {rank_id} не найдено"]
+                   for name, rank_id in (("min_rank", min_rank_id), ("max_rank", max_rank_id))
+                   if rank_id is not None and rank_id not in rank_orders}
+        if unknown:
+            return APIResponse.validation_error(unknown)
+        results = top_candidates_for_vacancy(
+            vacancy, k=k, unit_id=unit_id,
+            min_rank_order=rank_orders.get(min_rank_id),
+            max_rank_order=rank_orders.get(max_rank_id),
+        )
+        return APIResponse.success({"vacancy": vacancy.id, "count": len(results), "results": results})
+
+    @action(detail=False, methods=["post"], url_path="score-matrix",
+            permission_classes=[IsAuthenticated, (IsHR | IsAdminOrRoot)])
+    def score_matrix(self, request):
+        """
+        Матрица баллов вакансии × офицеры (стримом). Офицеры — только из состава вызывающего
+        (HR — офицеры своих юнитов с подчинёнными, ADMIN/ROOT — все).
+        body: vacancies — id вакансий (по умолчанию все OPEN из доступных),
+              unit — офицеры юнита с подчинёнными и/или officers — id офицеров,
+              format — json (по умолчанию) | csv, include_gaps — true по умолчанию
+        """
+        data = request.data
+        try:
+            vacancy_ids = [int(v) for v in data.get("vacancies") or []]
+            officer_ids = [int(o) for o in data.get("officers") or []]
+            unit_id = int(data["unit"]) if data.get("unit") else None
+        except (TypeError, ValueError):
+            return APIResponse.validation_error({"detail": ["vacancies, officers, unit должны быть id"]})
+        fmt = str(data.get("format") or "json").lower()
+        if fmt not in ("json", "csv"):
+            return APIResponse.validation_error({"format": ["Допустимо json или csv"]})
+        include_gaps = str(data.get("include_gaps", True)).lower() not in ("0", "false", "no")
+        if not officer_ids and unit_id is None:
+            return APIResponse.validation_error({"detail": ["Укажите unit или officers"]})
+
+        scope = get_scope(request.user)
+        if unit_id is not None and not scope.can_view_unit(unit_id):
+            return APIResponse.forbidden("Нет доступа к подразделению")
+
+        vacancies = self.get_queryset()
+        if vacancy_ids:
+            vacancies = vacancies.filter(id__in=vacancy_ids)
+        else:
+            vacancies = vacancies.filter(status=Vacancy.VacancyStatus.OPEN)
+        vacancies = list(vacancies)
+
+        officers = OfficerProfile.objects.filter(scope.command_officer_q())
+        if unit_id is not None:
+            officers = officers.filter(unit_id__in=unit_subtree_ids(unit_id))
+        if officer_ids:
+            officers = officers.filter(id__in=officer_ids)
+        block = OfficerBlock(officers)
+
+        if len(vacancies) * len(block) > MAX_MATRIX_CELLS:
+            return APIResponse.validation_error(
+                {"detail": [f"Слишком большая матрица (больше {MAX_MATRIX_CELLS} ячеек), сузьте выборку"]})
+
+        rows = iter_score_matrix(vacancies, block, include_gaps=include_gaps)
+        if fmt == "csv":
+            writer = csv.writer(_Echo())
+
+            def stream():
+                yield writer.writerow(["vacancy", "position", "officer", "match_score", "gaps"])
+                for vacancy, scores, gaps in rows:
+                    for i, oid in enumerate(block.ids):
+                        yield writer.writerow([vacancy.id, vacancy.position_id, oid, scores[i],
+                                               json.dumps(gaps[i], ensure_ascii=False) if gaps is not None else ""])
+
+            response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
+            response["Content-Disposition"] = 'attachment; filename="score_matrix.csv"'
+            return response
+
+        def stream():
+            head = {"officers": block.ids, "vacancies": [v.id for v in vacancies]}
+            yield '{"success": true, "message": "OK", "data": ' + json.dumps(head)[:-1] + ', "rows": ['
+            for n, (vacancy, scores, gaps) in enumerate(rows):
+                row = {"vacancy": vacancy.id, "position": vacancy.position_id, "scores": scores}
+                if gaps is not None:
+                    row["gaps"] = gaps
+                yield ("," if n else "") + json.dumps(row, ensure_ascii=False)
+            yield "]}}"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, (IsHR | IsAdminOrRoot)])
+    def optimize(self, request):
+        """
+        Глобальное распределение офицеров по OPEN-вакансиям по баллам CandidateMatch
+        (один офицер — одна вакансия) и создание черновиков Assignment.
+        body: vacancies — id (по умолчанию все OPEN из доступных), unit — вакансии юнита с подчинёнными,
+              min_score, method — auto | optimal | greedy, dry_run — только расчёт
+        """
+        data = request.data
+        try:
+            vacancy_ids = [int(v) for v in data.get("vacancies") or []]
+            unit_id = int(data["unit"]) if data.get("unit") else None
+            min_score = float(data["min_score"]) if data.get("min_score") not in (None, "") else None
+        except (TypeError, ValueError):
+            return APIResponse.validation_error({"detail": ["vacancies, unit, min_score должны быть числами"]})
+        method = str(data.get("method") or "auto").lower()
+        if method not in METHODS:
+            return APIResponse.validation_error({"method": [f"Допустимо: {', '.join(METHODS)}"]})
+        dry_run = str(data.get("dry_run", False)).lower() in ("1", "true", "yes")
+
+        vacancies = self.get_queryset().filter(status=Vacancy.VacancyStatus.OPEN)
+        if vacancy_ids:
+            vacancies = vacancies.filter(id__in=vacancy_ids)
+        if unit_id is not None:
+            vacancies = vacancies.filter(unit_id__in=unit_subtree_ids(unit_id))
+
+        result = optimize_assignments(vacancies, min_score=min_score, method=method,
+                                      dry_run=dry_run, user=request.user)
+        if dry_run:
+            return APIResponse.success(result, message="Расчёт распределения")
+        return APIResponse.created(result, message=f"Создано черновиков назначений: {result['created']}")
 
     def get_permissions(self):
         # SAFE: всем аутентифицированным (дальше отфильтруем queryset)
@@ -54,15 +241,12 @@ class VacancyViewSet(viewsets.ModelViewSet):
             return qs
         # HR — только в своих юнитах
         if getattr(u, "role", "") == "HR":
-            hrp = HRProfile.objects.filter(user=u).first()
-            if not hrp:
-                return qs.none()
-            return qs.filter(unit__in=hrp.responsible_units.all())
+            return qs.filter(unit_id__in=sorted(get_scope(u).hr_unit_ids))
 
         # COMMANDER — только свой unit
         if getattr(u, "role", "") == "COMMANDER":
-            me = CommanderProfile.objects.filter(user=u).select_related("unit").first()
-            return qs.filter(unit=me.unit_id) if me and me.unit_id else qs.none()
+            unit_id = get_scope(u).commander_unit_id
+            return qs.filter(unit_id=unit_id) if unit_id else qs.none()
 
         # OFFICER и прочие — ничего
         return qs.none()
@@ -77,9 +261,7 @@ class VacancyViewSet(viewsets.ModelViewSet):
         # на всякий случай: командиру и офицеру менять нельзя
             raise PermissionError("Недостаточно прав")
 
-        hrp = HRProfile.objects.filter(user=user).first()
-        allowed = set(hrp.responsible_units.values_list("id", flat=True)) if hrp else set()
-        if unit_id not in allowed:
+        if unit_id not in get_scope(user).hr_unit_ids:
             raise PermissionError("Недостаточно прав для выбранного подразделения")
 
     def perform_create(self, serializer):
@@ -112,12 +294,12 @@ class VacancyViewSet(viewsets.ModelViewSet):
 
 
 class CandidateMatchViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = CandidateMatch.objects.select_related("vacancy", "officer", "officer__rank").all()
+    queryset = CandidateMatch.objects.select_related("vacancy", "officer__user", "officer__rank").all()
     serializer_class = CandidateMatchSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ["vacancy", "officer"]
-    ordering = ["-match_score"]
+    filterset_fields = ["vacancy", "officer", "has_mandatory_gap"]
+    ordering = ["-match_score", "id"]
     search_fields = ["officer__full_name", "officer__user__email"]
 
     def get_queryset(self):
@@ -130,15 +312,12 @@ class CandidateMatchViewSet(viewsets.ReadOnlyModelViewSet):
 
         # HR — только по вакансиям в своих юнитах
         if getattr(u, "role", "") == "HR":
-            hrp = HRProfile.objects.filter(user=u).first()
-            if not hrp:
-                return qs.none()
-            return qs.filter(vacancy__unit__in=hrp.responsible_units.all())
+            return qs.filter(vacancy__unit_id__in=sorted(get_scope(u).hr_unit_ids))
 
         # COMMANDER — только по вакансиям в его unit
         if getattr(u, "role", "") == "COMMANDER":
-            me = CommanderProfile.objects.filter(user=u).select_related("unit").first()
-            return qs.filter(vacancy__unit=me.unit_id) if me and me.unit_id else qs.none()
+            unit_id = get_scope(u).commander_unit_id
+            return qs.filter(vacancy__unit_id=unit_id) if unit_id else qs.none()
 
         # OFFICER — ничего
         return qs.none()
@@ -1,7 +1,104 @@
+"""
+JWT с claims пользователя: роль, id профилей, юнит командира, юниты HR и версия этих данных.
+
+Пока версия в токене совпадает с текущей версией пользователя (CustomUser.claims_version), запрос
+аутентифицируется без загрузки пользователя: он собирается из claims как экземпляр CustomUser
+с отложенными (deferred) остальными полями — их чтение догрузит строку, а save() запишет только
+загруженные поля. Версию повышают сигналы смены роли/активности, профилей, юнитов HR и удаления
+пользователя (см. signals); устаревший токен работает как обычно — через загрузку пользователя из БД.
+
+Источник версии — колонка в БД; кэш (claims_version_key) лишь избавляет от запроса и живёт недолго,
+поэтому потеря/вытеснение ключа или локальный кэш воркера не «воскрешают» старые claims:
+промах кэша читает версию из БД, удалённый пользователь версии не имеет.
+"""
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 User = get_user_model()
 
+SCOPE_VERSION_CLAIM = "scope_version"
+# поля пользователя, которые переносятся в токен и из которых собирается пользователь
+USER_CLAIM_FIELDS = ("email", "role", "is_active", "is_staff", "is_superuser", "is_blocked")
+# сколько воркер может доверять закэшированной версии (при локальном кэше — окно до чужой инвалидации)
+CLAIMS_VERSION_CACHE_TIMEOUT = 60
+
+
+def claims_version_key(user_id) -> str:
+    return f"user_claims:{user_id}"
+
+
+def claims_version(user_id):
+    """Текущая версия claims пользователя (кэш → БД); None, если пользователя нет."""
+    key = claims_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list("claims_version", flat=True).first()
+        if version is not None:
+            cache.set(key, version, CLAIMS_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def invalidate_user_claims(user_id):
+    """Токены пользователя с прежними claims перестают приниматься без БД: версия в БД — сразу, кэш — после коммита."""
+    User.objects.filter(pk=user_id).update(claims_version=F("claims_version") + 1)
+    key = claims_version_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def user_claims(user) -> dict:
+    """Claims для токена: поля пользователя, профили и юниты (3 небольших запроса — один раз при логине)."""
+    from .models import OfficerProfile, CommanderProfile, HRProfile
+
+    claims = {f: getattr(user, f) for f in USER_CLAIM_FIELDS}
+    claims["officer_id"] = OfficerProfile.objects.filter(user=user).values_list("id", flat=True).first()
+    commander = CommanderProfile.objects.filter(user=user).values_list("id", "unit_id").first()
+    claims["commander_id"], claims["commander_unit_id"] = commander or (None, None)
+    claims["hr_unit_ids"] = sorted(u for u in HRProfile.objects.filter(user=user)
+                                   .values_list("responsible_units", flat=True) if u is not None)
+    claims[SCOPE_VERSION_CLAIM] = claims_version(user.pk)
+    return claims
+
+
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = User.EMAIL_FIELD  # 'email'
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for name, value in user_claims(user).items():
+            token[name] = value
+        return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая при актуальных claims не загружает пользователя из БД."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get(SCOPE_VERSION_CLAIM)
+        if user_id is None or version is None:
+            return super().get_user(validated_token)
+        # simplejwt кладёт user_id строкой — приводим к типу pk, чтобы сравнения с *_id работали
+        user_id = User._meta.pk.to_python(user_id)
+        if version != claims_version(user_id):
+            return super().get_user(validated_token)
+
+        data = {User._meta.pk.attname: user_id,
+                **{f: validated_token.get(f) for f in USER_CLAIM_FIELDS}}
+        names = [f.attname for f in User._meta.concrete_fields if f.attname in data]
+        user = User.from_db("default", names, [data[n] for n in names])
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            return super().get_user(validated_token)
+        user.token_claims = {
+            "officer_id": validated_token.get("officer_id"),
+            "commander_id": validated_token.get("commander_id"),
+            "commander_unit_id": validated_token.get("commander_unit_id"),
+            "hr_unit_ids": validated_token.get("hr_unit_ids") or [],
+        }
+        return user
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_officerprofile_awards_officerprofile_children_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -59,6 +59,9 @@ class CustomUser(AbstractUser):
     last_failed_login = models.DateTimeField(null=True, blank=True)
     password_changed_at = models.DateTimeField(auto_now_add=True)
 
+    # версия claims в JWT (apps.users.auth): повышается при смене роли/активности/профилей
+    claims_version = models.PositiveIntegerField(default=1, editable=False)
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
@@ -0,0 +1,178 @@
+"""
+Область видимости пользователя по ролям — одно место вместо копий в каждом аппе.
+
+VisibilityScope хранит только идентификаторы (роль, действующие назначения командира, его юнит,
+юниты HR и поддеревья), поэтому:
+- вычисляется один раз на запрос и кэшируется между запросами по версии VISIBILITY_SCOPE_VERSION_KEY
+  (её повышают сигналы назначений, профилей командира/HR и юнитов — см. signals; смену роли get_scope замечает сам).
+  Это путь авторизации, поэтому межзапросный кэш короткий и только в общем кэше (Redis): локальный кэш
+  процесса (LocMemCache) не видит повышений версии в других воркерах — с ним scope считается на каждый запрос;
+- в запросы встраивается как Q-фильтр/подзапрос, без отдельных запросов к профилям в каждом вьюсете.
+Правила:
+- OFFICER   — только свой профиль;
+- COMMANDER — подчинённые по действующим CommanderAssignment (until пусто или не наступил);
+              «состав» (command_*) — ещё и офицеры его подразделения с подчинёнными юнитами;
+- HR        — все офицеры; «состав» — офицеры его юнитов (responsible_units) с подчинёнными;
+- ADMIN/ROOT — всё.
+"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.versions import get_version, bump_version
+from apps.directory.hierarchy import subtree_q
+from .models import OfficerProfile, CommanderProfile, HRProfile, CommanderAssignment
+
+VISIBILITY_SCOPE_VERSION_KEY = "visibility_scope"
+SCOPE_CACHE_TIMEOUT = 60
+_MEMO_ATTR = "_visibility_scope"
+
+STAFF_ROLES = ("HR", "ADMIN", "ROOT")
+
+
+def _shared_cache() -> bool:
+    """Кэш общий для воркеров — иначе отозванная видимость держалась бы в чужих процессах."""
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def invalidate_visibility_scopes():
+    transaction.on_commit(lambda: bump_version(VISIBILITY_SCOPE_VERSION_KEY))
+
+
+@dataclass
+class VisibilityScope:
+    user_id: int
+    role: Optional[str]
+    assigned_officer_ids: frozenset = frozenset()
+    commander_unit_id: Optional[int] = None
+    hr_unit_ids: frozenset = frozenset()
+    unit_ids: frozenset = frozenset()   # юниты с подчинёнными, доступные HR/командиру (для проверок по id)
+    version: int = 0
+    day: str = ""
+    _user_checks: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def sees_all(self) -> bool:
+        return self.role in ("ADMIN", "ROOT")
+
+    # --- офицеры: «подчинённые» (officers, assessments, insights) ---
+    def officer_q(self, prefix: str = "") -> Q:
+        """Q по OfficerProfile (prefix — путь к нему, например "officer__")."""
+        if self.role == "OFFICER":
+            return Q(**{f"{prefix}user_id": self.user_id})
+        if self.role == "COMMANDER":
+            return Q(**{f"{prefix}id__in": sorted(self.assigned_officer_ids)})
+        if self.role in STAFF_ROLES:
+            return Q()
+        return Q(pk__in=[])
+
+    def officers(self):
+        return OfficerProfile.objects.filter(self.officer_q())
+
+    def can_view_officer(self, officer_id: int) -> bool:
+        if self.role == "COMMANDER":
+            return officer_id in self.assigned_officer_ids
+        if self.role in STAFF_ROLES:
+            return True
+        return self.officers().filter(id=officer_id).exists()
+
+    # --- «состав»: подчинённые + своё подразделение (comms, discipline) ---
+    def command_officer_q(self, prefix: str = "") -> Q:
+        if self.role == "COMMANDER":
+            q = Q(**{f"{prefix}id__in": sorted(self.assigned_officer_ids)})
+            if self.commander_unit_id is not None:
+                q |= subtree_q(f"{prefix}unit_id", self.commander_unit_id)
+            return q
+        if self.role == "HR":
+            return subtree_q(f"{prefix}unit_id", self.hr_unit_ids)
+        return self.officer_q(prefix)
+
+    def unit_roots(self) -> list[int]:
+        """Корни доступных поддеревьев юнитов (юнит командира / юниты HR)."""
+        if self.role == "COMMANDER":
+            return [self.commander_unit_id] if self.commander_unit_id is not None else []
+        if self.role == "HR":
+            return sorted(self.hr_unit_ids)
+        return []
+
+    def command_user_ids(self):
+        """Подзапрос user_id офицеров состава."""
+        return OfficerProfile.objects.filter(self.command_officer_q()).values("user_id")
+
+    def can_view_user(self, user_id: int) -> bool:
+        """Пользователь — сам или офицер состава (результат запоминается на время жизни scope)."""
+        if user_id == self.user_id or self.sees_all:
+            return True
+        if user_id not in self._user_checks:
+            self._user_checks[user_id] = OfficerProfile.objects.filter(
+                self.command_officer_q(), user_id=user_id).exists()
+        return self._user_checks[user_id]
+
+    # --- юниты ---
+    def can_view_unit(self, unit_id: int) -> bool:
+        return self.sees_all or unit_id in self.unit_ids
+
+    def _to_cache(self) -> dict:
+        return {
+            "role": self.role,
+            "assigned_officer_ids": sorted(self.assigned_officer_ids),
+            "commander_unit_id": self.commander_unit_id,
+            "hr_unit_ids": sorted(self.hr_unit_ids),
+            "unit_ids": sorted(self.unit_ids),
+        }
+
+
+def _resolve(user, version: int, day) -> VisibilityScope:
+    from apps.directory.services import unit_subtree_ids
+
+    role = getattr(user, "role", None)
+    claims = getattr(user, "token_claims", None)  # актуальные claims из JWT (apps.users.auth) — без запросов к профилям
+    scope = VisibilityScope(user_id=user.id, role=role, version=version, day=str(day))
+    if role == "COMMANDER":
+        scope.commander_unit_id = claims["commander_unit_id"] if claims is not None else \
+            CommanderProfile.objects.filter(user=user).values_list("unit_id", flat=True).first()
+        scope.assigned_officer_ids = frozenset(CommanderAssignment.objects.filter(
+            commander__user=user).filter(Q(until__isnull=True) | Q(until__gte=day))
+            .values_list("officer_id", flat=True))
+        if scope.commander_unit_id is not None:
+            scope.unit_ids = frozenset(unit_subtree_ids(scope.commander_unit_id))
+    elif role == "HR":
+        scope.hr_unit_ids = frozenset(claims["hr_unit_ids"]) if claims is not None else frozenset(
+            u for u in HRProfile.objects.filter(user=user).values_list("responsible_units", flat=True) if u is not None)
+        if scope.hr_unit_ids:
+            scope.unit_ids = frozenset(unit_subtree_ids(scope.hr_unit_ids))
+    return scope
+
+
+def get_scope(user) -> VisibilityScope:
+    """
+    Область видимости пользователя: в пределах запроса — с объекта user,
+    между запросами — из общего кэша по (версия, пользователь, день; от дня зависят действующие назначения).
+    """
+    version = get_version(VISIBILITY_SCOPE_VERSION_KEY)
+    day = timezone.localdate()
+    memo = getattr(user, _MEMO_ATTR, None)
+    if memo is not None and memo.version == version and memo.day == str(day):
+        return memo
+
+    shared = _shared_cache()
+    key = f"users:scope:{version}:{user.id}:{day}"
+    data = cache.get(key) if shared else None
+    if data is not None and data["role"] == getattr(user, "role", None):
+        scope = VisibilityScope(
+            user_id=user.id, role=data["role"], version=version, day=str(day),
+            assigned_officer_ids=frozenset(data["assigned_officer_ids"]),
+            commander_unit_id=data["commander_unit_id"],
+            hr_unit_ids=frozenset(data["hr_unit_ids"]), unit_ids=frozenset(data["unit_ids"]),
+        )
+    else:
+        scope = _resolve(user, version, day)
+        if shared:
+            cache.set(key, scope._to_cache(), SCOPE_CACHE_TIMEOUT)
+    setattr(user, _MEMO_ATTR, scope)
+    return scope
@@ -3,8 +3,11 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from datetime import date
+from functools import cached_property
 from django.utils.dateparse import parse_date
 
+from core.serializers import SparseFieldsetsMixin
+
 from .models import (
     OfficerProfile, CommanderProfile, HRProfile, CommanderAssignment, OfficerLanguage, CommanderLanguage
 )
@@ -78,6 +81,15 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+def _full_years(since, today):
+    """Полных лет с даты since (строку — парсим) на today; None, если даты нет."""
+    if isinstance(since, str):
+        since = parse_date(since)
+    if not since:
+        return None
+    return today.year - since.year - ((today.month, today.day) < (since.month, since.day))
+
+
 class OfficerLanguageSerializer(serializers.ModelSerializer):
     class Meta:
         model = OfficerLanguage
@@ -120,24 +132,10 @@ class OfficerProfileSerializer(serializers.ModelSerializer):
         return None
 
     def get_age(self, obj):
-        if not obj.birth_date:
-            return None
-        today = date.today()
-        return today.year - obj.birth_date.year - (
-                (today.month, today.day) < (obj.birth_date.month, obj.birth_date.day)
-        )
+        return _full_years(obj.birth_date, date.today())
 
     def get_service_years(self, obj):
-        ssd = obj.service_start_date
-        if not ssd:
-            return None
-        # если по какой-то причине пришла строка — аккуратно распарсим
-        if isinstance(ssd, str):
-            ssd = parse_date(ssd)
-        if not ssd:
-            return None
-        today = date.today()
-        return today.year - ssd.year - ((today.month, today.day) < (ssd.month, ssd.day))
+        return _full_years(obj.service_start_date, date.today())
 
     def get_fields(self):
         fields = super().get_fields()
@@ -149,6 +147,71 @@ class OfficerProfileSerializer(serializers.ModelSerializer):
         return fields
 
 
+class OfficerProfileListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Облегчённое представление офицера для списков: плоские email/роль вместо вложенного пользователя,
+    тяжёлые поля (языки, история службы, тексты) — только по ?expand= или ?fields=.
+    Queryset под выбранный набор полей готовит setup_queryset (select_related, prefetch языков, defer),
+    так что страница любого размера отдаётся постоянным числом запросов.
+    """
+    email = serializers.EmailField(source="user.email", read_only=True)
+    role = serializers.CharField(source="user.role", read_only=True)
+    user_detail = UserSerializer(source="user", read_only=True)
+    rank_name = serializers.CharField(source="rank.name", read_only=True, default=None)
+    unit_name = serializers.CharField(source="unit.name", read_only=True, default=None)
+    position_title = serializers.CharField(source="current_position.title", read_only=True, default=None)
+
+    languages = OfficerLanguageSerializer(many=True, read_only=True)
+    photo_url = serializers.SerializerMethodField()
+    age = serializers.SerializerMethodField()
+    service_years = serializers.SerializerMethodField()
+
+    # текстовые/JSON-колонки, которые не загружаются из БД, если не запрошены
+    DEFERRABLE_FIELDS = ("rank_assignment_info", "combat_notes", "awards", "penalties",
+                         "education_civil", "education_military", "service_history")
+
+    class Meta:
+        model = OfficerProfile
+        fields = [
+            "id", "user", "email", "role", "user_detail", "full_name", "birth_date", "phone", "photo_url",
+            "iin", "birth_place", "nationality", "personal_number", "marital_status", "combat_participation", "children_count",
+            "rank", "rank_name", "unit", "unit_name", "current_position", "position_title",
+            "service_start_date", "age", "service_years",
+            "rank_assignment_info", "combat_notes", "awards", "penalties",
+            "education_civil", "education_military", "service_history", "languages",
+        ]
+        expandable_fields = (
+            "user_detail", "rank_assignment_info", "combat_notes", "awards", "penalties",
+            "education_civil", "education_military", "service_history", "languages",
+        )
+        read_only_fields = fields
+
+    @classmethod
+    def setup_queryset(cls, queryset, request):
+        selected = cls.selected_fields(request)
+        queryset = queryset.select_related("user", "rank", "unit", "current_position")
+        if "languages" in selected:
+            queryset = queryset.prefetch_related("languages")
+        deferred = [f for f in cls.DEFERRABLE_FIELDS if f not in selected]
+        return queryset.defer(*deferred) if deferred else queryset
+
+    @cached_property
+    def _today(self):
+        return date.today()
+
+    def get_photo_url(self, obj):
+        if not obj.photo:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(obj.photo.url) if request else obj.photo.url
+
+    def get_age(self, obj):
+        return _full_years(obj.birth_date, self._today)
+
+    def get_service_years(self, obj):
+        return _full_years(obj.service_start_date, self._today)
+
+
 class OfficerProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = OfficerProfile
@@ -294,3 +357,4 @@ class PasswordChangeSerializer(serializers.Serializer):
         except DjangoValidationError as e:
             raise serializers.ValidationError({"new_password": list(e.messages)})
         return attrs
+
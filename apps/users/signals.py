@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import OfficerProfile, CommanderProfile, HRProfile
+from apps.directory.models import Unit
+from .models import OfficerProfile, CommanderProfile, HRProfile, CommanderAssignment
+from .scope import invalidate_visibility_scopes
+from .auth import USER_CLAIM_FIELDS, invalidate_user_claims
 
 User = get_user_model()
 
@@ -18,4 +21,73 @@ def ensure_profile_exists(sender, instance, created, **kwargs):
 
     # 3) профиль HR при необходимости
     if instance.role == User.UserRole.HR:
-        HRProfile.objects.get_or_create(user=instance)
\ No newline at end of file
+        HRProfile.objects.get_or_create(user=instance)
+
+
+# области видимости (apps.users.scope): назначения, юниты командиров/HR, структура юнитов
+# (смену роли get_scope замечает сам — роль сверяется с закэшированной)
+@receiver(post_save, sender=CommanderAssignment)
+@receiver(post_delete, sender=CommanderAssignment)
+@receiver(post_save, sender=CommanderProfile)
+@receiver(post_delete, sender=CommanderProfile)
+@receiver(post_delete, sender=HRProfile)
+@receiver(m2m_changed, sender=HRProfile.responsible_units.through)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def invalidate_scopes(sender, **kwargs):
+    invalidate_visibility_scopes()
+
+
+# claims в JWT (apps.users.auth): при изменении — токены пользователя снова сверяются с БД
+@receiver(pre_save, sender=User)
+def remember_claim_fields(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    row = User.objects.filter(pk=instance.pk).values_list("claims_version", *USER_CLAIM_FIELDS).first()
+    if row is None:
+        return
+    # версию ведёт только invalidate_user_claims — save() устаревшего экземпляра не должен её откатить
+    instance.claims_version, instance._claims_before = row[0], row[1:]
+
+
+@receiver(post_save, sender=User)
+def invalidate_changed_user_claims(sender, instance, created, **kwargs):
+    before = instance.__dict__.pop("_claims_before", None)
+    if before is not None and before != tuple(getattr(instance, f) for f in USER_CLAIM_FIELDS):
+        invalidate_user_claims(instance.pk)
+        instance.claims_version += 1
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_claims(sender, instance, **kwargs):
+    # строки больше нет — claims_version вернёт None, и токены пойдут через БД (где пользователя не найдут)
+    invalidate_user_claims(instance.pk)
+
+
+@receiver(post_save, sender=OfficerProfile)
+def invalidate_new_officer_claims(sender, instance, created, **kwargs):
+    # у офицера в claims только id профиля — правки самого профиля его не меняют
+    if created:
+        invalidate_user_claims(instance.user_id)
+
+
+@receiver(post_delete, sender=OfficerProfile)
+@receiver(post_save, sender=CommanderProfile)
+@receiver(post_delete, sender=CommanderProfile)
+@receiver(post_save, sender=HRProfile)
+@receiver(post_delete, sender=HRProfile)
+def invalidate_profile_claims(sender, instance, **kwargs):
+    invalidate_user_claims(instance.user_id)
+
+
+@receiver(m2m_changed, sender=HRProfile.responsible_units.through)
+def invalidate_hr_unit_claims(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_user_claims(instance.user_id)
+        return
+    # изменение со стороны юнита: instance — Unit, pk_set — HRProfile (для clear — все, кто был привязан)
+    profiles = HRProfile.objects.filter(id__in=pk_set) if pk_set else HRProfile.objects.all()
+    for user_id in profiles.values_list("user_id", flat=True):
+        invalidate_user_claims(user_id)
@@ -9,6 +9,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
 from apps.directory.models import Rank, Unit, Position
+from apps.directory.filters import UnitSubtreeFilter
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import viewsets, mixins, status, filters
@@ -22,10 +23,11 @@ from core.permissions import (
     ReadOnlyOrStaffish
 )
 from .models import OfficerProfile, CommanderProfile, HRProfile, CommanderAssignment, OfficerLanguage, CommanderLanguage
+from .scope import get_scope
 
 from .serializers import (
     UserRegistrationSerializer, UserSerializer,
-    OfficerProfileSerializer, OfficerProfileUpdateSerializer,
+    OfficerProfileSerializer, OfficerProfileListSerializer, OfficerProfileUpdateSerializer,
     CommanderProfileSerializer, HRProfileSerializer,
     CommanderAssignmentSerializer, PasswordResetSerializer, PasswordResetConfirmSerializer,
     PasswordChangeSerializer, OfficerLanguageSerializer, CommanderProfileUpdateSerializer, CommanderLanguageSerializer
@@ -322,50 +324,17 @@ class OfficerProfileViewSet(viewsets.ModelViewSet):
     serializer_class = OfficerProfileSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, FormParser, MultiPartParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, UnitSubtreeFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ["unit", "rank", "current_position", "marital_status", "combat_participation"]
+    unit_subtree_field = "unit"
     search_fields = ["full_name", "iin", "user__email"]
     ordering = ["full_name"]
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        u = self.request.user
-
-        if u.role == "OFFICER":
-            # Офицер видит только себя
-            return qs.filter(user=u)
-
-        if u.role == "COMMANDER":
-            try:
-                me = CommanderProfile.objects.select_related("unit").get(user=u)
-            except CommanderProfile.DoesNotExist:
-                return qs.none()
-
-            today = timezone.now().date()
-
-            # 1) Все офицеры его подразделения
-            qs_unit = OfficerProfile.objects.filter(unit=me.unit)
-
-            # 2) Оверрайды (активные назначения)
-            include_ids = CommanderAssignment.objects.filter(
-                commander=me
-            ).filter(
-                Q(until__isnull=True) | Q(until__gte=today)
-            ).values_list("officer_id", flat=True)
-
-            qs_override = OfficerProfile.objects.filter(id__in=include_ids)
-
-            return (qs_unit | qs_override).distinct()
-
-        if u.role == "HR":
-            # HR видит офицеров в своих подразделениях
-            try:
-                hrp = HRProfile.objects.get(user=u)
-            except HRProfile.DoesNotExist:
-                return qs.none()
-            return qs.filter(unit__in=hrp.responsible_units.all())
-
-        # ADMIN/ROOT видят всех
+        # офицер — себя; командир — своё подразделение и назначенных; HR — свои подразделения; ADMIN/ROOT — всех
+        qs = super().get_queryset().filter(get_scope(self.request.user).command_officer_q())
+        if self.action == "list":
+            qs = OfficerProfileListSerializer.setup_queryset(qs, self.request)
         return qs
 
     def get_permissions(self):
@@ -384,6 +353,9 @@ class OfficerProfileViewSet(viewsets.ModelViewSet):
             u = getattr(self.request, "user", None)
             if u and getattr(u, "role", None) == "OFFICER":
                 return OfficerProfileUpdateSerializer
+        if self.action == "list":
+            # облегчённое представление + ?fields=/?expand=
+            return OfficerProfileListSerializer
         return super().get_serializer_class()
 
     def retrieve(self, request, *args, **kwargs):
@@ -642,14 +614,14 @@ class CommanderProfileViewSet(viewsets.ModelViewSet):
 
         qs_override = OfficerProfile.objects.filter(id__in=include_ids)
 
-        qs = (qs_unit | qs_override).select_related("user", "rank", "unit", "current_position").distinct().order_by(
-            "full_name")
+        qs = OfficerProfileListSerializer.setup_queryset(
+            (qs_unit | qs_override).distinct().order_by("full_name"), request)
 
         page = self.paginate_queryset(qs)
-        ser = OfficerProfileSerializer(
-            page or qs, many=True, context={"request": request}
+        ser = OfficerProfileListSerializer(
+            qs if page is None else page, many=True, context={"request": request}
         )
-        return self.get_paginated_response(ser.data) if page else Response(ser.data)
+        return Response(ser.data) if page is None else self.get_paginated_response(ser.data)
 
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, (IsHR | IsAdminOrRoot)])
     def assign(self, request):
@@ -802,23 +774,21 @@ class HRProfileViewSet(viewsets.ReadOnlyModelViewSet):
         if not hrp:
             # если это админ/рут — показываем всех офицеров
             if IsAdminOrRoot().has_permission(request, self):
-                qs = OfficerProfile.objects.select_related("user", "rank", "unit", "current_position").order_by("full_name")
+                qs = OfficerProfileListSerializer.setup_queryset(OfficerProfile.objects.order_by("full_name"), request)
                 page = self.paginate_queryset(qs)
-                ser = OfficerProfileSerializer(page or qs, many=True, context={"request": request})
-                return self.get_paginated_response(ser.data) if page else Response(ser.data)
+                ser = OfficerProfileListSerializer(qs if page is None else page, many=True, context={"request": request})
+                return Response(ser.data) if page is None else self.get_paginated_response(ser.data)
             return Response({"detail": "Профиль HR не найден"}, status=404)
 
-        qs = OfficerProfile.objects.select_related(
-            "user", "rank", "unit", "current_position"
-        ).filter(
+        qs = OfficerProfileListSerializer.setup_queryset(OfficerProfile.objects.filter(
             unit__in=hrp.responsible_units.all()
-        ).order_by("full_name")
+        ).order_by("full_name"), request)
 
         page = self.paginate_queryset(qs)
-        ser = OfficerProfileSerializer(
-            page or qs, many=True, context={"request": request}
+        ser = OfficerProfileListSerializer(
+            qs if page is None else page, many=True, context={"request": request}
         )
-        return self.get_paginated_response(ser.data) if page else Response(ser.data)
+        return Response(ser.data) if page is None else self.get_paginated_response(ser.data)
 
     @action(detail=True, methods=["patch"], permission_classes=[IsAuthenticated, IsAdminOrRoot])
     def set_units(self, request, pk=None):
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+# настройки из Django settings с префиксом CELERY_
+app.config_from_object('django.conf:settings', namespace='CELERY')
+# tasks.py в приложениях из INSTALLED_APPS
+app.autodiscover_tasks()
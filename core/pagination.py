@@ -0,0 +1,255 @@
+"""
+Keyset-пагинация (seek method): страница = WHERE (поля сортировки) «после» последней строки
+предыдущей страницы + LIMIT. В отличие от OFFSET стоимость не растёт с номером страницы.
+
+Пагинатор по умолчанию для всех списков (REST_FRAMEWORK.DEFAULT_PAGINATION_CLASS).
+Сортировка (по убыванию приоритета):
+- view.keyset_ordering — явно заданная для keyset;
+- order_by queryset'а (в т.ч. ordering вьюсета / ?ordering= из OrderingFilter);
+- Meta.ordering модели; иначе KeysetPagination.ordering.
+К ней добавляется pk, если последнее поле не уникально, — порядок строк всегда однозначен.
+Поля, допускающие NULL, сортируются с NULL в конце и учитываются в условии «после».
+Курсор — base64(JSON значений полей сортировки последней строки).
+
+?count=true — добавить в ответ число строк: точное, пока оно не больше count_limit (COUNT по LIMIT),
+дальше — оценка планировщика PostgreSQL (на других СУБД — нижняя граница) с count_is_approximate.
+"""
+import base64
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает микросекунды — в курсоре нужно точное значение."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    count_limit = 10000
+    ordering = ("-id",)
+    invalid_cursor_message = "Неверный курсор"
+
+    # ---- сортировка ----
+    def get_ordering(self, view, queryset=None) -> tuple:
+        explicit = getattr(view, "keyset_ordering", None)
+        if explicit:
+            return tuple(explicit)
+        if queryset is not None:
+            query = queryset.query
+            ordering = query.order_by or (queryset.model._meta.ordering if query.default_ordering else ())
+            resolved = self._resolve_ordering(queryset.model, ordering)
+            if resolved:
+                return resolved
+        return tuple(self.ordering)
+
+    @staticmethod
+    def _resolve_ordering(model, ordering) -> tuple:
+        """
+        Поля сортировки, пригодные для keyset: внешние ключи — как *_id, в конце — уникальное поле.
+        Пусто, если сортировка не по полям (выражения, «?», обратные связи).
+        """
+        resolved = []
+        for item in ordering:
+            if not isinstance(item, str) or item == "?":
+                return ()
+            desc = item.startswith("-")
+            opts, path, field = model._meta, [], None
+            for part in item.lstrip("-").split("__"):
+                try:
+                    field = opts.pk if part == "pk" else opts.get_field(part)
+                except FieldDoesNotExist:
+                    return ()
+                if field.many_to_many or field.one_to_many or not field.concrete:
+                    return ()
+                path.append(part)
+                if field.is_relation:
+                    opts = field.related_model._meta
+            if field.is_relation:
+                path[-1] = field.attname
+            resolved.append(("-" if desc else "") + "__".join(path))
+        if not resolved:
+            return ()
+        last = resolved[-1].lstrip("-")
+        if "__" in last or not (last in ("pk", model._meta.pk.attname) or model._meta.get_field(last).unique):
+            resolved.append(("-" if resolved[-1].startswith("-") else "") + model._meta.pk.attname)
+        return tuple(resolved)
+
+    @staticmethod
+    def _nullable(model, field_path: str) -> bool:
+        opts, nullable = model._meta, False
+        for part in field_path.lstrip("-").split("__"):
+            field = opts.pk if part == "pk" else opts.get_field(part)
+            nullable = nullable or field.null
+            if field.is_relation:
+                opts = field.related_model._meta
+        return nullable
+
+    def _order_by(self, model, ordering) -> list:
+        """order_by: NULL-поля — явно NULLS LAST, остальные — как есть (чтобы работали обычные индексы)."""
+        items = []
+        for field in ordering:
+            if self._nullable(model, field):
+                name = field.lstrip("-")
+                items.append(F(name).desc(nulls_last=True) if field.startswith("-") else F(name).asc(nulls_last=True))
+            else:
+                items.append(field)
+        return items
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ---- курсор ----
+    def encode_cursor(self, values) -> str:
+        raw = json.dumps(list(values), cls=_CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request, ordering):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode())
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def _row_values(row, ordering):
+        values = []
+        for field in ordering:
+            obj = row
+            for attr in field.lstrip("-").split("__"):
+                obj = getattr(obj, attr)
+                if obj is None:
+                    break
+            values.append(obj)
+        return values
+
+    def _after(self, model, ordering, values) -> Q:
+        """(f1, f2, ...) строго «после» values с учётом направления полей и NULLS LAST."""
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip("-")
+            if values[i] is None:
+                continue  # после NULL при NULLS LAST по этому полю ничего нет — только равенство на следующих
+            lookup = "lt" if field.startswith("-") else "gt"
+            q = Q(**{f"{name}__{lookup}": values[i]})
+            if self._nullable(model, field):
+                q |= Q(**{f"{name}__isnull": True})
+            for prev, value in zip(ordering[:i], values[:i]):
+                prev = prev.lstrip("-")
+                q &= Q(**{f"{prev}__isnull": True}) if value is None else Q(**{prev: value})
+            clauses.append(q)
+        return reduce(or_, clauses) if clauses else Q(pk__in=[])
+
+    # ---- число строк ----
+    def wants_count(self, request, view=None) -> bool:
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return bool(getattr(view, "keyset_count", False))
+        return value.lower() in ("1", "true", "yes")
+
+    def get_count(self, queryset) -> tuple[int, bool]:
+        """(число, приблизительное ли): точный COUNT ограничен count_limit строками."""
+        queryset = queryset.order_by()
+        count = queryset[:self.count_limit + 1].count()
+        if count <= self.count_limit:
+            return count, False
+        if connections[queryset.db].vendor == "postgresql":
+            try:
+                plan = json.loads(queryset.explain(format="json"))
+                return max(int(plan[0]["Plan"]["Plan Rows"]), count), True
+            except (ValueError, KeyError, IndexError, TypeError):
+                pass
+        return count, True
+
+    # ---- BasePagination ----
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        model = queryset.model
+        ordering = self.get_ordering(view, queryset)
+        size = self.get_page_size(request)
+
+        self.count = self.count_is_approximate = None
+        if self.wants_count(request, view):
+            self.count, self.count_is_approximate = self.get_count(queryset)
+
+        queryset = queryset.order_by(*self._order_by(model, ordering))
+        cursor = self.decode_cursor(request, ordering)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self._after(model, ordering, cursor))
+            except (ValueError, TypeError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:size + 1])
+        self.has_next = len(rows) > size
+        rows = rows[:size]
+        self.next_cursor = self.encode_cursor(self._row_values(rows[-1], ordering)) if self.has_next else None
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data) -> dict:
+        """Тело страницы — для обёртки в APIResponse.success в @action."""
+        body = {"next": self.get_next_link(), "next_cursor": self.next_cursor, "results": data}
+        if getattr(self, "count", None) is not None:
+            body["count"] = self.count
+            body["count_is_approximate"] = self.count_is_approximate
+        return body
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "next_cursor": {"type": "string", "nullable": True},
+                "count": {"type": "integer"},
+                "count_is_approximate": {"type": "boolean"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {"name": self.cursor_query_param, "required": False, "in": "query",
+             "description": "Курсор следующей страницы (next_cursor)", "schema": {"type": "string"}},
+            {"name": self.page_size_query_param, "required": False, "in": "query",
+             "description": f"Размер страницы (до {self.max_page_size})", "schema": {"type": "integer"}},
+            {"name": self.count_query_param, "required": False, "in": "query",
+             "description": f"Вернуть число строк (точное до {self.count_limit}, дальше — оценка)",
+             "schema": {"type": "boolean"}},
+        ]
@@ -73,11 +73,10 @@ class CanViewSubordinates(permissions.BasePermission):
         if not (request.user.is_authenticated and request.user.role == "COMMANDER"):
             return False
         # lazy import чтобы избежать циклов
-        from apps.users.models import CommanderAssignment, CommanderProfile, OfficerProfile
+        from apps.users.models import OfficerProfile
+        from apps.users.scope import get_scope
         if isinstance(obj, OfficerProfile):
-            return CommanderAssignment.objects.filter(
-                commander__user=request.user, officer=obj, until__isnull=True
-            ).exists()
+            return get_scope(request.user).can_view_officer(obj.id)
         # если на уровне списка/детали просто офицер id
         return False
 
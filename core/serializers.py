@@ -0,0 +1,32 @@
+# core/serializers.py
+
+
+class SparseFieldsetsMixin:
+    """
+    Разреженные наборы полей для ModelSerializer по параметрам запроса:
+    ?fields=id,full_name — только перечисленные поля (в том числе из expandable_fields);
+    ?expand=languages    — набор по умолчанию плюс перечисленные поля из Meta.expandable_fields.
+    По умолчанию отдаются все Meta.fields, кроме expandable_fields; неизвестные имена игнорируются.
+    """
+    fields_param = "fields"
+    expand_param = "expand"
+
+    @staticmethod
+    def query_names(request, param: str) -> set:
+        raw = request.query_params.get(param, "") if request is not None else ""
+        return {name.strip() for name in raw.split(",") if name.strip()}
+
+    @classmethod
+    def selected_fields(cls, request) -> set:
+        declared = list(cls.Meta.fields)
+        only = cls.query_names(request, cls.fields_param) & set(declared)
+        if only:
+            return only
+        expandable = set(getattr(cls.Meta, "expandable_fields", ()))
+        expand = cls.query_names(request, cls.expand_param)
+        return {name for name in declared if name not in expandable or name in expand}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.selected_fields(self.context.get("request"))
+        return {name: field for name, field in fields.items() if name in selected}
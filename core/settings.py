@@ -64,7 +64,8 @@ INSTALLED_APPS = [
     'apps.audit',
     'apps.discipline',
     'apps.imports',
-    'apps.document_parsing'
+    'apps.document_parsing',
+    'apps.jobs',
 ]
 
 MIDDLEWARE = [
@@ -156,6 +157,32 @@ else:
         }
     }
 
+# Cache (версии индексов/выборок должны быть общими для всех воркеров — в проде Redis)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery (фоновые задачи). Без брокера таски выполняются сразу в процессе (eager)
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = env_bool('CELERY_TASK_ALWAYS_EAGER', 'false') or not CELERY_BROKER_URL
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Прогноз траекторий: heuristic | logistic (модель из train_forecast_model; нет файла — эвристика)
+INSIGHTS_FORECAST_BACKEND = os.getenv('INSIGHTS_FORECAST_BACKEND', 'heuristic')
+INSIGHTS_MODEL_PATH = os.getenv('INSIGHTS_MODEL_PATH', str(BASE_DIR / 'var' / 'forecast_model.npz'))
+
 #
 AUDIT_ENABLED = env_bool("AUDIT_ENABLED", "true")
 AUDIT_LOG_HTTP = env_bool("AUDIT_LOG_HTTP", "false")
@@ -218,13 +245,24 @@ AUDIT_IGNORED_PATHS = (
     "/admin/js/", "/admin/css/", "/admin/img/",
 )
 AUDIT_SKIP_DURING_MIGRATIONS = True
+# служебные таблицы (очереди пересчёта, материализованные снапшоты и агрегаты, фоновые задачи) в аудит не пишем
+AUDIT_EXCLUDE_MODELS = {
+    "staffing.candidatematchqueue",
+    "assessments.officercompetencysnapshot",
+    "assessments.competencyratingrollup",
+    "assessments.unitcompetencyrollup",
+    "jobs.job",
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend',
+                                'apps.directory.filters.UnitSubtreeFilter'],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.auth.ClaimsJWTAuthentication',
     ),
+    # keyset-пагинация всех списков (cursor/page_size, ?count=true — число строк), см. core.pagination
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
 }
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Career Growth API',
@@ -0,0 +1,56 @@
+# core/versions.py
+import time
+
+from django.core.cache import cache
+
+VERSION_TIMEOUT = None  # счётчики версий не протухают
+
+
+def _seed() -> int:
+    """
+    Начальное значение для отсутствующего счётчика (первый запуск, вытеснение, сброс кэша).
+    Растёт со временем, поэтому не совпадает ни с одной версией, выданной до потери ключа,
+    и записи, закэшированные под старыми версиями, не оживают.
+    """
+    return time.time_ns()
+
+
+def _key(name: str) -> str:
+    return f"version:{name}"
+
+
+def get_version(name: str) -> int:
+    """
+    Текущая версия именованного набора данных (индексы, кэши выборок и т.п.).
+    Хранится в общем кэше, поэтому одинакова для всех воркеров при Redis.
+    """
+    key = _key(name)
+    value = cache.get(key)
+    if value is None:
+        seed = _seed()
+        cache.add(key, seed, timeout=VERSION_TIMEOUT)
+        value = cache.get(key, seed)
+    return int(value)
+
+
+def bump_version(name: str) -> int:
+    """Инвалидировать всё, что закэшировано под этой версией."""
+    key = _key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # ключа ещё нет (или вытеснен) — стартуем с монотонного значения, больше любого выданного раньше
+        seed = _seed()
+        cache.add(key, seed, timeout=VERSION_TIMEOUT)
+        return int(cache.get(key, seed))
+
+
+def get_versions(names) -> dict:
+    """Несколько версий за один запрос к кэшу: {name: version}."""
+    names = list(names)
+    found = cache.get_many([_key(n) for n in names])
+    result = {}
+    for name in names:
+        value = found.get(_key(name))
+        result[name] = int(value) if value is not None else get_version(name)
+    return result